@@ -1,99 +1,4736 @@
 import csv
 import os
+import html
 import json # Used to save/load the 'order_items' dictionary within the transactions CSV
+import sys
+import argparse
+import io
+import threading # Used for background compaction of the stock journal
+import atexit
+import importlib.util
+import marshal
+import struct
+import mmap
+import heapq
+import math
+import bisect
+import itertools
+import time
+import shutil
+import signal
+import functools
+import numbers
+from urllib.parse import urlsplit, parse_qs, unquote
+from contextlib import contextmanager
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from array import array
+from datetime import datetime, timedelta
+try:
+    import fcntl # File locking between tills (Unix only)
+except ImportError:
+    fcntl = None
+try:
+    import resource # Peak RSS in the benchmarks (Unix only)
+except ImportError:
+    resource = None
+
+def lazy_import(name):
+    """Return module name, loaded on first attribute access (None if it is not installed).
+
+    Used for the modules only some commands need, so the interactive till
+    starts without paying for them. A module that is already imported is
+    returned as it is; replacing it in sys.modules would break its submodules.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition('.')
+    if parent:
+        setattr(sys.modules[parent], child, module) # As a normal import of a submodule does
+    return module
+
+sqlite3 = lazy_import('sqlite3') # POS_STORAGE=sqlite
+asyncio = lazy_import('asyncio') # Local HTTP service mode
+futures = lazy_import('concurrent.futures') # Service worker pools
+tracemalloc = lazy_import('tracemalloc') # --trace-memory and bench --memory
+random = lazy_import('random') # Benchmarks
+tempfile = lazy_import('tempfile') # Benchmarks
+subprocess = lazy_import('subprocess') # Benchmarks
+platform = lazy_import('platform') # Benchmarks
+np = lazy_import('numpy') # Vectorized sales reports (optional; they fall back to plain loops)
 
 # CSV FILE CONSTANTS 
 INVENTORY_FILE = 'inventory.csv'
 SALES_FILE = 'transactions.csv'
+STOCK_JOURNAL_FILE = 'inventory_journal.csv' # Append-only stock movements since the last INVENTORY_FILE snapshot
+SALES_INDEX_FILE = 'transactions.idx' # tx_id -> byte offset of its latest record in SALES_FILE
+
+# DURABILITY: appends made within this many seconds share one fsync (0 = fsync every append before returning)
+FSYNC_WINDOW = float(os.environ.get('POS_FSYNC_WINDOW', '0.05'))
+
+# STORAGE BACKEND ('csv' keeps everything in the CSV files above, 'sqlite' uses SQLITE_FILE)
+STORAGE_BACKEND = os.environ.get('POS_STORAGE', 'csv')
+SQLITE_FILE = 'pos.db'
+
+# MULTI-TILL MODE: several POS processes share the same files, serialised by an exclusive lock on LOCK_FILE
+MULTI_TILL = os.environ.get('POS_MULTI_TILL', '') == '1'
+LOCK_FILE = 'pos.lock'
+TILLS_FILE = 'pos.tills' # Each running till holds a shared lock on it, so archiving can tell when it is the only till
+
+# Transaction record settings
+TX_FIELDS = ['tx_id', 'customer', 'total_amount', 'method', 'status', 'order_items', 'item_prices', 'created_at']
+LEGACY_TX_FIELDS = ['customer', 'total_amount', 'method', 'status', 'order_items'] # Columns every older SALES_FILE has
+VOID_STATUS = 'VOID'
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# INSTRUMENTATION: POS_METRICS=1 times the hot paths and counts I/O, written to METRICS_FILE at exit
+METRICS_ENABLED = os.environ.get('POS_METRICS', '') == '1'
+METRICS_FILE = os.environ.get('POS_METRICS_FILE', 'metrics.prom') # Prometheus text format; give each till its own
+METRIC_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60) # Seconds
+TRACEMALLOC_FRAMES = 5 # Stack depth kept per allocation by --trace-memory
+TRACEMALLOC_TOP = 30 # Allocation sites listed by --trace-memory
+
+# STARTUP CACHE: parsed copies of INVENTORY_FILE and SALES_INDEX_FILE in binary form (marshal), next to them
+# with this suffix. Each is used only while its source file is unchanged. POS_SNAPSHOT_CACHE=0 turns them off.
+SNAPSHOT_CACHE = os.environ.get('POS_SNAPSHOT_CACHE', '1') != '0'
+SNAPSHOT_CACHE_SUFFIX = '.cache'
+SNAPSHOT_CACHE_VERSION = 1 # Bump when a cached layout changes
+SNAPSHOT_CACHE_MIN_ENTRIES = 10000 # Index entries parsed at startup before the index cache is refreshed
+HISTORY_WAIT_SECONDS = 0.02 # How long the till waits for the background history load before showing the menu
+
+# TRANSACTION ARCHIVE (CSV storage): closed months (or days) are sealed out of SALES_FILE into read-only
+# binary partitions in ARCHIVE_DIR, read through mmap, so the live file only holds the open period
+ARCHIVE_DIR = 'archive'
+ARCHIVE_PERIOD = os.environ.get('POS_ARCHIVE_PERIOD', 'month') # 'month' or 'day'
+ARCHIVE_SUFFIX = '.txp'
+ARCHIVE_MAGIC = b'POSTXP01'
+HISTORY_PAGE_SIZE = 20 # Transactions per page in View/Manage Transactions (newest first)
+
+# Product search settings
+ALIAS_FILE = 'item_aliases.csv' # SKU/barcode aliases of the products (CSV backend)
+SEARCH_LIMIT = 5 # Candidates offered when what was typed is not an exact name or SKU/barcode
+SEARCH_MIN_SIMILARITY = 0.25 # Trigram overlap a misspelt name needs to be offered
+SEARCH_MAX_CANDIDATES = 200 # Names scored for a misspelling, gathered from its rarest trigrams first
+LIST_PAGE_SIZE = 20 # Products per page when listing the catalog
+
+# Checkout settings
+PENDING_STATUS = "UNPAID (GCash Pending)" # Awaiting payment, no stock held (reservation expired, or saved before reservations)
+RESERVED_STATUS = "UNPAID (GCash Reserved)" # Awaiting payment, its stock held until the reservation expires
+UNPAID_STATUSES = (PENDING_STATUS, RESERVED_STATUS)
+STOCK_HOLDING_STATUSES = ('PAID', RESERVED_STATUS) # Transactions whose items are deducted from stock
+RESERVATION_HOURS = 24 # How long a pending GCash order holds its stock
+RESERVATION_CHECK_SECONDS = 60 # How often the service releases expired reservations
+PAYMENT_METHODS = ('Cash', 'GCash')
+BATCH_SIZE = 500 # Orders per grouped write in batch mode
+
+# Service settings ('serve' command: one process shared by tablets and the web storefront)
+SERVICE_HOST = '127.0.0.1'
+SERVICE_PORT = 8080
+SERVICE_COMMIT_WINDOW = 0.005 # Seconds a group commit waits for more writes after the first one
+SERVICE_READ_WORKERS = 4 # Threads serving transaction history reads
+SERVICE_PAGE_SIZE = 100 # Default/maximum transactions per listing page
+SERVICE_MAX_BODY = 1 << 20 # Largest accepted request body, in bytes
+
+# Benchmark settings
+BENCH_SEED = 1234
+BENCH_ITEMS = [10, 1000, 10000]
+BENCH_TRANSACTIONS = [1000, 100000]
+BENCH_TIME_BUDGET = 1.0 # Seconds spent repeating each case
+BENCH_MIN_OPS = 3
+BENCH_MAX_OPS = 10000
+BENCH_TOLERANCE = 0.25 # Allowed p50 slowdown against a baseline before it counts as a regression
+
+# Aggregate cache settings
+AGGREGATE_FILE = 'aggregates.json' # Checkpoint of the running sales totals
+AGGREGATE_CHECKPOINT_EVERY = 20 # Updates between checkpoints (also written at End Session)
+AGGREGATE_VERSION = 2 # Checkpoint layout; an older checkpoint is rebuilt from history (2: amounts in centavos)
+
+# GCash statement reconciliation ('reconcile' command)
+RECONCILE_WINDOW_HOURS = 72 # A payment may arrive up to this long after its order...
+RECONCILE_EARLY_MINUTES = 10 # ...or this much before it (phone and till clocks differ)
+RECONCILE_MIN_NAME_SCORE = 0.5 # Share of the customer's name words found in the statement's sender
+STATEMENT_TIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%dT%H:%M:%S', '%m/%d/%Y %H:%M:%S',
+                          '%m/%d/%Y %H:%M', '%m/%d/%Y %I:%M %p', '%b %d, %Y %I:%M %p']
+
+# Report settings ('report' command)
+REPORT_TOP_N = 10 # Top sellers listed
+UNKNOWN_DAY = 'unknown' # Day/hour group of rows saved before timestamps were recorded
+UNKNOWN_HOUR = 24
+
+# Export settings ('export' command)
+EXPORT_WORKERS = int(os.environ.get('POS_EXPORT_WORKERS', 0)) or os.cpu_count() or 1 # Worker processes
+EXPORT_PARTS_PER_WORKER = 4 # More parts than workers, so a slow part does not leave the others idle
+EXPORT_MIN_PART_BYTES = 4 * 1024 * 1024 # Smaller histories are cut into fewer parts
+EXPORT_MIN_PART_ROWS = 10000 # The same for the SQLite backend, in transactions
+EXPORT_READ_SIZE = 1024 * 1024 # Bytes of rows each worker reads and parses at a time
+
+# Receipt settings
+RECEIPT_PRINTER = os.environ.get('POS_RECEIPT_PRINTER', '') # ESC/POS printer device, named pipe or spool file ('' = none)
+
+# Customer index settings (kept with the aggregate cache)
+CUSTOMER_PHONE_DIGITS = 10 # Trailing digits of a phone number in the customer name that identify the customer
+CUSTOMER_RECENT_ORDERS = 3 # Latest orders shown for a returning customer in Take a Order
+
+# Reorder settings
+REORDER_FILE = 'reorder.json' # Sales velocities behind the low-stock alerts
+REORDER_VELOCITY_DAYS = 7 # Time constant of the rolling sales velocity
+REORDER_ALERT_DAYS = 3 # Alert when an item would sell out within this many days at its current pace...
+REORDER_MIN_STOCK = 5 # ...or when this few units are left
+REORDER_LEAD_DAYS = 3 # Supplier lead time
+REORDER_COVER_DAYS = 14 # Days of sales a reorder should cover on top of the lead time
+REORDER_LIST_SIZE = 10 # Suggestions listed at End Session and by the service
+REORDER_HEAP_SLACK = 1000 # Stale heap entries tolerated before the heap is rebuilt
+
+# Stock journal settings
+JOURNAL_FIELDS = ['op', 'item_key', 'delta', 'price', 'stock']
+JOURNAL_COMPACT_THRESHOLD = 500 # Records in the journal before it is folded into a new snapshot in the background
+
+
+#money
+class Money(int):
+    """An exact amount of pesos, held as an integer number of centavos.
+
+    Sums and differences of Money (and plain ints, taken as centavos) stay Money;
+    multiplying by an int quantity gives the line total. Formats like a float in
+    pesos ("{:.2f}") and prints as exact pesos text ("351.50").
+    """
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, text):
+        """Exact amount of pesos text like "351.5", "₱1,250.00" or "-20" (half a centavo and up rounds away from zero)."""
+        if text[-3:-2] == '.': # As stored: "351.50"
+            digits = text[:-3] + text[-2:]
+            if digits.isdecimal():
+                return cls(int(digits))
+        text = text.strip().replace(',', '').lstrip('₱').strip()
+        if 'e' in text or 'E' in text: # Float notation, e.g. a spreadsheet export
+            return cls.from_pesos(float(text))
+        sign = -1 if text.startswith('-') else 1
+        whole, _, fraction = (text[1:] if text[:1] in ('+', '-') else text).partition('.')
+        if not (whole or fraction) or not (whole or '0').isdecimal() or not (fraction or '0').isdecimal():
+            raise ValueError(f"invalid amount: {text!r}")
+        fraction = fraction.ljust(3, '0')
+        cents = int(whole or '0') * 100 + int(fraction[:2]) + (fraction[2] >= '5')
+        return cls(sign * cents)
+
+    @classmethod
+    def from_pesos(cls, amount):
+        """Money for a float amount of pesos, at the decimal value it prints as (0.1 + 0.2 -> 0.30)."""
+        if not math.isfinite(amount):
+            raise ValueError(f"invalid amount: {amount!r}")
+        text = repr(amount)
+        return cls.parse(f"{amount:.2f}" if 'e' in text else text)
+
+    @classmethod
+    def of(cls, value):
+        """Money for an amount given as Money, pesos text or a Decimal number of pesos.
+
+        A bare int is refused (Money(n) is n centavos, arithmetic takes ints as
+        centavos too), and so is a float: convert one with from_pesos().
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, str):
+            return cls.parse(value)
+        if isinstance(value, (int, float)):
+            raise TypeError(f"ambiguous amount {value!r}: use Money(centavos) or Money.from_pesos(pesos)")
+        return cls.parse(str(value)) # Decimal
+
+    @staticmethod
+    def _not_centavos(other):
+        # Returning NotImplemented would let float/Decimal fall back to their own arithmetic on our int value
+        if isinstance(other, numbers.Number):
+            raise TypeError(f"cannot mix Money with {type(other).__name__} {other!r}: use Money.of() or Money.from_pesos()")
+        return NotImplemented
+
+    def __add__(self, other):
+        return Money(int(self) + other) if isinstance(other, int) else self._not_centavos(other)
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Money(int(self) - other) if isinstance(other, int) else self._not_centavos(other)
+
+    def __rsub__(self, other):
+        return Money(other - int(self)) if isinstance(other, int) else self._not_centavos(other)
+
+    def __mul__(self, qty):
+        return Money(int(self) * qty) if isinstance(qty, int) and not isinstance(qty, Money) else self._not_centavos(qty)
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return Money(-int(self))
+
+    def __abs__(self):
+        return Money(abs(int(self)))
+
+    def pesos(self):
+        """The amount as a float number of pesos, for JSON output."""
+        return int(self) / 100
+
+    def __str__(self):
+        cents = int(self)
+        return f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+    def __repr__(self):
+        return f"Money('{self}')"
+
+    def __format__(self, spec):
+        """Exact pesos text ("351.50"), right-aligned like a number when spec gives a width ("{:>10}", "{:9.2f}").
+
+        Other specs (a sign, grouping, another precision) format the amount as a float number of pesos.
+        """
+        width_spec = spec[:-3] if spec.endswith('.2f') else spec
+        align = width_spec.rstrip('0123456789')
+        if len(align) <= 2 and (not align or align[-1] in '<>^') and not width_spec[len(align):].startswith('0'):
+            return format(str(self), (align or '>') + width_spec[len(align):])
+        return format(int(self) / 100, spec)
+
+_prices_decoder = json.JSONDecoder(parse_float=Money.parse, parse_int=Money.parse) # JSON numbers read as exact Money
+
+def to_centavos(amount):
+    """Integer centavos of an amount given as Money or pesos text (see Money.of())."""
+    return int(amount if type(amount) is Money else Money.of(amount))
+
+#transaction csv
+def order_items_of(tx):
+    """Return tx['order_items'] as a dict, decoding the JSON text of a streamed row on first use."""
+    items = tx['order_items']
+    if isinstance(items, str):
+        items = tx['order_items'] = json.loads(items)
+    return items
+
+def item_prices_of(tx):
+    """Return the unit prices charged per item (empty for rows saved before prices were recorded)."""
+    prices = tx.get('item_prices') or {}
+    if isinstance(prices, str):
+        prices = tx['item_prices'] = _prices_decoder.decode(prices)
+    return prices
+
+def item_prices_json(tx):
+    """item_prices as JSON text for storage, each price as an exact two-decimal number ({"fish": 100.50})."""
+    return '{' + ', '.join(f"{json.dumps(item_key)}: {Money.of(price)}" for item_key, price in item_prices_of(tx).items()) + '}'
+
+def line_totals(tx):
+    """Return {item_key: (qty, revenue)} for a transaction.
+
+    Rows saved without item_prices split total_amount across the items by quantity.
+    """
+    items = order_items_of(tx)
+    prices = item_prices_of(tx)
+    if prices:
+        return {item_key: (qty, qty * prices.get(item_key, Money(0))) for item_key, qty in items.items()}
+    # Split in whole centavos; the centavos left over go one each to the first lines so the lines add up to the total
+    total_qty = sum(items.values()) or 1
+    total = to_centavos(tx['total_amount'])
+    shares = {item_key: total * qty // total_qty for item_key, qty in items.items()}
+    left = total - sum(shares.values())
+    totals = {}
+    for item_key, qty in items.items():
+        extra = 1 if left > 0 else 0
+        left -= extra
+        totals[item_key] = (qty, Money(shares[item_key] + extra))
+    return totals
+
+#instrumentation
+class Histogram:
+    """Latency histogram over METRIC_BUCKETS, in the shape Prometheus expects."""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(METRIC_BUCKETS) + 1) # Last slot: above the largest bucket
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(METRIC_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+_metrics_lock = threading.Lock()
+_histograms = {} # name -> Histogram of seconds
+_counters = {} # name -> running total
+
+def observe(name, seconds):
+    """Record one timing (no-op unless POS_METRICS=1)."""
+    if METRICS_ENABLED:
+        with _metrics_lock:
+            histogram = _histograms.get(name)
+            if histogram is None:
+                histogram = _histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+def count(name, amount=1):
+    """Add to a counter such as bytes_written or rows_rewritten (no-op unless POS_METRICS=1)."""
+    if METRICS_ENABLED:
+        with _metrics_lock:
+            _counters[name] = _counters.get(name, 0) + amount
+
+def timed(name):
+    """Decorator timing every call into the histogram name.
+
+    Without POS_METRICS=1 the function is returned untouched, so the hot
+    paths pay nothing for being instrumentable.
+    """
+    def decorate(func):
+        if not METRICS_ENABLED:
+            return func
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def metrics_text():
+    """The histograms and counters in the Prometheus text exposition format."""
+    lines = []
+    with _metrics_lock:
+        for name, histogram in sorted(_histograms.items()):
+            metric = f"pos_{name}_seconds"
+            lines.append(f"# HELP {metric} Time spent in {name}.")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, bucket_count in zip(METRIC_BUCKETS, histogram.counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+            lines.append(f"{metric}_sum {histogram.total:.6f}")
+            lines.append(f"{metric}_count {histogram.count}")
+        for name, value in sorted(_counters.items()):
+            lines.append(f"# TYPE pos_{name}_total counter")
+            lines.append(f"pos_{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path=None):
+    """Write the metrics to METRICS_FILE (e.g. for node_exporter's textfile collector)."""
+    path = path or METRICS_FILE
+    try:
+        with atomic_write(path) as file:
+            file.write(metrics_text())
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+@contextmanager
+def profiled_session(profile_path=None, trace_path=None):
+    """Capture a cProfile profile and/or the top tracemalloc allocations of one run.
+
+    The profile covers the main thread (the till, batch and report commands;
+    the service's worker threads are not included).
+    """
+    profiler = None
+    if profile_path:
+        import cProfile # Only when asked for
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if trace_path:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile_path)
+            print(f"Profile written to {profile_path} (view it with: python -m pstats {profile_path})")
+        if trace_path:
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, '*/cProfile.py'), # --profile's own bookkeeping
+            ))
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            with open(trace_path, mode='w') as file:
+                file.write(f"Traced memory: {current / 1024:.1f} KiB now, {peak / 1024:.1f} KiB peak\n")
+                file.write(f"Top {TRACEMALLOC_TOP} allocation sites:\n")
+                for stat in snapshot.statistics('lineno')[:TRACEMALLOC_TOP]:
+                    file.write(f"{stat}\n")
+            print(f"Memory allocations written to {trace_path}")
+
+if METRICS_ENABLED:
+    atexit.register(write_metrics)
+
+#compact catalog
+_item_ids = {} # item_key -> item id, shared by the catalog and the transaction records
+_item_keys = [] # item id -> item_key
+
+def item_id(item_key):
+    """Intern an item key, returning its small integer id."""
+    item_id_ = _item_ids.get(item_key)
+    if item_id_ is None:
+        item_id_ = _item_ids[item_key] = len(_item_keys)
+        _item_keys.append(item_key)
+    return item_id_
+
+class Catalog:
+    """Menu and stock stored by item id: prices in centavos and stock counts in parallel arrays.
+
+    .menu and .stock are dict-like views over it, so the code written for
+    the two parallel dicts keeps working unchanged.
+    """
+
+    ON_MENU = 1
+    IN_STOCK = 2
+
+    def __init__(self, menu=None, stock=None):
+        self.prices = array('q') # Centavos, by item id
+        self.counts = array('q') # Stock, by item id
+        self.flags = bytearray() # ON_MENU / IN_STOCK, by item id
+        self.menu = CatalogMenu(self)
+        self.stock = CatalogStock(self)
+        self.menu.update(menu or {})
+        self.stock.update(stock or {})
+
+    @classmethod
+    def from_columns(cls, keys, prices, counts):
+        """Build a catalog of items on the menu from parallel columns: item keys, centavo prices and stock.
+
+        On a fresh start (nothing interned yet) the item ids are simply the
+        positions, so the columns are taken over whole instead of item by item.
+        """
+        catalog = cls()
+        if not _item_keys:
+            _item_ids.update(zip(keys, range(len(keys))))
+            if len(_item_ids) == len(keys):
+                _item_keys.extend(keys)
+                catalog.prices = array('q', prices)
+                catalog.counts = array('q', counts)
+                catalog.flags = bytearray([cls.ON_MENU | cls.IN_STOCK]) * len(keys)
+                catalog.menu.size = catalog.stock.size = len(keys)
+                return catalog
+            _item_ids.clear() # A key is listed twice: the last one wins, as with dicts
+        for item_key, price, qty in zip(keys, prices, counts):
+            item_id_ = catalog.slot(item_key, create=True)
+            if not catalog.flags[item_id_]:
+                catalog.menu.size += 1
+                catalog.stock.size += 1
+            catalog.prices[item_id_] = price
+            catalog.counts[item_id_] = qty
+            catalog.flags[item_id_] = cls.ON_MENU | cls.IN_STOCK
+        return catalog
+
+    def slot(self, item_key, create=False):
+        """The item id of item_key, growing the arrays to fit it when create is set (else None if unknown)."""
+        item_id_ = item_id(item_key) if create else _item_ids.get(item_key)
+        if item_id_ is not None and item_id_ >= len(self.flags):
+            if not create:
+                return None
+            grow = item_id_ + 1 - len(self.flags)
+            self.prices.extend(itertools.repeat(0, grow))
+            self.counts.extend(itertools.repeat(0, grow))
+            self.flags.extend(bytes(grow))
+        return item_id_
+
+_catalog_generations = itertools.count(1)
+
+class _CatalogView(MutableMapping):
+    __slots__ = ('catalog', 'size', 'generation')
+    FLAG = 0
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.size = 0
+        self.generation = next(_catalog_generations) # Renewed whenever a key is added or removed, unique across views
+
+    def _get(self, item_id_):
+        raise NotImplementedError
+
+    def _set(self, item_id_, value):
+        raise NotImplementedError
+
+    def __getitem__(self, item_key):
+        item_id_ = self.catalog.slot(item_key)
+        if item_id_ is None or not self.catalog.flags[item_id_] & self.FLAG:
+            raise KeyError(item_key)
+        return self._get(item_id_)
+
+    def __setitem__(self, item_key, value):
+        item_id_ = self.catalog.slot(item_key, create=True)
+        self._set(item_id_, value)
+        if not self.catalog.flags[item_id_] & self.FLAG:
+            self.catalog.flags[item_id_] |= self.FLAG
+            self.size += 1
+            self.generation = next(_catalog_generations)
+
+    def __delitem__(self, item_key):
+        item_id_ = self.catalog.slot(item_key)
+        if item_id_ is None or not self.catalog.flags[item_id_] & self.FLAG:
+            raise KeyError(item_key)
+        self.catalog.flags[item_id_] &= ~self.FLAG
+        self.size -= 1
+        self.generation = next(_catalog_generations)
+
+    def __contains__(self, item_key):
+        item_id_ = self.catalog.slot(item_key)
+        return item_id_ is not None and bool(self.catalog.flags[item_id_] & self.FLAG)
+
+    def __iter__(self):
+        flags = self.catalog.flags
+        return (_item_keys[item_id_] for item_id_ in range(len(flags)) if flags[item_id_] & self.FLAG)
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        for item_id_ in range(len(self.catalog.flags)):
+            self.catalog.flags[item_id_] &= ~self.FLAG
+        self.size = 0
+        self.generation = next(_catalog_generations)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class CatalogMenu(_CatalogView):
+    """menu view of a Catalog: item_key -> price as Money (stored as centavos)."""
+    __slots__ = ()
+    FLAG = Catalog.ON_MENU
+
+    def _get(self, item_id_):
+        return Money(self.catalog.prices[item_id_])
+
+    def _set(self, item_id_, price):
+        self.catalog.prices[item_id_] = to_centavos(price)
+
+class CatalogStock(_CatalogView):
+    """stock view of a Catalog: item_key -> units in stock."""
+    __slots__ = ()
+    FLAG = Catalog.IN_STOCK
+
+    def _get(self, item_id_):
+        return self.catalog.counts[item_id_]
+
+    def _set(self, item_id_, qty):
+        self.catalog.counts[item_id_] = qty
+
+def make_catalog(menu, stock):
+    """Move plain menu/stock dicts into a Catalog and return its (menu, stock) views."""
+    if isinstance(menu, CatalogMenu):
+        return menu, stock # Already a Catalog
+    catalog = Catalog(menu, stock)
+    return catalog.menu, catalog.stock
+
+class TxRecord(Mapping):
+    """A transaction kept in memory in compact form.
+
+    The order lines are one array of (item id, qty, unit price in centavos)
+    triples instead of two dicts, and the repeated strings are interned.
+    It reads like the transaction dicts used elsewhere (tx['customer'],
+    tx.get(...), dict(tx, status=...)); order_items/item_prices are built on access.
+    """
+
+    __slots__ = ('tx_id', 'customer', 'total_amount', 'method', 'status', 'created_at', 'lines')
+
+    def __init__(self, tx):
+        self.tx_id = tx.get('tx_id')
+        self.customer = sys.intern(tx['customer']) # Regular customers repeat across the history
+        self.total_amount = Money.of(tx['total_amount'])
+        self.method = sys.intern(tx['method'])
+        self.status = sys.intern(tx['status'])
+        self.created_at = sys.intern(tx.get('created_at') or '')
+        self._set_lines(order_items_of(tx), item_prices_of(tx))
+
+    def _set_lines(self, items, prices):
+        lines = array('q')
+        for item_key, qty in items.items():
+            price = prices.get(item_key)
+            lines.extend((item_id(item_key), qty, -1 if price is None else to_centavos(price)))
+        self.lines = lines
+
+    def __getitem__(self, key):
+        if key == 'order_items':
+            lines = self.lines
+            return {_item_keys[lines[i]]: lines[i + 1] for i in range(0, len(lines), 3)}
+        if key == 'item_prices':
+            lines = self.lines
+            return {_item_keys[lines[i]]: Money(lines[i + 2]) for i in range(0, len(lines), 3) if lines[i + 2] >= 0}
+        if key in TX_FIELDS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'order_items':
+            self._set_lines(value, self['item_prices'])
+        elif key == 'item_prices':
+            self._set_lines(self['order_items'], value)
+        elif key in TX_FIELDS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __iter__(self):
+        return iter(TX_FIELDS)
+
+    def __len__(self):
+        return len(TX_FIELDS)
+
+    def copy(self):
+        """A plain dict copy, like dict.copy()."""
+        return dict(self)
+
+    def __repr__(self):
+        return f"TxRecord({dict(self)!r})"
+
+#durable files
+@contextmanager
+def atomic_write(path, mode='w', newline=''):
+    """Open a temp file to write path's new contents; on success it is fsynced and renamed over path.
+
+    Readers and a crash at any point see either the old file or the new one, never half of one.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" # One per writer: threads may replace the same file
+    try:
+        with open(tmp_path, mode=mode, newline=None if 'b' in mode else newline) as file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    if METRICS_ENABLED:
+        count('files_opened')
+        count('fsyncs')
+        count('bytes_written', os.path.getsize(path))
+    fsync_directory(path)
+
+def fsync_directory(path):
+    """Make a rename or a new file in path's directory durable (not supported everywhere, e.g. Windows)."""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+        count('fsyncs')
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def repair_torn_tail(path):
+    """Cut off a record left half-written at the end of an append-only file by a crash.
+
+    The fragment is kept in path + '.torn' for inspection. Returns True if the
+    file was repaired. Call it under the storage lock, where no append is in flight.
+    """
+    with open(path, mode='rb+') as file:
+        size = file.seek(0, os.SEEK_END)
+        if size == 0:
+            return False
+        file.seek(size - 1)
+        if file.read(1) == b'\n':
+            return False
+        keep = 0
+        position = size
+        while position > 0:
+            start = max(0, position - 65536)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b'\n')
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            position = start
+        file.seek(keep)
+        fragment = file.read()
+        with open(path + '.torn', mode='ab') as torn_file:
+            torn_file.write(fragment + b'\n')
+        file.truncate(keep)
+        file.flush()
+        os.fsync(file.fileno())
+    if keep == 0:
+        os.remove(path) # Only a partial header was written: the next append starts the file afresh
+    print(f"⚠️ Repaired {path}: a record cut short by a crash was moved to {path}.torn")
+    return True
+
+class FsyncBatcher:
+    """Group commit for appends: files appended to within one window share a single fsync.
+
+    With a window of 0 every append is fsynced before it returns. Otherwise
+    a crash (power loss, not just the POS exiting) can lose at most the last
+    window of appends, and flush() makes everything durable right away.
+    """
+
+    def __init__(self, window=FSYNC_WINDOW):
+        self.window = window
+        self.pending = set() # Paths appended to since the last fsync
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def written(self, file):
+        """Call after appending to file, while it is still open."""
+        file.flush()
+        if self.window <= 0:
+            os.fsync(file.fileno())
+            count('fsyncs')
+            return
+        with self.lock:
+            self.pending.add(file.name)
+            if self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        """fsync every file appended to since the last flush."""
+        with self.lock:
+            paths = self.pending
+            self.pending = set()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+            except FileNotFoundError:
+                continue # Rotated away by a compaction, whose snapshot is fsynced itself
+            try:
+                os.fsync(fd)
+                count('fsyncs')
+            finally:
+                os.close(fd)
+
+_fsync_batcher = FsyncBatcher()
+atexit.register(_fsync_batcher.flush)
+
+def appended(file):
+    """Mark an append to file for the next group fsync (or fsync it now with POS_FSYNC_WINDOW=0)."""
+    _fsync_batcher.written(file)
+
+def flush_writes():
+    """Make every append so far durable now, e.g. before acknowledging a group of orders."""
+    _fsync_batcher.flush()
+
+#snapshot cache
+def file_signature(path):
+    """(inode, mtime, size) of a path or open file descriptor, or None if it is missing.
+
+    Replacing or writing the file changes it, so a cache made from the file
+    is still good while the signature matches.
+    """
+    try:
+        info = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return info.st_ino, info.st_mtime_ns, info.st_size
+
+def read_snapshot_cache(source):
+    """Return (signature, value) saved for source by write_snapshot_cache(), or (None, None).
+
+    The caller compares the signature with source's current one.
+    """
+    if not SNAPSHOT_CACHE:
+        return None, None
+    try:
+        with open(source + SNAPSHOT_CACHE_SUFFIX, mode='rb') as file:
+            version, signature, value = marshal.loads(file.read()) # One read: marshal.load(file) reads in small pieces
+    except (OSError, EOFError, ValueError, TypeError):
+        return None, None # Missing, torn or written by another version: parse the source instead
+    if version != SNAPSHOT_CACHE_VERSION:
+        return None, None
+    return signature, value
+
+def write_snapshot_cache(source, signature, value):
+    """Save value, parsed from source while it had signature, so the next start can skip the parsing."""
+    if not SNAPSHOT_CACHE or signature is None:
+        return
+    try:
+        with atomic_write(source + SNAPSHOT_CACHE_SUFFIX, mode='wb') as file:
+            marshal.dump((SNAPSHOT_CACHE_VERSION, signature, value), file)
+    except (OSError, ValueError) as e:
+        print(f"Error saving the startup cache for {source}: {e}")
+
+#transaction archive
+ARCHIVE_HEADER = struct.Struct('<8sQQQqqqq') # Magic, records, strings offset, index offset, first/last time, min/max tx_id
+ARCHIVE_RECORD = struct.Struct('<qqqIIII') # tx_id, time, total (centavos), customer, method, status (string ids), lines
+ARCHIVE_LINE = struct.Struct('<Iqq') # Item (string id), qty, unit price in centavos (-1: not recorded)
+
+def archive_period(created_at):
+    """The partition a transaction belongs to: 'YYYY-MM' (or 'YYYY-MM-DD' by day), '' if it has no timestamp."""
+    created_at = created_at or ''
+    if len(created_at) < 10 or not created_at[:4].isdigit():
+        return ''
+    return created_at[:10] if ARCHIVE_PERIOD == 'day' else created_at[:7]
+
+def timestamp_number(text):
+    """'YYYY-MM-DD HH:MM:SS' (or a prefix of it, e.g. a day) as the sortable integer YYYYMMDDHHMMSS."""
+    digits = ''.join(ch for ch in (text or '') if ch.isdigit())[:14]
+    return int(digits.ljust(14, '0')) if digits else 0
+
+def _timestamp_text(number):
+    if not number:
+        return ''
+    text = f"{number:014d}"
+    return f"{text[0:4]}-{text[4:6]}-{text[6:8]} {text[8:10]}:{text[10:12]}:{text[12:14]}"
+
+class ArchivePartition:
+    """One sealed period of the transaction history: a read-only file read through mmap.
+
+    Layout: the header, the records (ARCHIVE_RECORD followed by its order
+    lines, in time order), the string table (marshal) and the index: record
+    times and offsets, then tx_ids in order with the offsets of their records.
+    Only the header is read when the partition is opened; range queries and
+    lookups bisect the index in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        name = os.path.basename(path)[:-len(ARCHIVE_SUFFIX)]
+        self.period = '' if name == 'undated' else name
+        self.map = None
+        self.strings = None
+
+    def _open(self):
+        if self.map is not None:
+            return
+        with open(self.path, mode='rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, self.count, self.strings_offset, index_offset,
+         self.first_time, self.last_time, self.min_tx, self.max_tx) = ARCHIVE_HEADER.unpack_from(self.map)
+        if magic != ARCHIVE_MAGIC:
+            self.close()
+            raise ValueError(f"{self.path} is not a transaction archive partition")
+        self.index_offset = index_offset
+        index = memoryview(self.map)[index_offset:index_offset + 32 * self.count].cast('q')
+        count = self.count
+        self.times, self.offsets = index[:count], index[count:2 * count]
+        self.tx_ids, self.tx_offsets = index[2 * count:3 * count], index[3 * count:]
+        self.index = index
+
+    def close(self):
+        """Unmap the file (before it is replaced)."""
+        if self.map is not None:
+            for view in (self.times, self.offsets, self.tx_ids, self.tx_offsets, self.index):
+                view.release()
+            self.map.close()
+            self.map = self.strings = None
+
+    def open(self):
+        """Map the file (on first use) and return the partition."""
+        self._open()
+        return self
+
+    def _decode(self, offset):
+        if self.strings is None:
+            self.strings = marshal.loads(self.map[self.strings_offset:self.index_offset])
+        strings = self.strings
+        tx_id, created, cents, customer, method, status, lines = ARCHIVE_RECORD.unpack_from(self.map, offset)
+        offset += ARCHIVE_RECORD.size
+        order_items = {}
+        item_prices = {}
+        for item, qty, price in ARCHIVE_LINE.iter_unpack(self.map[offset:offset + lines * ARCHIVE_LINE.size]):
+            order_items[strings[item]] = qty
+            if price >= 0:
+                item_prices[strings[item]] = Money(price)
+        return {'tx_id': tx_id, 'customer': strings[customer], 'total_amount': Money(cents), 'method': strings[method],
+                'status': strings[status], 'order_items': order_items, 'item_prices': item_prices,
+                'created_at': _timestamp_text(created)}
+
+    def get(self, tx_id):
+        self._open()
+        i = bisect.bisect_left(self.tx_ids, tx_id)
+        if i < self.count and self.tx_ids[i] == tx_id:
+            return self._decode(self.tx_offsets[i])
+        return None
+
+    def iter_between(self, start=None, end=None):
+        """Yield the transactions with start <= created_at < end (timestamps or prefixes such as a day), oldest first."""
+        self._open()
+        low = 0 if start is None else bisect.bisect_left(self.times, timestamp_number(start))
+        high = self.count if end is None else bisect.bisect_left(self.times, timestamp_number(end))
+        for i in range(low, high):
+            yield self._decode(self.offsets[i])
+
+    def iter_reversed(self):
+        """Yield the transactions newest first."""
+        self._open()
+        for i in range(self.count - 1, -1, -1):
+            yield self._decode(self.offsets[i])
+
+    def iter_after(self, tx_id):
+        """Yield the transactions with a tx_id above tx_id, in tx_id order."""
+        self._open()
+        for i in range(bisect.bisect_right(self.tx_ids, tx_id), self.count):
+            yield self._decode(self.tx_offsets[i])
+
+    @staticmethod
+    def write(path, transactions):
+        """Seal transactions into a new partition file at path (atomically)."""
+        transactions = sorted(transactions, key=lambda tx: (timestamp_number(tx.get('created_at')), tx['tx_id']))
+        strings = {}
+        def string_id(text):
+            code = strings.get(text)
+            if code is None:
+                code = strings[text] = len(strings)
+            return code
+
+        body = bytearray()
+        times, offsets = array('q'), array('q')
+        for tx in transactions:
+            items = order_items_of(tx)
+            prices = item_prices_of(tx)
+            created = timestamp_number(tx.get('created_at'))
+            times.append(created)
+            offsets.append(ARCHIVE_HEADER.size + len(body))
+            body += ARCHIVE_RECORD.pack(tx['tx_id'], created, to_centavos(tx['total_amount']), string_id(tx['customer']),
+                                        string_id(tx['method']), string_id(tx['status']), len(items))
+            for item_key, qty in items.items():
+                price = prices.get(item_key)
+                body += ARCHIVE_LINE.pack(string_id(item_key), qty, -1 if price is None else to_centavos(price))
+        string_table = marshal.dumps(list(strings))
+        strings_offset = ARCHIVE_HEADER.size + len(body)
+        padding = -(strings_offset + len(string_table)) % 8 # The index is read as 8-byte integers
+        by_id = sorted(zip((tx['tx_id'] for tx in transactions), offsets))
+        header = ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, len(transactions), strings_offset, strings_offset + len(string_table) + padding,
+                                     times[0] if times else 0, times[-1] if times else 0,
+                                     by_id[0][0] if by_id else 0, by_id[-1][0] if by_id else 0)
+        with atomic_write(path, mode='wb') as file:
+            file.write(header)
+            file.write(body)
+            file.write(string_table + bytes(padding))
+            file.write(times.tobytes())
+            file.write(offsets.tobytes())
+            file.write(array('q', (tx_id for tx_id, _ in by_id)).tobytes())
+            file.write(array('q', (offset for _, offset in by_id)).tobytes())
+
+class TransactionArchive:
+    """The sealed partitions in ARCHIVE_DIR, one per closed month (or day) of the history."""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.partitions = {} # period -> ArchivePartition
+        self.refresh()
+
+    def refresh(self):
+        """Pick up partitions sealed by another till."""
+        for partition in self.partitions.values():
+            partition.close()
+        self.partitions = {}
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(ARCHIVE_SUFFIX):
+                    partition = ArchivePartition(os.path.join(self.directory, name))
+                    self.partitions[partition.period] = partition
+
+    def _path(self, period):
+        return os.path.join(self.directory, (period or 'undated') + ARCHIVE_SUFFIX)
+
+    def max_tx_id(self):
+        return max((partition.open().max_tx for partition in self.partitions.values()), default=0)
+
+    def get(self, tx_id):
+        for period in sorted(self.partitions, reverse=True):
+            partition = self.partitions[period].open()
+            if partition.min_tx <= tx_id <= partition.max_tx:
+                tx = partition.get(tx_id)
+                if tx is not None:
+                    return tx
+        return None
+
+    def iter_between(self, start=None, end=None):
+        """Yield archived transactions with start <= created_at < end, opening only the partitions of that period."""
+        for period in sorted(self.partitions):
+            if start is not None or end is not None:
+                # A period covers the timestamps it prefixes; undated transactions are in no period
+                if not period or (end is not None and period >= end) or (start is not None and period + '~' <= start):
+                    continue
+            yield from self.partitions[period].iter_between(start, end)
+
+    def iter_recent(self):
+        """Yield archived transactions newest first, opening older partitions only when reached."""
+        for period in sorted(self.partitions, reverse=True):
+            yield from self.partitions[period].iter_reversed()
+
+    def iter_after(self, tx_id):
+        """Yield archived transactions with a tx_id above tx_id, in tx_id order across the partitions."""
+        partitions = [partition for partition in map(ArchivePartition.open, self.partitions.values()) if partition.max_tx > tx_id]
+        return heapq.merge(*(partition.iter_after(tx_id) for partition in partitions), key=lambda tx: tx['tx_id'])
+
+    def seal(self, period, records):
+        """Merge the latest records of a closed period into its partition (voids take transactions out)."""
+        merged = {}
+        partition = self.partitions.pop(period, None)
+        if partition is not None:
+            merged = {tx['tx_id']: tx for tx in partition.iter_between()}
+            partition.close()
+        for tx in records:
+            if tx['status'] == VOID_STATUS:
+                merged.pop(tx['tx_id'], None)
+            else:
+                merged[tx['tx_id']] = tx
+        path = self._path(period)
+        if not merged:
+            if os.path.exists(path):
+                os.remove(path)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        ArchivePartition.write(path, merged.values())
+        self.partitions[period] = ArchivePartition(path)
+
+class TransactionStore:
+    """Append-only transaction history in SALES_FILE with an on-disk offset index.
+
+    Every transaction gets a stable tx_id. Voids are appended as tombstone
+    records for the same tx_id, and SALES_INDEX_FILE maps each tx_id to the
+    byte offset of its latest record, so one transaction can be looked up or
+    voided without reading or rewriting the whole history.
+
+    Transactions of closed periods are sealed into a TransactionArchive (see
+    seal()); lookups, voids and the streams below cover both.
+    """
+
+    def __init__(self, path=SALES_FILE, index_path=SALES_INDEX_FILE, archive_dir=ARCHIVE_DIR):
+        self.path = path
+        self.index_path = index_path
+        self.archive = TransactionArchive(archive_dir)
+        self.index = {} # tx_id -> offset of the latest record
+        self.tx_ids = array('q') # The tx_ids of index in ascending order, for newest-first and cursor reads
+        self.next_id = 1
+        self.end = 0 # End of the last complete record this process has seen
+        self.malformed = set() # Offsets of lines already warned about, see _read_row()
+        self.inode = None # Of the SALES_FILE the index is for: a rewrite (seal, compaction) replaces the file
+        self._load_index()
+
+    def _load_index(self):
+        if os.path.exists(self.path):
+            repair_torn_tail(self.path)
+        if not os.path.exists(self.path):
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path) # Stale index for a history that no longer exists
+            self.inode = None
+            self.tx_ids = array('q')
+            self.next_id = self.archive.max_tx_id() + 1
+            return
+        self._migrate_legacy_file()
+        self.inode = os.stat(self.path).st_ino
+
+        indexed_end = 0
+        if os.path.exists(self.index_path):
+            position, indexed_end = self._load_cached_index()
+            entries = 0
+            last_line = None
+            with open(self.index_path, mode='rb') as file:
+                file.seek(position)
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break # Torn index line, the tail scan below picks it up again
+                    position += len(line)
+                    last_line = line
+                    try:
+                        tx_id, offset, end = (int(part) for part in line.split(b','))
+                    except ValueError:
+                        continue
+                    self.index[tx_id] = offset
+                    indexed_end = max(indexed_end, end)
+                    entries += 1
+            if entries >= SNAPSHOT_CACHE_MIN_ENTRIES:
+                self._save_cached_index(position, last_line, indexed_end)
+
+        if indexed_end > os.path.getsize(self.path):
+            # Index is ahead of the data file (history replaced by hand), start over
+            self.index = {}
+            indexed_end = 0
+            os.remove(self.index_path)
+        self.end = self._index_tail(indexed_end)
+        self.tx_ids = array('q', sorted(self.index)) # Already in order but for the odd void of a sealed transaction
+        self.next_id = max(max(self.index, default=0), self.archive.max_tx_id()) + 1
+
+    def _load_cached_index(self):
+        """Restore the index from its startup cache. Returns (position in SALES_INDEX_FILE to read on from, indexed end).
+
+        The index file is only ever appended to or replaced, so a cache made
+        when it was shorter is still good for that part of it.
+        """
+        signature, cached = read_snapshot_cache(self.index_path)
+        current = file_signature(self.index_path)
+        if cached is None or current is None or signature[0] != current[0] or signature[2] > current[2]:
+            return 0, 0
+        tx_ids, offsets, indexed_end, last_line = cached
+        with open(self.index_path, mode='rb') as file:
+            file.seek(signature[2] - len(last_line))
+            if file.read(len(last_line)) != last_line:
+                return 0, 0 # Another index file that happens to reuse the inode
+        self.index = dict(zip(array('q', tx_ids), array('q', offsets)))
+        return signature[2], indexed_end
+
+    def _save_cached_index(self, position, last_line, indexed_end):
+        inode, mtime, _ = file_signature(self.index_path)
+        tx_ids = array('q', self.index.keys()).tobytes()
+        offsets = array('q', self.index.values()).tobytes()
+        write_snapshot_cache(self.index_path, (inode, mtime, position), (tx_ids, offsets, indexed_end, last_line))
+
+    def _migrate_legacy_file(self):
+        """Bring an older SALES_FILE up to TX_FIELDS (runs once).
+
+        Rows without a tx_id get a stable one; item_prices and created_at are
+        left empty because they were never recorded. Amounts saved as float
+        text ("0.30000000000000004") are rewritten as exact pesos ("0.30").
+        """
+        with open(self.path, mode='r', newline='') as file:
+            header = next(csv.reader(file), [])
+        if header == TX_FIELDS:
+            return
+        if not set(LEGACY_TX_FIELDS) <= set(header) <= set(TX_FIELDS):
+            raise ValueError(f"unrecognised header in {self.path}: {header}")
+        with open(self.path, mode='r', newline='') as file:
+            rows = list(csv.DictReader(file))
+        with atomic_write(self.path) as file:
+            writer = csv.DictWriter(file, fieldnames=TX_FIELDS, restval='')
+            writer.writeheader()
+            for tx_id, row in enumerate(rows, 1):
+                row.setdefault('tx_id', tx_id)
+                row['total_amount'] = Money.parse(row['total_amount'])
+                if row.get('item_prices'):
+                    row['item_prices'] = item_prices_json(row)
+                writer.writerow(row)
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+        print(f"Migrated {len(rows)} transactions in {self.path} to the current format.")
+
+    def _iter_lines(self, start=0):
+        """Yield (offset, end, line) for each complete record from position start on."""
+        with open(self.path, mode='rb') as file:
+            if start == 0:
+                file.readline() # Header
+            else:
+                file.seek(start)
+            while True:
+                offset = file.tell()
+                line = file.readline()
+                if not line.endswith(b'\n'):
+                    break # EOF or a partial trailing row
+                yield offset, file.tell(), line
+
+    def _index_tail(self, start):
+        """Index records written after position start (e.g. after a crash before the index write).
+
+        Returns the end of the last complete record.
+        """
+        entries = []
+        for offset, end, line in self._iter_lines(start):
+            start = end
+            row = self._read_row(offset, line)
+            if row is None:
+                continue
+            tx_id = int(row['tx_id'])
+            self.index[tx_id] = offset
+            entries.append(f"{tx_id},{offset},{end}\n")
+        if entries:
+            with open(self.index_path, mode='a') as file:
+                file.writelines(entries)
+        return start
+
+    @staticmethod
+    def _parse_line(line):
+        values = next(csv.reader([line.decode('utf-8')]))
+        return dict(zip(TX_FIELDS, values))
+
+    def _read_row(self, offset, line):
+        """Parse one line of SALES_FILE, or warn and return None when it is not a whole record.
+
+        Such a line (e.g. half of a record split by a stray line break) is
+        skipped rather than stopping the whole history from loading.
+        """
+        try:
+            values = next(csv.reader([line.decode('utf-8')], strict=True))
+            int(values[0])
+        except (csv.Error, UnicodeDecodeError, ValueError, IndexError, StopIteration):
+            values = None
+        if values is None or len(values) != len(TX_FIELDS):
+            if offset not in self.malformed:
+                self.malformed.add(offset)
+                print(f"Warning: skipping malformed record at byte {offset} of {self.path}.")
+            return None
+        return dict(zip(TX_FIELDS, values))
+
+    def _iter_rows(self, start=0):
+        """Yield (offset, end, row) for each well-formed record from position start on."""
+        for offset, end, line in self._iter_lines(start):
+            row = self._read_row(offset, line)
+            if row is not None:
+                yield offset, end, row
+
+    @staticmethod
+    def _decode(row):
+        # Convert tx_id to a number, total_amount to Money and order_items/item_prices (JSON strings) back to dicts
+        row['tx_id'] = int(row['tx_id'])
+        row['total_amount'] = Money.parse(row['total_amount'])
+        order_items_of(row)
+        item_prices_of(row)
+        return row
+
+    @staticmethod
+    def _encode(tx):
+        tx_to_save = tx.copy()
+        tx_to_save['total_amount'] = str(Money.of(tx['total_amount']))
+        tx_to_save['order_items'] = json.dumps(order_items_of(tx))
+        tx_to_save['item_prices'] = item_prices_json(tx)
+        return tx_to_save
+
+    def _write(self, txs):
+        """Append records with one write to SALES_FILE and one to the index."""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=TX_FIELDS, extrasaction='ignore')
+        if not os.path.exists(self.path):
+            writer.writeheader()
+        rows = [buffer.getvalue().encode('utf-8')]
+        for tx in txs:
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerow(self._encode(tx))
+            rows.append(buffer.getvalue().encode('utf-8'))
+
+        entries = []
+        with open(self.path, mode='ab') as file:
+            offset = file.tell() + len(rows[0])
+            file.write(b''.join(rows))
+            appended(file)
+            self.inode = os.fstat(file.fileno()).st_ino
+        for tx, row in zip(txs, rows[1:]):
+            entries.append(f"{tx['tx_id']},{offset},{offset + len(row)}\n")
+            self._index_record(tx['tx_id'], offset)
+            offset += len(row)
+        with open(self.index_path, mode='a') as file:
+            file.writelines(entries)
+            appended(file)
+        self.end = offset
+        if METRICS_ENABLED:
+            count('files_opened', 2)
+            count('rows_appended', len(txs))
+            count('bytes_written', sum(map(len, rows)) + sum(map(len, entries)))
+
+    def _index_record(self, tx_id, offset):
+        # New tx_ids are the highest so far; an older one (a sealed transaction voided since) is inserted in place
+        if tx_id not in self.index:
+            if self.tx_ids and tx_id < self.tx_ids[-1]:
+                bisect.insort(self.tx_ids, tx_id)
+            else:
+                self.tx_ids.append(tx_id)
+        self.index[tx_id] = offset
+
+    def sync(self):
+        """Pick up records other tills appended since this process last looked.
+
+        Returns them decoded, in the order they were written, or None when
+        the history was rewritten underneath us (the index is then reloaded).
+        A rewrite replaces the file, so it is told apart by the inode, not
+        the size: appends after it may already have made the file longer.
+        """
+        try:
+            info = os.stat(self.path)
+        except FileNotFoundError:
+            info = None
+        size = info.st_size if info else 0
+        if (self.inode is not None and (info is None or info.st_ino != self.inode)) or size < self.end:
+            self.index = {}
+            self.archive.refresh() # Rewritten by a seal, which also adds partitions
+            self._load_index()
+            return None
+        if size == self.end:
+            return []
+        records = []
+        for offset, end, line in self._iter_lines(self.end):
+            self.end = end
+            row = self._read_row(offset, line)
+            if row is None:
+                continue
+            record = self._decode(row)
+            self._index_record(record['tx_id'], offset)
+            self.next_id = max(self.next_id, record['tx_id'] + 1)
+            records.append(record)
+        return records
+
+    def append(self, tx):
+        """Append a new transaction, assigning its tx_id. Returns the tx_id."""
+        self.append_many([tx])
+        return tx['tx_id']
+
+    def append_many(self, txs):
+        """Append several new transactions in one buffered write, assigning their tx_ids."""
+        created_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+        for tx in txs:
+            if tx.get('tx_id') is None:
+                tx['tx_id'] = self.next_id
+            if not tx.get('created_at'):
+                tx['created_at'] = created_at
+            self.next_id = max(self.next_id, tx['tx_id'] + 1)
+        self._write(txs)
+
+    def replace_many(self, txs):
+        """Append new versions of existing transactions (e.g. a status change) in one write; the index points at the latest."""
+        self._write(txs)
+
+    def get(self, tx_id):
+        """Read a single live transaction by id, or None if unknown or voided."""
+        offset = self.index.get(tx_id)
+        if offset is None:
+            return self.archive.get(tx_id)
+        with open(self.path, mode='rb') as file:
+            file.seek(offset)
+            row = self._parse_line(file.readline())
+        if row['status'] == VOID_STATUS:
+            return None
+        return self._decode(row)
+
+    def void(self, tx_id):
+        """Void a transaction by appending a tombstone record. Returns the voided transaction."""
+        tx = self.get(tx_id)
+        if tx is None:
+            return None
+        self._write([dict(tx, status=VOID_STATUS)])
+        return tx
+
+    def position(self):
+        """End of the history this process has seen: every change appends, so this marks progress."""
+        return self.end
+
+    def iter_records(self, start=0):
+        """Yield every record (including superseded ones and voids) appended from position start on."""
+        if not os.path.exists(self.path):
+            return
+        for offset, end, row in self._iter_rows(start):
+            yield self._decode(row)
+
+    def iter_live(self):
+        """Stream live transactions one row at a time.
+
+        A record is live when the index still points at it (it is the latest
+        record for its tx_id) and it is not a void. 'order_items' is left as
+        JSON text, see order_items_of(). Archived transactions come first,
+        except those changed or voided since they were sealed.
+        """
+        for tx in self.archive.iter_between():
+            if tx['tx_id'] not in self.index:
+                yield tx
+        if not os.path.exists(self.path):
+            return
+        for offset, end, row in self._iter_rows():
+            tx_id = int(row['tx_id'])
+            if self.index.get(tx_id) != offset or row['status'] == VOID_STATUS:
+                continue
+            row['tx_id'] = tx_id
+            row['total_amount'] = Money.parse(row['total_amount'])
+            yield row
+
+    def snapshot(self):
+        """Return (position(), a stream of the live transactions as of then), like iter_live().
+
+        Only the index is copied now. Records before the position are never
+        changed, so the stream can be read while others append, as long as
+        SALES_FILE is not rewritten meanwhile (see inode).
+        """
+        index = dict(self.index)
+        position = self.end
+
+        def transactions():
+            for tx in self.archive.iter_between():
+                if tx['tx_id'] not in index:
+                    yield tx
+            if not position:
+                return
+            for offset, end, row in self._iter_rows():
+                if end > position:
+                    break
+                tx_id = int(row['tx_id'])
+                if index.get(tx_id) != offset or row['status'] == VOID_STATUS:
+                    continue
+                row['tx_id'] = tx_id
+                row['total_amount'] = Money.parse(row['total_amount'])
+                yield row
+        return position, transactions()
+
+    def iter_between(self, start=None, end=None):
+        """Stream live transactions with start <= created_at < end (timestamps or prefixes, e.g. days).
+
+        Only the archive partitions of that period are read.
+        """
+        for tx in self.archive.iter_between(start, end):
+            if tx['tx_id'] not in self.index:
+                yield tx
+        for tx in self.iter_live_records():
+            created_at = tx['created_at']
+            if created_at and (start is None or created_at >= start) and (end is None or created_at < end):
+                yield tx
+
+    def iter_live_records(self):
+        """Stream the live transactions of SALES_FILE only (not the archive), in file order."""
+        if not os.path.exists(self.path):
+            return
+        for offset, end, row in self._iter_rows():
+            tx_id = int(row['tx_id'])
+            if self.index.get(tx_id) == offset and row['status'] != VOID_STATUS:
+                yield self._decode(row)
+
+    def iter_recent(self):
+        """Stream live transactions newest first (by tx_id, then the archive by time), reading only as far as consumed."""
+        if self.tx_ids:
+            yield from self._read_live(reversed(self.tx_ids))
+        for tx in self.archive.iter_recent():
+            if tx['tx_id'] not in self.index:
+                yield tx
+
+    def iter_after(self, tx_id):
+        """Stream live transactions with a tx_id above tx_id in tx_id order, reading only as far as consumed (cursor paging)."""
+        tx_ids = self.tx_ids
+        start = bisect.bisect_right(tx_ids, tx_id)
+        indexed = self._read_live(tx_ids[i] for i in range(start, len(tx_ids))) if tx_ids else ()
+        archived = (tx for tx in self.archive.iter_after(tx_id) if tx['tx_id'] not in self.index)
+        return heapq.merge(indexed, archived, key=lambda tx: tx['tx_id'])
+
+    def _read_live(self, tx_ids):
+        # The latest records of tx_ids through the index, skipping voids
+        with open(self.path, mode='rb') as file:
+            for tx_id in tx_ids:
+                offset = self.index.get(tx_id)
+                if offset is None:
+                    continue # Dropped by a rewrite since the stream started
+                file.seek(offset)
+                row = self._parse_line(file.readline())
+                if row['status'] != VOID_STATUS:
+                    yield self._decode(row)
+
+    def scan(self):
+        """Return all live transactions keyed by tx_id, as compact TxRecords."""
+        return {tx['tx_id']: TxRecord(tx) for tx in self.iter_live()}
+
+    def seal(self, current_period):
+        """Move the settled transactions of periods before current_period into the archive.
+
+        PAID transactions and voids are sealed; pending orders stay in SALES_FILE
+        until they are settled. SALES_FILE is then compacted to what is left.
+        Returns the number of records sealed.
+        """
+        closed = {} # period -> latest records
+        keep = []
+        for offset, end, row in self._iter_rows() if os.path.exists(self.path) else ():
+            if self.index.get(int(row['tx_id'])) != offset:
+                continue # Superseded
+            tx = self._decode(row)
+            period = archive_period(tx['created_at'])
+            if period < current_period and tx['status'] in ('PAID', VOID_STATUS):
+                closed.setdefault(period, []).append(tx)
+            elif tx['status'] != VOID_STATUS:
+                keep.append(tx)
+        if not closed:
+            return 0
+        # Archive first: a crash before the compaction leaves copies in both, and the live one wins
+        for period, records in closed.items():
+            self.archive.seal(period, records)
+        self.compact(keep)
+        return sum(map(len, closed.values()))
+
+    def compact(self, transactions):
+        """Rewrite SALES_FILE with only the given live transactions and rebuild the index.
+
+        The new history replaces the old one atomically; the index is dropped
+        first, so a crash in between leaves the old history to be re-indexed.
+        """
+        with atomic_write(self.path) as file:
+            writer = csv.DictWriter(file, fieldnames=TX_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            rows = 0
+            for tx in transactions:
+                # Convert 'order_items'/'item_prices' dicts to JSON strings for CSV storage
+                writer.writerow(self._encode(tx))
+                rows += 1
+            count('rows_rewritten', rows)
+            if os.path.exists(self.index_path):
+                os.remove(self.index_path)
+        self.index = {}
+        self.inode = os.stat(self.path).st_ino
+        self.end = self._index_tail(0)
+        self.tx_ids = array('q', sorted(self.index))
+        self.next_id = max(max(self.index, default=0), self.archive.max_tx_id()) + 1
+
+#storage backends
+class StorageBackend:
+    """Where the POS keeps its inventory and transaction history.
+
+    The module-level persistence functions (load_data, save_inventory,
+    load_transactions, save_transaction, ...) delegate to the active backend,
+    see get_storage().
+    """
+
+    # One till lock per process, shared by every backend instance (a second
+    # flock handle in the same process would block against the first)
+    thread_lock = threading.RLock()
+    lock_depth = 0
+    lock_file = None
+    tills_file = None
+
+    def __init__(self):
+        if MULTI_TILL and StorageBackend.tills_file is None:
+            # Held shared until the process exits; sole_till() tries to take it exclusively
+            StorageBackend.tills_file = open(TILLS_FILE, mode='a')
+            fcntl.flock(StorageBackend.tills_file, fcntl.LOCK_SH)
+
+    @contextmanager
+    def sole_till(self):
+        """Yield whether no other till is running (always True without MULTI_TILL).
+
+        While True, tills starting up wait, so nothing holds offsets into a
+        history that is rewritten in the block. Use under lock().
+        """
+        if not MULTI_TILL:
+            yield True
+            return
+        try:
+            fcntl.flock(StorageBackend.tills_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fcntl.flock(StorageBackend.tills_file, fcntl.LOCK_SH) # A failed conversion may have dropped it
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(StorageBackend.tills_file, fcntl.LOCK_SH)
+
+    @contextmanager
+    def lock(self):
+        """Serialise writers. Yields True for the outermost holder.
+
+        Within one process this is a re-entrant thread lock; in MULTI_TILL mode
+        the outermost holder also takes an exclusive lock on LOCK_FILE so the
+        tills sharing the files take turns.
+        """
+        with StorageBackend.thread_lock:
+            outermost = StorageBackend.lock_depth == 0
+            if outermost and MULTI_TILL:
+                if StorageBackend.lock_file is None:
+                    StorageBackend.lock_file = open(LOCK_FILE, mode='a')
+                fcntl.flock(StorageBackend.lock_file, fcntl.LOCK_EX)
+            StorageBackend.lock_depth += 1
+            try:
+                yield outermost
+            finally:
+                StorageBackend.lock_depth -= 1
+                if outermost and MULTI_TILL:
+                    fcntl.flock(StorageBackend.lock_file, fcntl.LOCK_UN)
+
+    def sync(self, menu, stock):
+        """Apply other tills' stock changes to menu/stock (skipped when menu is None) and
+        return their new transaction records, or None if the history was rewritten."""
+        return []
+
+    def load_inventory(self):
+        """Return (menu, stock)."""
+        raise NotImplementedError
+
+    def save_inventory(self, menu, stock):
+        """Persist the whole inventory."""
+        raise NotImplementedError
+
+    def record_stock(self, op, item_key, menu, stock, delta=0):
+        """Persist a single stock movement (sale, restock, refund, price, add, remove)."""
+        raise NotImplementedError
+
+    def load_aliases(self):
+        """Return the SKU/barcode aliases as {alias: item_key}."""
+        raise NotImplementedError
+
+    def save_aliases(self, aliases):
+        """Replace the stored SKU/barcode aliases."""
+        raise NotImplementedError
+
+    def iter_transactions(self):
+        """Stream live transactions in storage order ('order_items' may still be JSON text, see order_items_of)."""
+        raise NotImplementedError
+
+    def iter_transactions_between(self, start=None, end=None):
+        """Stream live transactions with start <= created_at < end ('YYYY-MM-DD[ HH:MM:SS]', None for no bound)."""
+        raise NotImplementedError
+
+    def iter_recent_transactions(self):
+        """Stream live transactions newest first, reading no further than the caller consumes."""
+        raise NotImplementedError
+
+    def iter_transactions_after(self, tx_id):
+        """Stream live transactions with a tx_id above tx_id in tx_id order, reading no further than the caller consumes."""
+        raise NotImplementedError
+
+    def seal_history(self):
+        """Archive the settled transactions of closed periods. Returns how many records were sealed,
+        or None when it has to wait because other tills are running."""
+        return 0
+
+    def get_transaction(self, tx_id):
+        """Return a single live transaction, or None."""
+        raise NotImplementedError
+
+    def load_transactions(self):
+        """Return all live transactions keyed by tx_id, as compact TxRecords."""
+        return {tx['tx_id']: TxRecord(tx) for tx in self.iter_transactions()}
+
+    def append_transaction(self, tx):
+        """Persist a new transaction and assign its tx_id."""
+        raise NotImplementedError
+
+    def record_checkout(self, tx, menu, stock):
+        """Persist a sale together with the stock it deducted (only PAID sales deduct stock)."""
+        raise NotImplementedError
+
+    def record_checkouts(self, txs, menu, stock):
+        """Persist a batch of sales with grouped I/O. Backends that can batch override this."""
+        for tx in txs:
+            self.record_checkout(tx, menu, stock)
+
+    def record_status_changes(self, txs, moves, menu, stock):
+        """Save new statuses of existing transactions (txs are their updated copies) in one write.
+
+        moves are the (op, item_key, delta) stock movements the changes made,
+        already applied to the in-memory stock (a confirmed order that held no
+        reservation deducts its items, an expired reservation returns them).
+        """
+        raise NotImplementedError
+
+    def void_transaction(self, tx_id):
+        """Void a transaction. Returns the voided transaction or None."""
+        raise NotImplementedError
+
+    def rewrite_transactions(self, transactions):
+        """Replace the stored history with the given live transactions."""
+        raise NotImplementedError
+
+    def end_session(self, menu, stock):
+        """Flush anything pending before the POS exits."""
+
+    def history_position(self):
+        """A marker that changes whenever the transaction history changes (for the aggregate checkpoint)."""
+        raise NotImplementedError
+
+    def iter_records_since(self, position):
+        """Yield every change since position in the order it happened, or return None if the backend cannot."""
+        return None
+
+    def history_snapshot(self):
+        """Return (history_position(), the live transactions as of then). Call it under lock().
+
+        The transactions may be streamed after the lock is released; the
+        default reads them all right away.
+        """
+        return self.history_position(), list(self.iter_transactions())
+
+    def history_id(self):
+        """Changes when the history is rewritten, which makes positions taken before meaningless."""
+        return None
+
+    # Reports. Backends that can answer these without a Python loop override them.
+    def transaction_summary(self):
+        """Return (PAID total, pending transactions keyed by tx_id) in one streaming pass."""
+        paid_total = 0 # Centavos
+        pending = {}
+        for t in self.iter_transactions():
+            if t['status'] == 'PAID':
+                paid_total += int(t['total_amount'])
+            else:
+                pending[t['tx_id']] = t
+        return Money(paid_total), pending
+
+    def paid_total(self):
+        return self.transaction_summary()[0]
+
+    def pending_transactions(self):
+        return list(self.transaction_summary()[1].values())
+
+    def sales_by_item(self):
+        totals = {}
+        for t in self.iter_transactions():
+            if t['status'] == 'PAID':
+                for item_key, qty in order_items_of(t).items():
+                    totals[item_key] = totals.get(item_key, 0) + qty
+        return totals
+
+
+class CsvBackend(StorageBackend):
+    """Default backend: INVENTORY_FILE snapshot + STOCK_JOURNAL_FILE, and a TransactionStore on SALES_FILE."""
+
+    def __init__(self):
+        super().__init__()
+        self.journal_lock = threading.Lock()
+        self.journal_records = 0
+        self.compaction_thread = None
+        self.sales_store = None
+        # What this till has already applied, for picking up other tills' changes in MULTI_TILL mode
+        self.journal_offset = 0
+        self.journal_inode = None
+        self.snapshot_signature = None
+
+    def get_sales_store(self):
+        if self.sales_store is None:
+            with self.lock(): # Opening may repair or re-index the history, which must not race another till
+                if self.sales_store is None: # Or the history loader thread
+                    self.sales_store = TransactionStore(SALES_FILE, SALES_INDEX_FILE)
+        return self.sales_store
+
+    #inventory csv
+    def load_inventory(self):
+        """Load menu and stock data from INVENTORY_FILE plus the stock journal tail."""
+        if os.path.exists(INVENTORY_FILE):
+            print("\n")
+        with self.lock():
+            menu, stock, loaded = self._read_inventory()
+        if loaded:
+            print("Inventory loaded successfully.")
+        elif os.path.exists(INVENTORY_FILE):
+            print("\n")
+        return menu, stock
+
+    def _read_inventory(self):
+        """Return (menu, stock, loaded) as Catalog views: the snapshot (from its startup cache when fresh) plus the journal."""
+        keys, prices, counts = [], array('q'), array('q')
+        loaded = False
+        self.snapshot_signature = self._snapshot_signature()
+        if os.path.exists(INVENTORY_FILE):
+            # Snapshots are replaced atomically, so an unreadable one is damage to report, not a fresh start
+            with open(INVENTORY_FILE, mode='r', newline='') as file:
+                signature = file_signature(file.fileno())
+                cached_signature, cached = read_snapshot_cache(INVENTORY_FILE)
+                if cached is not None and cached_signature == signature:
+                    keys, prices, counts = cached[0], array('q', cached[1]), array('q', cached[2])
+                else:
+                    for row in csv.DictReader(file):
+                        keys.append(row['item_key'])
+                        prices.append(to_centavos(row['price']))
+                        counts.append(int(row['stock']))
+                    write_snapshot_cache(INVENTORY_FILE, signature, (keys, prices.tobytes(), counts.tobytes()))
+            loaded = True
+        catalog = Catalog.from_columns(keys, prices, counts)
+        menu, stock = catalog.menu, catalog.stock
+
+        # Replay stock movements recorded after the snapshot (an interrupted compaction first)
+        if os.path.exists(STOCK_JOURNAL_FILE):
+            repair_torn_tail(STOCK_JOURNAL_FILE)
+        pending_file = STOCK_JOURNAL_FILE + '.compacting'
+        if os.path.exists(pending_file):
+            repair_torn_tail(pending_file)
+            self.replay_stock_journal(menu, stock, pending_file)
+            # Finish that compaction now, before another one rotates the journal aside again
+            if self.save_inventory(menu, stock):
+                os.remove(pending_file)
+                self.snapshot_signature = self._snapshot_signature()
+        self.journal_records = self.replay_stock_journal(menu, stock, STOCK_JOURNAL_FILE)
+        self._mark_journal_read()
+        return menu, stock, loaded
+
+    @staticmethod
+    def _snapshot_signature():
+        try:
+            info = os.stat(INVENTORY_FILE)
+        except FileNotFoundError:
+            return None
+        return info.st_mtime_ns, info.st_size
+
+    def _mark_journal_read(self):
+        try:
+            info = os.stat(STOCK_JOURNAL_FILE)
+        except FileNotFoundError:
+            self.journal_inode = None
+            self.journal_offset = 0
+            return
+        self.journal_inode = info.st_ino
+        self.journal_offset = info.st_size
+
+    def sync(self, menu, stock):
+        if menu is not None:
+            self.sync_stock(menu, stock)
+        return self.get_sales_store().sync()
+
+    def sync_stock(self, menu, stock):
+        """Apply journal records other tills appended since we last read, or reload if they compacted."""
+        if self._snapshot_signature() != self.snapshot_signature:
+            # Another till wrote a new snapshot: reload in place, the old journal is gone
+            new_menu, new_stock, _ = self._read_inventory()
+            menu.clear()
+            menu.update(new_menu)
+            stock.clear()
+            stock.update(new_stock)
+            return
+        try:
+            info = os.stat(STOCK_JOURNAL_FILE)
+        except FileNotFoundError:
+            return
+        if info.st_ino != self.journal_inode:
+            self.journal_inode = info.st_ino
+            self.journal_offset = 0
+        if info.st_size <= self.journal_offset:
+            return
+        with open(STOCK_JOURNAL_FILE, mode='rb') as file:
+            file.seek(self.journal_offset)
+            data = file.read()
+        data = data[:data.rfind(b'\n') + 1] # Leave a partially written record for next time
+        lines = data.decode('utf-8').splitlines()
+        if self.journal_offset == 0:
+            reader = csv.DictReader(lines)
+        else:
+            reader = csv.DictReader(lines, fieldnames=JOURNAL_FIELDS)
+        self.journal_offset += len(data)
+        self.journal_records += self._apply_journal_rows(reader, menu, stock)
+
+    def save_inventory(self, menu, stock):
+        """Save menu and stock data to INVENTORY_FILE (atomically, via a temp file). Returns False if it could not be saved."""
+        keys, prices, counts = [], array('q'), array('q') # For the startup cache
+        try:
+            with atomic_write(INVENTORY_FILE) as file:
+                fieldnames = ['item_key', 'price', 'stock']
+                writer = csv.DictWriter(file, fieldnames=fieldnames)
+                writer.writeheader()
+                for item_key, price in menu.items():
+                    price = Money.of(price)
+                    writer.writerow({
+                        'item_key': item_key,
+                        'price': price,
+                        'stock': stock.get(item_key, 0)
+                    })
+                    keys.append(item_key)
+                    prices.append(price)
+                    counts.append(stock.get(item_key, 0))
+                file.flush()
+                signature = file_signature(file.fileno()) # Renaming keeps the inode and mtime
+            count('rows_rewritten', len(menu))
+            write_snapshot_cache(INVENTORY_FILE, signature, (keys, prices.tobytes(), counts.tobytes()))
+            # print(f"Inventory saved to {INVENTORY_FILE}")
+        except Exception as e:
+            print(f"Error saving inventory: {e}")
+            return False
+        return True
+
+    def load_aliases(self):
+        aliases = {}
+        if os.path.exists(ALIAS_FILE):
+            with open(ALIAS_FILE, mode='r', newline='') as file:
+                for row in csv.DictReader(file):
+                    aliases[row['alias']] = row['item_key']
+        return aliases
+
+    def save_aliases(self, aliases):
+        with atomic_write(ALIAS_FILE) as file:
+            writer = csv.writer(file)
+            writer.writerow(['alias', 'item_key'])
+            writer.writerows(sorted(aliases.items()))
+
+    #inventory journal
+    def record_stock(self, op, item_key, menu, stock, delta=0):
+        """Append a single stock movement to STOCK_JOURNAL_FILE."""
+        self.record_stocks([(op, item_key, delta)], menu, stock)
+
+    def record_stocks(self, movements, menu, stock):
+        """Append (op, item_key, delta) stock movements to STOCK_JOURNAL_FILE in one write.
+
+        Each record keeps the delta together with the resulting price and stock,
+        so replaying the journal over the snapshot always gives the same result.
+        """
+        records = [{
+            'op': op,
+            'item_key': item_key,
+            'delta': delta,
+            'price': menu.get(item_key, ''),
+            'stock': stock.get(item_key, '')
+        } for op, item_key, delta in movements]
+        try:
+            with self.journal_lock:
+                is_new_file = not os.path.exists(STOCK_JOURNAL_FILE)
+                with open(STOCK_JOURNAL_FILE, mode='a', newline='') as file:
+                    start = file.tell()
+                    writer = csv.DictWriter(file, fieldnames=JOURNAL_FIELDS)
+                    if is_new_file:
+                        writer.writeheader()
+                    writer.writerows(records)
+                    appended(file)
+                    if METRICS_ENABLED:
+                        count('files_opened')
+                        count('rows_appended', len(records))
+                        count('bytes_written', file.tell() - start)
+                self.journal_records += len(records)
+                self._mark_journal_read()
+        except Exception as e:
+            print(f"Error writing stock journal: {e}")
+            return
+
+        if self.journal_records >= JOURNAL_COMPACT_THRESHOLD:
+            self.compact_inventory(menu, stock, background=not MULTI_TILL)
+
+    @staticmethod
+    def replay_stock_journal(menu, stock, path=STOCK_JOURNAL_FILE):
+        """Apply journal records from path on top of menu/stock. Returns the number of records applied."""
+        count = 0
+        if not os.path.exists(path):
+            return count
+        try:
+            with open(path, mode='r', newline='') as file:
+                count = CsvBackend._apply_journal_rows(csv.DictReader(file), menu, stock)
+        except Exception as e:
+            print(f"Error replaying stock journal: {e}")
+        return count
+
+    @staticmethod
+    def _apply_journal_rows(rows, menu, stock):
+        count = 0
+        for row in rows:
+            key = row['item_key']
+            try:
+                if row['op'] == 'remove':
+                    menu.pop(key, None)
+                    stock.pop(key, None)
+                else:
+                    menu[key] = Money.parse(row['price'])
+                    stock[key] = int(row['stock'])
+            except (TypeError, ValueError):
+                continue # Skip a torn record left behind by a crash
+            count += 1
+        return count
+
+    def compact_inventory(self, menu, stock, background=False):
+        """Fold the stock journal into a fresh INVENTORY_FILE snapshot.
+
+        The journal is rotated aside under the lock and the snapshot is taken
+        from a copy, so sales can keep appending while the snapshot is written.
+        """
+        if self.compaction_thread is not None:
+            if background and self.compaction_thread.is_alive():
+                return # A compaction is already running
+            self.compaction_thread.join()
+            self.compaction_thread = None
+
+        pending_file = STOCK_JOURNAL_FILE + '.compacting'
+        with self.journal_lock:
+            if os.path.exists(STOCK_JOURNAL_FILE) and os.path.exists(pending_file):
+                # An earlier compaction never wrote its snapshot: keep its movements, the newer ones go after them
+                repair_torn_tail(pending_file)
+                with open(STOCK_JOURNAL_FILE, mode='rb') as journal, open(pending_file, mode='ab') as pending:
+                    journal.readline() # Header
+                    shutil.copyfileobj(journal, pending)
+                    pending.flush()
+                    os.fsync(pending.fileno())
+                os.remove(STOCK_JOURNAL_FILE)
+            elif os.path.exists(STOCK_JOURNAL_FILE):
+                os.replace(STOCK_JOURNAL_FILE, pending_file)
+            menu_copy = dict(menu)
+            stock_copy = dict(stock)
+            self.journal_records = 0
+
+        self.journal_inode = None
+        self.journal_offset = 0
+
+        def write_snapshot():
+            if not self.save_inventory(menu_copy, stock_copy):
+                return # The movements stay in pending_file, replayed on the next start
+            self.snapshot_signature = self._snapshot_signature()
+            if os.path.exists(pending_file):
+                os.remove(pending_file)
+
+        if background:
+            self.compaction_thread = threading.Thread(target=write_snapshot, daemon=True)
+            self.compaction_thread.start()
+        else:
+            write_snapshot()
+
+    #transaction csv
+    def iter_transactions(self):
+        return self.get_sales_store().iter_live()
+
+    def iter_transactions_between(self, start=None, end=None):
+        return self.get_sales_store().iter_between(start, end)
+
+    def iter_recent_transactions(self):
+        return self.get_sales_store().iter_recent()
+
+    def iter_transactions_after(self, tx_id):
+        return self.get_sales_store().iter_after(tx_id)
+
+    def seal_history(self):
+        current_period = archive_period(datetime.now().strftime(TIMESTAMP_FORMAT))
+        with self.lock(), self.sole_till() as alone:
+            # Sealing replaces SALES_FILE; another till reading by its old offsets meanwhile would misread it
+            return self.get_sales_store().seal(current_period) if alone else None
+
+    def get_transaction(self, tx_id):
+        return self.get_sales_store().get(tx_id)
+
+    def load_transactions(self):
+        return self.get_sales_store().scan()
+
+    def append_transaction(self, tx):
+        return self.get_sales_store().append(tx)
+
+    def record_checkout(self, tx, menu, stock):
+        self.record_checkouts([tx], menu, stock)
+
+    def record_checkouts(self, txs, menu, stock):
+        # One append for the sales, then one journal record per item with the batch's net deduction
+        self.get_sales_store().append_many(txs)
+        self._journal_sales(txs, menu, stock)
+
+    def record_status_changes(self, txs, moves, menu, stock):
+        # The updated copies supersede the earlier records, then the stock they moved is journaled
+        self.get_sales_store().replace_many(txs)
+        if moves:
+            self.record_stocks(self._net_moves(moves), menu, stock)
+
+    @staticmethod
+    def _net_moves(moves):
+        # One journal record per (op, item): the journal keeps the resulting stock, not each step
+        net = {}
+        for op, item_key, delta in moves:
+            net[op, item_key] = net.get((op, item_key), 0) + delta
+        return [(op, item_key, delta) for (op, item_key), delta in net.items()]
+
+    def _journal_sales(self, txs, menu, stock):
+        moves = [('sale' if tx['status'] == 'PAID' else 'reserve', item_key, -qty)
+                 for tx in txs if tx['status'] in STOCK_HOLDING_STATUSES
+                 for item_key, qty in order_items_of(tx).items() if item_key in stock]
+        if moves:
+            self.record_stocks(self._net_moves(moves), menu, stock)
+
+    def void_transaction(self, tx_id):
+        return self.get_sales_store().void(tx_id)
+
+    def rewrite_transactions(self, transactions):
+        self.get_sales_store().compact(transactions)
+
+    def history_position(self):
+        return self.get_sales_store().position()
+
+    def iter_records_since(self, position):
+        if position > self.history_position():
+            return None # History was compacted or replaced since the checkpoint
+        return self.get_sales_store().iter_records(position)
+
+    def history_snapshot(self):
+        return self.get_sales_store().snapshot()
+
+    def history_id(self):
+        return self.get_sales_store().inode
+
+    def end_session(self, menu, stock):
+        with self.lock() as outermost:
+            if outermost and MULTI_TILL:
+                self.sync_stock(menu, stock) # The snapshot must include the other tills' latest movements too
+            self.compact_inventory(menu, stock) # Fold the stock journal into inventory.csv
+        flush_writes()
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite backend (WAL mode) in SQLITE_FILE.
+
+    A checkout (sale record plus its stock deduction) is one SQLite
+    transaction, and the reports run as indexed SQL queries. On first use an
+    empty database is seeded from the existing CSV files. Prices and totals
+    are integer centavos.
+    """
+
+    SCHEMA_VERSION = 1 # PRAGMA user_version: 0 had REAL peso amounts, 1 integer centavos
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS items (
+            item_key TEXT PRIMARY KEY,
+            price INTEGER NOT NULL,
+            stock INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS stock_movements (
+            id INTEGER PRIMARY KEY,
+            op TEXT NOT NULL,
+            item_key TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        );
+        CREATE TABLE IF NOT EXISTS transactions (
+            tx_id INTEGER PRIMARY KEY,
+            customer TEXT NOT NULL,
+            total_amount INTEGER NOT NULL,
+            method TEXT NOT NULL,
+            status TEXT NOT NULL,
+            order_items TEXT NOT NULL,
+            item_prices TEXT NOT NULL DEFAULT '{}',
+            created_at TEXT NOT NULL DEFAULT (datetime('now', 'localtime'))
+        );
+        CREATE TABLE IF NOT EXISTS transaction_log (
+            seq INTEGER PRIMARY KEY,
+            tx_id INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS item_aliases (
+            alias TEXT PRIMARY KEY,
+            item_key TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_customer ON transactions (customer);
+        CREATE INDEX IF NOT EXISTS idx_transactions_status ON transactions (status);
+        CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions (created_at);
+    """
+
+    # Statements are kept as constants so sqlite3's statement cache reuses the prepared form
+    UPSERT_ITEM = "INSERT INTO items (item_key, price, stock) VALUES (?, ?, ?) ON CONFLICT (item_key) DO UPDATE SET price = excluded.price, stock = excluded.stock"
+    DELETE_ITEM = "DELETE FROM items WHERE item_key = ?"
+    INSERT_MOVEMENT = "INSERT INTO stock_movements (op, item_key, delta) VALUES (?, ?, ?)"
+    DEDUCT_STOCK = "UPDATE items SET stock = stock - ? WHERE item_key = ?"
+    INSERT_TX = "INSERT INTO transactions (tx_id, customer, total_amount, method, status, order_items, item_prices, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+    SELECT_TX = "SELECT tx_id, customer, total_amount, method, status, order_items, item_prices, created_at FROM transactions"
+    LOG_TX = "INSERT INTO transaction_log (tx_id) VALUES (?)"
+    HISTORY_REWRITTEN = 0 # transaction_log entry for a rewrite: changes logged before it no longer apply
+
+    def __init__(self, path=SQLITE_FILE):
+        super().__init__()
+        self.path = path
+        self.local = threading.local()
+        with self.lock(): # Another till may be creating the database at the same moment
+            is_new_db = not os.path.exists(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript(self.SCHEMA)
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(transactions)")]
+            if 'item_prices' not in columns:
+                self.conn.execute("ALTER TABLE transactions ADD COLUMN item_prices TEXT NOT NULL DEFAULT '{}'")
+            if is_new_db:
+                self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+            elif self.conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                self.migrate_to_centavos()
+            if is_new_db:
+                try:
+                    self.import_csv()
+                except Exception:
+                    # Do not leave an empty database behind that the next start would take as the real one
+                    self.conn.close()
+                    self.local.conn = None
+                    for suffix in ('', '-wal', '-shm'):
+                        if os.path.exists(path + suffix):
+                            os.remove(path + suffix)
+                    raise
+        # What this till has already seen, for picking up other tills' changes in MULTI_TILL mode
+        self.movement_seen = self.conn.execute("SELECT COALESCE(MAX(id), 0) FROM stock_movements").fetchone()[0]
+        self.log_seen = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM transaction_log").fetchone()[0]
+
+    @property
+    def conn(self):
+        """This thread's connection: a sqlite3 connection must not be used by two threads at once, and WAL lets each read on its own."""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = sqlite3.connect(self.path, isolation_level=None)
+            # WAL keeps commits crash-safe at NORMAL; FULL also makes each one durable, like POS_FSYNC_WINDOW=0
+            conn.execute("PRAGMA synchronous=FULL" if FSYNC_WINDOW <= 0 else "PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _transaction(self):
+        return _SqliteTransaction(self.conn)
+
+    def migrate_to_centavos(self):
+        """Convert a database with REAL peso amounts to integer centavos, in one SQLite transaction.
+
+        SQLite cannot change a column's type, so items and transactions are
+        rebuilt from renamed copies (rowid order kept); item_prices JSON is
+        rewritten with exact two-decimal prices.
+        """
+        self.conn.create_function('centavos', 1, lambda pesos: int(Money.from_pesos(float(pesos))), deterministic=True)
+        self.conn.create_function('exact_prices', 1, lambda text: item_prices_json({'item_prices': text}), deterministic=True)
+        with self._transaction():
+            for index in ('idx_transactions_customer', 'idx_transactions_status', 'idx_transactions_created_at'):
+                self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+            self.conn.execute("ALTER TABLE items RENAME TO items_real")
+            self.conn.execute("ALTER TABLE transactions RENAME TO transactions_real")
+            for statement in self.SCHEMA.split(';'): # Not executescript(), which would commit
+                if statement.strip():
+                    self.conn.execute(statement)
+            self.conn.execute("INSERT INTO items SELECT item_key, centavos(price), stock FROM items_real ORDER BY rowid")
+            self.conn.execute("""
+                INSERT INTO transactions
+                SELECT tx_id, customer, centavos(total_amount), method, status, order_items, exact_prices(item_prices), created_at
+                FROM transactions_real""")
+            self.conn.execute("DROP TABLE items_real")
+            self.conn.execute("DROP TABLE transactions_real")
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        rows = self.conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        print(f"Converted {SQLITE_FILE} to integer centavo amounts ({rows} transactions).")
+
+    def import_csv(self):
+        """Seed an empty database from INVENTORY_FILE/SALES_FILE (tx_ids are kept)."""
+        csv_backend = CsvBackend()
+        menu, stock = csv_backend.load_inventory()
+        try:
+            transactions = csv_backend.load_transactions() if os.path.exists(SALES_FILE) else {}
+        except Exception as e:
+            print(f"Error importing transactions: {e}")
+            transactions = {}
+        with self._transaction():
+            self.conn.executemany(self.UPSERT_ITEM, [(key, to_centavos(price), stock.get(key, 0)) for key, price in menu.items()])
+            self.conn.executemany(self.INSERT_TX, [self._tx_params(tx) for tx in transactions.values()])
+        if menu or transactions:
+            print(f"Imported {len(menu)} products and {len(transactions)} transactions into {SQLITE_FILE}.")
+
+    @staticmethod
+    def _tx_params(tx):
+        if not tx.get('created_at'):
+            tx['created_at'] = datetime.now().strftime(TIMESTAMP_FORMAT)
+        return (tx.get('tx_id'), tx['customer'], to_centavos(tx['total_amount']), tx['method'], tx['status'],
+                json.dumps(order_items_of(tx)), item_prices_json(tx), tx['created_at'])
+
+    @staticmethod
+    def _tx_from_row(row, decode_items=True):
+        tx_id, customer, total_amount, method, status, order_items, item_prices, created_at = row
+        tx = {
+            'tx_id': tx_id,
+            'customer': customer,
+            'total_amount': Money(total_amount),
+            'method': method,
+            'status': status,
+            'order_items': order_items,
+            'item_prices': item_prices,
+            'created_at': created_at
+        }
+        if decode_items:
+            order_items_of(tx)
+            item_prices_of(tx)
+        return tx
+
+    def load_inventory(self):
+        menu = {}
+        stock = {}
+        for key, price, qty in self.conn.execute("SELECT item_key, price, stock FROM items ORDER BY rowid"):
+            menu[key] = Money(price)
+            stock[key] = qty
+        if menu:
+            print("Inventory loaded successfully.")
+        return menu, stock
+
+    def save_inventory(self, menu, stock):
+        try:
+            with self._transaction():
+                self.conn.execute("DELETE FROM items")
+                self.conn.executemany(self.UPSERT_ITEM, [(key, to_centavos(price), stock.get(key, 0)) for key, price in menu.items()])
+            count('rows_rewritten', len(menu))
+        except sqlite3.Error as e:
+            print(f"Error saving inventory: {e}")
+
+    def record_stock(self, op, item_key, menu, stock, delta=0):
+        try:
+            with self._transaction():
+                if op == 'remove':
+                    self.conn.execute(self.DELETE_ITEM, (item_key,))
+                else:
+                    self.conn.execute(self.UPSERT_ITEM, (item_key, to_centavos(menu[item_key]), stock[item_key]))
+                self.conn.execute(self.INSERT_MOVEMENT, (op, item_key, delta))
+        except sqlite3.Error as e:
+            print(f"Error saving stock movement: {e}")
+
+    def load_aliases(self):
+        return dict(self.conn.execute("SELECT alias, item_key FROM item_aliases"))
+
+    def save_aliases(self, aliases):
+        with self._transaction():
+            self.conn.execute("DELETE FROM item_aliases")
+            self.conn.executemany("INSERT INTO item_aliases (alias, item_key) VALUES (?, ?)", aliases.items())
+
+    def iter_transactions(self):
+        for row in self.conn.execute(self.SELECT_TX + " WHERE status != ? ORDER BY tx_id", (VOID_STATUS,)):
+            yield self._tx_from_row(row, decode_items=False)
+
+    def iter_transactions_between(self, start=None, end=None):
+        # Served by idx_transactions_created_at, so SQLite needs no partitions
+        query = self.SELECT_TX + " WHERE status != ? AND created_at >= ? AND created_at < ? ORDER BY created_at, tx_id"
+        for row in self.conn.execute(query, (VOID_STATUS, start or '', end or '~')):
+            yield self._tx_from_row(row, decode_items=False)
+
+    def iter_recent_transactions(self):
+        for row in self.conn.execute(self.SELECT_TX + " WHERE status != ? ORDER BY tx_id DESC", (VOID_STATUS,)):
+            yield self._tx_from_row(row, decode_items=False)
+
+    def iter_transactions_after(self, tx_id):
+        for row in self.conn.execute(self.SELECT_TX + " WHERE tx_id > ? AND status != ? ORDER BY tx_id", (tx_id, VOID_STATUS)):
+            yield self._tx_from_row(row, decode_items=False)
+
+    def get_transaction(self, tx_id):
+        row = self.conn.execute(self.SELECT_TX + " WHERE tx_id = ? AND status != ?", (tx_id, VOID_STATUS)).fetchone()
+        return self._tx_from_row(row) if row else None
+
+    def _insert_tx(self, tx):
+        cursor = self.conn.execute(self.INSERT_TX, self._tx_params(tx))
+        tx['tx_id'] = cursor.lastrowid
+        self.log_seen = self.conn.execute(self.LOG_TX, (tx['tx_id'],)).lastrowid
+
+    def append_transaction(self, tx):
+        with self._transaction():
+            self._insert_tx(tx)
+        count('rows_appended')
+        return tx['tx_id']
+
+    def record_checkout(self, tx, menu, stock):
+        self.record_checkouts([tx], menu, stock)
+
+    def record_checkouts(self, txs, menu, stock):
+        with self._transaction():
+            for tx in txs:
+                self._insert_tx(tx)
+                if tx['status'] in STOCK_HOLDING_STATUSES:
+                    op = 'sale' if tx['status'] == 'PAID' else 'reserve'
+                    lines = order_items_of(tx).items()
+                    self.conn.executemany(self.DEDUCT_STOCK, [(qty, item_key) for item_key, qty in lines])
+                    self.conn.executemany(self.INSERT_MOVEMENT, [(op, item_key, -qty) for item_key, qty in lines])
+        count('rows_appended', len(txs))
+
+    def record_status_changes(self, txs, moves, menu, stock):
+        with self._transaction():
+            for tx in txs:
+                self.conn.execute("UPDATE transactions SET status = ? WHERE tx_id = ?", (tx['status'], tx['tx_id']))
+                self.log_seen = self.conn.execute(self.LOG_TX, (tx['tx_id'],)).lastrowid
+            self.conn.executemany(self.DEDUCT_STOCK, [(-delta, item_key) for _, item_key, delta in moves])
+            self.conn.executemany(self.INSERT_MOVEMENT, moves)
+
+    def void_transaction(self, tx_id):
+        tx = self.get_transaction(tx_id)
+        if tx is None:
+            return None
+        with self._transaction():
+            self.conn.execute("UPDATE transactions SET status = ? WHERE tx_id = ?", (VOID_STATUS, tx_id))
+            self.log_seen = self.conn.execute(self.LOG_TX, (tx_id,)).lastrowid
+        return tx
+
+    def rewrite_transactions(self, transactions):
+        with self._transaction():
+            self.conn.execute("DELETE FROM transactions")
+            rows = [self._tx_params(tx) for tx in transactions]
+            self.conn.executemany(self.INSERT_TX, rows)
+            self.log_seen = self.conn.execute(self.LOG_TX, (self.HISTORY_REWRITTEN,)).lastrowid # Other tills rebuild their totals
+        count('rows_rewritten', len(rows))
+
+    def history_position(self):
+        return self.log_seen
+
+    def history_snapshot(self):
+        # Under the lock this till has seen every change, so the snapshot's last log entry is history_position()
+        conn = self.conn
+        if conn.in_transaction:
+            return self.history_position(), list(self.iter_transactions())
+        conn.execute("BEGIN") # A WAL read snapshot on this thread's connection, kept until the stream is read
+        try:
+            position = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM transaction_log").fetchone()[0]
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        def transactions():
+            try:
+                for row in conn.execute(self.SELECT_TX + " WHERE status != ? ORDER BY tx_id", (VOID_STATUS,)):
+                    yield self._tx_from_row(row)
+            finally:
+                conn.execute("COMMIT")
+        return position, transactions()
+
+    def iter_records_since(self, position):
+        # Latest state of every transaction changed after position, in the order of its last change
+        last_seq, rewritten = self.conn.execute("SELECT MAX(seq), MAX(CASE WHEN tx_id = ? THEN seq END) FROM transaction_log WHERE seq > ?",
+                                                (self.HISTORY_REWRITTEN, position)).fetchone()
+        if rewritten is not None:
+            self.log_seen = max(self.log_seen, last_seq) # Whoever asked rebuilds from the whole history
+            return None
+        query = """
+            SELECT t.tx_id, t.customer, t.total_amount, t.method, t.status, t.order_items, t.item_prices, t.created_at, MAX(l.seq) AS last_seq
+            FROM transaction_log l JOIN transactions t ON t.tx_id = l.tx_id
+            WHERE l.seq > ?
+            GROUP BY l.tx_id
+            ORDER BY last_seq
+        """
+        records = []
+        for row in self.conn.execute(query, (position,)).fetchall():
+            self.log_seen = max(self.log_seen, row[8])
+            records.append(self._tx_from_row(row[:8]))
+        return records
+
+    def sync(self, menu, stock):
+        if menu is not None:
+            query = """
+                SELECT m.item_key, i.price, i.stock, MAX(m.id)
+                FROM stock_movements m LEFT JOIN items i ON i.item_key = m.item_key
+                WHERE m.id > ?
+                GROUP BY m.item_key
+            """
+            for item_key, price, qty, last_id in self.conn.execute(query, (self.movement_seen,)).fetchall():
+                if price is None:
+                    menu.pop(item_key, None)
+                    stock.pop(item_key, None)
+                else:
+                    menu[item_key] = Money(price)
+                    stock[item_key] = qty
+                self.movement_seen = max(self.movement_seen, last_id)
+        return self.iter_records_since(self.log_seen)
+
+    def end_session(self, menu, stock):
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def transaction_summary(self):
+        return self.paid_total(), {t['tx_id']: t for t in self.pending_transactions()}
+
+    def paid_total(self):
+        return Money(self.conn.execute("SELECT COALESCE(SUM(total_amount), 0) FROM transactions WHERE status = 'PAID'").fetchone()[0])
+
+    def pending_transactions(self):
+        return [self._tx_from_row(row, decode_items=False) for row in self.conn.execute(self.SELECT_TX + " WHERE status NOT IN ('PAID', ?) ORDER BY tx_id", (VOID_STATUS,))]
+
+    def sales_by_item(self):
+        query = """
+            SELECT item.key, SUM(item.value)
+            FROM transactions, json_each(transactions.order_items) AS item
+            WHERE transactions.status = 'PAID'
+            GROUP BY item.key
+        """
+        return dict(self.conn.execute(query).fetchall())
+
+
+class _SqliteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block on an autocommit connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+STORAGE_BACKENDS = {
+    'csv': CsvBackend,
+    'sqlite': SqliteBackend,
+}
+_storage = None
+
+def get_storage():
+    """Return the active storage backend, chosen by STORAGE_BACKEND."""
+    global _storage
+    if _storage is None:
+        _storage = STORAGE_BACKENDS[STORAGE_BACKEND]()
+    return _storage
+
+def get_sales_store():
+    """Return the TransactionStore for SALES_FILE (CSV backend only)."""
+    return get_storage().get_sales_store()
+
+#persistence
+@contextmanager
+def storage_lock(menu=None, stock=None):
+    """Hold the storage lock around a read-check-write step.
+
+    In MULTI_TILL mode the outermost holder first pulls in what the other
+    tills wrote: their stock changes (when menu/stock are given) and their
+    transactions, which go into the aggregate cache. Mutate menu/stock only
+    inside the block so the change is based on the latest shared values.
+    """
+    global _aggregates
+    storage = get_storage()
+    with storage.lock() as outermost:
+        if outermost and MULTI_TILL:
+            records = storage.sync(menu, stock)
+            if records is None:
+                _aggregates = None # History was rewritten by another till, rebuild on next use
+            else:
+                record_aggregate_changes(records)
+        yield
+
+def refresh_inventory(menu, stock):
+    """Bring menu/stock up to date with other tills' changes (no-op with a single till)."""
+    if MULTI_TILL:
+        with storage_lock(menu, stock):
+            pass
+
+def load_data():
+    """Load menu and stock from the storage backend into a compact Catalog. Exits if the saved inventory is unreadable."""
+    try:
+        return make_catalog(*get_storage().load_inventory())
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # Starting setup here would overwrite the damaged file, so leave it for the owner to restore
+        print(f"❌ Error loading inventory: {e}. The saved files were left untouched; restore them before starting again.")
+        sys.exit(1)
+
+@timed('save_inventory')
+def save_inventory(menu, stock):
+    """Save the whole menu and stock to the storage backend."""
+    get_storage().save_inventory(menu, stock)
+
+@timed('record_stock_movement')
+def record_stock_movement(op, item_key, menu, stock, delta=0):
+    """Persist one stock movement (sale, restock, refund, price, add, remove)."""
+    with storage_lock():
+        get_storage().record_stock(op, item_key, menu, stock, delta)
+
+def load_aliases():
+    """Load the SKU/barcode aliases, {alias: item_key}."""
+    try:
+        return get_storage().load_aliases()
+    except Exception as e:
+        print(f"Error loading SKU/barcode aliases: {e}")
+        return {}
+
+def save_aliases(aliases):
+    """Save the SKU/barcode aliases."""
+    try:
+        with storage_lock():
+            get_storage().save_aliases(aliases)
+    except Exception as e:
+        print(f"Error saving SKU/barcode aliases: {e}")
+
+def load_transactions():
+    """Load transaction history from the storage backend, keyed by tx_id."""
+    transactions = {}
+    print("\n")
+    try:
+        transactions = get_storage().load_transactions()
+        if transactions:
+            print("Transactions loaded successfully.")
+    except Exception as e:
+        print(f"Error loading transactions: {e}. Starting with empty history.")
+    return transactions
+
+def load_transaction_summary():
+    """Return (PAID sales total, pending transactions keyed by tx_id) from the aggregate cache."""
+    try:
+        aggregates = get_aggregates()
+        return aggregates.paid_total(), aggregates.pending
+    except Exception as e:
+        print(f"Error loading transactions: {e}. Starting with empty history.")
+        return 0, {}
+
+def iter_transactions():
+    """Stream live transactions from the storage backend."""
+    try:
+        yield from get_storage().iter_transactions()
+    except Exception as e:
+        print(f"Error reading transactions: {e}")
+
+def iter_transactions_between(start=None, end=None):
+    """Stream live transactions with start <= created_at < end, reading only that part of the history."""
+    try:
+        yield from get_storage().iter_transactions_between(start, end)
+    except Exception as e:
+        print(f"Error reading transactions: {e}")
+
+def iter_recent_transactions():
+    """Stream live transactions newest first."""
+    try:
+        yield from get_storage().iter_recent_transactions()
+    except Exception as e:
+        print(f"Error reading transactions: {e}")
+
+def iter_transactions_after(tx_id):
+    """Stream live transactions with a tx_id above tx_id, in tx_id order."""
+    try:
+        yield from get_storage().iter_transactions_after(tx_id)
+    except Exception as e:
+        print(f"Error reading transactions: {e}")
+
+def archive_transactions():
+    """Seal the settled transactions of closed periods into the archive.
+
+    Returns how many records were sealed, or None while other tills are running.
+    """
+    try:
+        with storage_lock():
+            aggregates = get_aggregates() # Caught up with the history before it is rewritten
+            sealed = get_storage().seal_history()
+            if sealed:
+                # The totals are unchanged, but the old checkpoint position means nothing in the compacted file
+                aggregates.save(AGGREGATE_FILE, STORAGE_BACKEND, get_storage().history_position())
+        return sealed
+    except Exception as e:
+        print(f"Error archiving transactions: {e}")
+        return 0
+
+def get_transaction(tx_id):
+    """Look up a single live transaction by tx_id, or None."""
+    try:
+        if MULTI_TILL:
+            with storage_lock(): # Looked up in the latest history, which another till may have rewritten
+                return get_storage().get_transaction(tx_id)
+        return get_storage().get_transaction(tx_id)
+    except Exception as e:
+        print(f"Error reading transaction: {e}")
+        return None
+
+@timed('save_transaction')
+def save_transaction(tx):
+    """Save a single new transaction and assign its tx_id."""
+    try:
+        with storage_lock():
+            get_storage().append_transaction(tx)
+            record_aggregate_change(tx)
+        # print(f"Transaction appended to {SALES_FILE}")
+    except Exception as e:
+        print(f"Error saving transaction: {e}")
+
+@timed('save_checkout')
+def save_checkout(tx, menu, stock):
+    """Save a new sale and the stock it deducted in one step, assigning its tx_id. Returns False if it could not be saved."""
+    try:
+        with storage_lock():
+            get_storage().record_checkout(tx, menu, stock)
+            record_aggregate_change(tx)
+    except Exception as e:
+        print(f"Error saving transaction: {e}")
+        return False
+    return True
+
+@timed('save_checkouts')
+def save_checkouts(txs, menu, stock):
+    """Save a batch of sales and their stock deductions with grouped writes, assigning their tx_ids."""
+    try:
+        with storage_lock():
+            get_storage().record_checkouts(txs, menu, stock)
+            record_aggregate_changes(txs)
+    except Exception as e:
+        print(f"Error saving transactions: {e}")
+        return False
+    return True
+
+def save_payments(txs, menu, stock, moves=()):
+    """Save confirmed payments (PAID copies of pending transactions) and the stock they deducted in one grouped write."""
+    return save_status_changes(txs, menu, stock, moves, "payments")
+
+@timed('save_status_changes')
+def save_status_changes(txs, menu, stock, moves=(), what="status changes"):
+    """Save updated copies of existing transactions with the (op, item_key, delta) stock moves they made, in one write."""
+    try:
+        with storage_lock():
+            get_storage().record_status_changes(txs, list(moves), menu, stock)
+            record_aggregate_changes(txs)
+    except Exception as e:
+        print(f"Error saving {what}: {e}")
+        return False
+    return True
+
+@timed('void_transaction')
+def void_transaction(tx_id):
+    """Void a single transaction. Returns the voided transaction or None."""
+    try:
+        with storage_lock():
+            tx = get_storage().void_transaction(tx_id)
+            if tx is not None:
+                record_aggregate_change(dict(tx, status=VOID_STATUS))
+    except Exception as e:
+        print(f"Error voiding transaction: {e}")
+        return None
+    return tx
+
+@timed('rewrite_transactions')
+def rewrite_transactions(transactions):
+    """Replace the stored history with the given live transactions (drops voided records)."""
+    global _aggregates
+    try:
+        with storage_lock():
+            get_storage().rewrite_transactions(transactions)
+        print(f"Transaction history saved to {SALES_FILE}")
+    except Exception as e:
+        print(f"Error rewriting transactions: {e}")
+    # The aggregates no longer match the history; rebuild them on next use
+    _aggregates = None
+    if os.path.exists(AGGREGATE_FILE):
+        os.remove(AGGREGATE_FILE)
+
+#aggregate cache
+class AggregateCache:
+    """Running sales totals, updated incrementally on every append, void and status change.
+
+    Totals are kept by status, and for PAID sales also by payment method, by
+    item and by day, together with the pending orders and the customer index
+    (see customer_key()). Amounts are integer centavos. They are checkpointed
+    to AGGREGATE_FILE so a restart only replays the history written since the
+    last checkpoint instead of rescanning all of it.
+    """
+
+    def __init__(self):
+        self.by_status = {} # status -> [count, amount]
+        self.by_method = {} # method -> amount
+        self.by_item = {} # item_key -> [qty, revenue]
+        self.by_day = {} # 'YYYY-MM-DD' -> amount
+        self.pending = {} # tx_id -> pending transaction (TxRecord)
+        self.customers = {} # customer key -> [name as last entered, visits, paid, pending, tx_ids (sorted array)]
+        self.next_id = 1
+        self.updates = 0 # Changes since the last checkpoint
+
+    def _add(self, tx, sign):
+        status = tx['status']
+        amount = to_centavos(tx['total_amount']) * sign
+        totals = self.by_status.setdefault(status, [0, 0])
+        totals[0] += sign
+        totals[1] += amount
+        self._add_customer(tx, sign, amount)
+        if status != 'PAID':
+            return
+        self.by_method[tx['method']] = self.by_method.get(tx['method'], 0) + amount
+        day = (tx.get('created_at') or 'unknown')[:10]
+        self.by_day[day] = self.by_day.get(day, 0) + amount
+        for item_key, (qty, revenue) in line_totals(tx).items():
+            totals = self.by_item.setdefault(item_key, [0, 0])
+            totals[0] += qty * sign
+            totals[1] += int(revenue) * sign
+
+    def _add_customer(self, tx, sign, amount):
+        key = customer_key(tx['customer'])
+        if key is None:
+            return
+        entry = self.customers.get(key)
+        if entry is None:
+            entry = self.customers[key] = [tx['customer'], 0, 0, 0, array('q')]
+        entry[1] += sign
+        if tx['status'] == 'PAID':
+            entry[2] += amount
+        elif tx['status'] in UNPAID_STATUSES:
+            entry[3] += amount
+        tx_ids = entry[4]
+        if sign > 0:
+            entry[0] = tx['customer']
+            bisect.insort(tx_ids, tx['tx_id'])
+        else:
+            i = bisect.bisect_left(tx_ids, tx['tx_id'])
+            if i < len(tx_ids) and tx_ids[i] == tx['tx_id']:
+                del tx_ids[i]
+            if not tx_ids:
+                del self.customers[key]
+
+    def customer(self, key):
+        """The customer index entry for a key from customer_key(), or None."""
+        entry = self.customers.get(key)
+        if entry is None:
+            return None
+        name, visits, paid, pending, tx_ids = entry
+        return {'customer': name, 'visits': visits, 'spent': Money(paid), 'pending': Money(pending), 'tx_ids': list(tx_ids)}
+
+    def apply(self, record):
+        """Apply one change: a new transaction, a status change or a void (a full copy of the record)."""
+        tx_id = record['tx_id']
+        previous = self.pending.pop(tx_id, None)
+        if previous is not None:
+            self._add(previous, -1)
+        elif tx_id < self.next_id:
+            self._add(dict(record, status='PAID'), -1) # Already known and not pending, so it was PAID
+        self.next_id = max(self.next_id, tx_id + 1)
+        if record['status'] != VOID_STATUS:
+            self._add(record, 1)
+            if record['status'] != 'PAID':
+                self.pending[tx_id] = TxRecord(record)
+        self.updates += 1
+
+    def rebuild(self, transactions):
+        """Start over from a stream of live transactions."""
+        self.__init__()
+        for tx in transactions:
+            self._add(tx, 1)
+            if tx['status'] != 'PAID':
+                self.pending[tx['tx_id']] = TxRecord(tx)
+            self.next_id = max(self.next_id, tx['tx_id'] + 1)
+            self.updates += 1
+
+    def paid_total(self):
+        return Money(self.by_status.get('PAID', [0, 0])[1])
+
+    def save(self, path, backend, position):
+        """Write a checkpoint for the history up to position (atomically, via a temp file).
+
+        Amounts are in centavos, as kept, except in the pending records (pesos text, as stored).
+        """
+        data = {
+            'version': AGGREGATE_VERSION,
+            'backend': backend,
+            'position': position,
+            'next_id': self.next_id,
+            'by_status': self.by_status,
+            'by_method': self.by_method,
+            'by_item': self.by_item,
+            'by_day': self.by_day,
+            'pending': [dict(tx, total_amount=str(tx['total_amount']), order_items=order_items_of(tx),
+                             item_prices={item_key: str(price) for item_key, price in item_prices_of(tx).items()})
+                        for tx in self.pending.values()],
+            'customers': {key: entry[:4] + [entry[4].tolist()] for key, entry in self.customers.items()}
+        }
+        with atomic_write(path) as file:
+            json.dump(data, file)
+        self.updates = 0
+
+    @classmethod
+    def load(cls, path, backend):
+        """Return (cache, position) from a checkpoint written for backend, or (None, None)."""
+        try:
+            with open(path, mode='r') as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None, None
+        if data.get('backend') != backend or data.get('version') != AGGREGATE_VERSION:
+            return None, None # Other backend, or an older layout (float amounts, no customer index)
+        cache = cls()
+        cache.next_id = data['next_id']
+        cache.by_status = data['by_status']
+        cache.by_method = data['by_method']
+        cache.by_item = data['by_item']
+        cache.by_day = data['by_day']
+        cache.pending = {tx['tx_id']: TxRecord(tx) for tx in data['pending']}
+        cache.customers = {key: entry[:4] + [array('q', entry[4])] for key, entry in data['customers'].items()}
+        return cache, data['position']
+
+_aggregates = None
+
+def _catch_up(cache, storage, position):
+    # Apply the changes since position; False if the history was rewritten since
+    if position != storage.history_position():
+        records = storage.iter_records_since(position)
+        if records is None:
+            return False
+        for record in records:
+            cache.apply(record)
+    return True
+
+def get_aggregates():
+    """Return the AggregateCache, restored from its checkpoint plus the changes since, or rebuilt from history.
+
+    A rebuild reads a snapshot of the history without holding the storage
+    lock, so checkouts (and in MULTI_TILL mode the other tills) carry on
+    meanwhile. The lock is only taken again to catch up with what they wrote
+    since the snapshot and swap the result in.
+    """
+    global _aggregates
+    while _aggregates is None:
+        with storage_lock(): # No other till appends while the checkpoint is caught up
+            if _aggregates is not None:
+                break # Loaded by the history loader thread while we waited
+            storage = get_storage()
+            cache, position = AggregateCache.load(AGGREGATE_FILE, STORAGE_BACKEND)
+            if cache is not None and _catch_up(cache, storage, position):
+                _aggregates = cache
+                checkpoint_aggregates()
+                break
+            history_id = storage.history_id()
+            position, transactions = storage.history_snapshot()
+        cache = AggregateCache()
+        cache.rebuild(transactions)
+        with storage_lock():
+            if _aggregates is None and storage.history_id() == history_id and _catch_up(cache, storage, position):
+                _aggregates = cache
+                checkpoint_aggregates()
+    return _aggregates
+
+_history_loader = None
+
+def load_history_in_background(menu):
+    """Build the product search index and restore the sales totals on a background thread.
+
+    The till shows its menu right away; a checkout or report that needs the
+    history meanwhile waits on the storage lock until it is loaded.
+    """
+    global _history_loader
+
+    def load():
+        try:
+            get_product_index(menu)
+            get_aggregates()
+        except Exception as e:
+            print(f"Error loading transactions: {e}. They are loaded again when needed.")
+
+    _history_loader = threading.Thread(target=load, name='history-loader', daemon=True)
+    _history_loader.start()
+
+def history_loaded(timeout=0):
+    """Whether the sales totals are loaded, waiting up to timeout seconds for the background load."""
+    if _aggregates is None and _history_loader is not None:
+        _history_loader.join(timeout)
+    return _aggregates is not None
+
+def customer_key(name):
+    """Index key of a customer: their phone number when the name includes one, else the lowercase words of
+    the name. None for guests, who are not indexed."""
+    digits = ''.join(ch for ch in name or '' if ch.isdigit())
+    if len(digits) >= CUSTOMER_PHONE_DIGITS:
+        return 'tel:' + digits[-CUSTOMER_PHONE_DIGITS:] # +63 917..., 63917... and 0917... are the same number
+    words = _name_words(name)
+    return ' '.join(words) or None
+
+def find_customer(name):
+    """Look up a customer's visits, lifetime spend, unpaid GCash balance and tx_ids in the customer index.
+
+    Returns None for unknown customers and guests, or while the history is still loading.
+    """
+    key = customer_key(name)
+    if key is None or not history_loaded():
+        return None
+    return _aggregates.customer(key)
+
+def checkpoint_aggregates():
+    """Save the aggregate cache so the next start does not rescan the history."""
+    if _aggregates is None or _aggregates.updates == 0:
+        return # Nothing changed since it was loaded or last saved
+    try:
+        with storage_lock(): # Catches up with the other tills first, so the position matches the totals
+            if _aggregates is not None:
+                _aggregates.save(AGGREGATE_FILE, STORAGE_BACKEND, get_storage().history_position())
+    except Exception as e:
+        print(f"Error saving sales totals: {e}")
+
+def record_aggregate_change(record):
+    """Feed a new transaction, status change or void into the aggregate cache."""
+    record_aggregate_changes([record])
+
+def record_aggregate_changes(records):
+    """Feed a group of changes into the aggregate cache.
+
+    The checkpoint is only considered after the last one: its position already
+    covers the whole group, so saving halfway would drop the rest on restart.
+    """
+    if _aggregates is None:
+        return # Not loaded yet, it picks the changes up from the history when it is
+    for record in records:
+        _aggregates.apply(record)
+    if _aggregates.updates >= AGGREGATE_CHECKPOINT_EVERY:
+        checkpoint_aggregates()
+
+#reporting
+class SalesColumns:
+    """The transaction history as parallel columns, for the reports.
+
+    One row per transaction (status, method, customer and day codes, hour,
+    total in centavos) and one row per order line (its transaction row,
+    item id, qty, revenue in centavos). Codes index the *_names lists and
+    item ids are the catalog's interned ids.
+    """
+
+    def __init__(self):
+        self.status = array('q')
+        self.method = array('q')
+        self.customer = array('q')
+        self.day = array('q')
+        self.hour = array('q') # 0-23, or UNKNOWN_HOUR
+        self.total = array('q') # Centavos
+        self.line_tx = array('q') # Row of the line's transaction
+        self.line_item = array('q')
+        self.line_qty = array('q')
+        self.line_revenue = array('q') # Centavos
+        self.status_names, self.method_names, self.customer_names, self.day_names = [], [], [], []
+
+    @classmethod
+    def load(cls, transactions):
+        """Build the columns from a stream of live transactions in one pass.
+
+        Each row is still decoded in Python (CSV fields, order_items JSON), so
+        on a large history this load, not the group-bys, sets the report time.
+        """
+        columns = cls()
+        codes = [({}, columns.status_names), ({}, columns.method_names), ({}, columns.customer_names), ({}, columns.day_names)]
+        targets = [columns.status, columns.method, columns.customer, columns.day]
+        for row, tx in enumerate(transactions):
+            created_at = tx.get('created_at') or ''
+            values = (tx['status'], tx['method'], tx['customer'], created_at[:10] or UNKNOWN_DAY)
+            for (code_of, names), target, value in zip(codes, targets, values):
+                code = code_of.get(value)
+                if code is None:
+                    code = code_of[value] = len(names)
+                    names.append(value)
+                target.append(code)
+            columns.hour.append(int(created_at[11:13]) if created_at[11:13].isdigit() else UNKNOWN_HOUR)
+            columns.total.append(to_centavos(tx['total_amount']))
+            for item_key, (qty, revenue) in line_totals(tx).items():
+                columns.line_tx.append(row)
+                columns.line_item.append(item_id(item_key))
+                columns.line_qty.append(qty)
+                columns.line_revenue.append(to_centavos(revenue))
+        return columns
+
+    def __len__(self):
+        return len(self.total)
+
+# Column operations: vectorized with NumPy when it is installed, plain loops otherwise
+def _column(values):
+    return np.asarray(values) if np is not None else values
+
+def _equals(column, code):
+    if np is not None:
+        return column == code
+    return [value == code for value in column]
+
+def _both(left, right):
+    if np is not None:
+        return left & right
+    return [a and b for a, b in zip(left, right)]
+
+def _lookup(table, codes):
+    """table[code] for every code in a column."""
+    if np is not None:
+        return np.asarray(table, dtype=bool)[codes] if len(table) else np.zeros(len(codes), dtype=bool)
+    return [table[code] for code in codes]
+
+def _group_sum(codes, size, selected, weights=None):
+    """Per-code row count (or sum of weights) over the selected rows, as a list of ints."""
+    if np is not None:
+        return np.bincount(codes[selected], weights=None if weights is None else weights[selected],
+                           minlength=size).round().astype(np.int64).tolist()
+    sums = [0] * size
+    for code, keep, weight in zip(codes, selected, weights if weights is not None else itertools.repeat(1)):
+        if keep:
+            sums[code] += weight
+    return sums
+
+def sales_report(columns, stock, since=None, until=None, top=REPORT_TOP_N):
+    """Sales by item, day, hour and payment method, top sellers, sell-through and pending GCash exposure.
+
+    since/until ('YYYY-MM-DD', inclusive) limit the sales to a period; the
+    pending exposure always covers every open order.
+    """
+    def in_period(day):
+        if day == UNKNOWN_DAY:
+            return since is None and until is None
+        return (since is None or since <= day) and (until is None or day <= until)
+
+    status, method, customer, day, hour, total = map(_column, (columns.status, columns.method, columns.customer,
+                                                               columns.day, columns.hour, columns.total))
+    line_tx, line_item, line_qty, line_revenue = map(_column, (columns.line_tx, columns.line_item,
+                                                               columns.line_qty, columns.line_revenue))
+    status_code = {name: code for code, name in enumerate(columns.status_names)}
+    paid = _both(_equals(status, status_code.get('PAID', -1)), _lookup([in_period(d) for d in columns.day_names], day))
+    pending = _lookup([name in UNPAID_STATUSES for name in columns.status_names], status)
+    paid_lines = _lookup(paid, line_tx)
+
+    item_qty = _group_sum(line_item, len(_item_keys), paid_lines, line_qty)
+    item_revenue = _group_sum(line_item, len(_item_keys), paid_lines, line_revenue)
+    by_item = []
+    for item, qty in enumerate(item_qty):
+        if qty:
+            on_hand = stock.get(_item_keys[item], 0)
+            by_item.append({'item': _item_keys[item], 'qty': qty, 'revenue': item_revenue[item] / 100, 'stock': on_hand,
+                            'sell_through': qty / (qty + on_hand) if qty + on_hand > 0 else None})
+    by_item.sort(key=lambda line: line['revenue'], reverse=True)
+
+    def grouped(key, codes, names):
+        orders = _group_sum(codes, len(names), paid)
+        revenue = _group_sum(codes, len(names), paid, total)
+        return [{key: names[code], 'orders': orders[code], 'revenue': revenue[code] / 100}
+                for code in range(len(names)) if orders[code]]
+
+    hours = [f"{h:02d}:00" for h in range(24)] + [UNKNOWN_DAY]
+    pending_orders = _group_sum(customer, len(columns.customer_names), pending)
+    pending_amount = _group_sum(customer, len(columns.customer_names), pending, total)
+    pending_days = _group_sum(day, len(columns.day_names), pending)
+    orders = sum(_group_sum(status, len(columns.status_names), paid))
+    revenue = sum(_group_sum(status, len(columns.status_names), paid, total)) / 100
+    items_sold = sum(item_qty)
+    stock_left = sum(stock.values())
+    return {
+        'summary': {
+            'since': since, 'until': until, 'transactions': len(columns), 'engine': 'numpy' if np is not None else 'python',
+            'orders': orders, 'revenue': revenue, 'average_order': revenue / orders if orders else 0,
+            'items_sold': items_sold,
+            'sell_through': items_sold / (items_sold + stock_left) if items_sold + stock_left > 0 else None,
+            'pending_orders': sum(pending_orders), 'pending_amount': sum(pending_amount) / 100,
+            'oldest_pending_day': min((columns.day_names[code] for code, count in enumerate(pending_days) if count), default=None)
+        },
+        'by_item': by_item,
+        'top_sellers': heapq.nlargest(top, by_item, key=lambda line: line['qty']),
+        'by_day': sorted(grouped('day', day, columns.day_names), key=lambda line: line['day']),
+        'by_hour': grouped('hour', hour, hours),
+        'by_method': grouped('method', method, columns.method_names),
+        'pending_by_customer': sorted(({'customer': columns.customer_names[code], 'orders': pending_orders[code],
+                                        'amount': pending_amount[code] / 100}
+                                       for code in range(len(columns.customer_names)) if pending_orders[code]),
+                                      key=lambda line: line['amount'], reverse=True)
+    }
+
+def export_report(report, path, fmt='json'):
+    """Write a sales report as one JSON file, or as a directory of CSV files (one per table)."""
+    if fmt == 'json':
+        with atomic_write(path) as file:
+            json.dump(report, file, indent=2)
+        return
+    os.makedirs(path, exist_ok=True)
+    for name, table in report.items():
+        rows = [{'field': key, 'value': value} for key, value in table.items()] if isinstance(table, dict) else table
+        with atomic_write(os.path.join(path, f"{name}.csv")) as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else ['field', 'value'])
+            writer.writeheader()
+            writer.writerows(rows)
+
+#parallel export
+class ExportTotals:
+    """Per-item, per-customer and per-method totals of (part of) an export. Amounts are summed in centavos.
+
+    Each worker totals its own part of the history; merge() adds the parts up.
+    """
+
+    def __init__(self):
+        self.transactions = 0
+        self.by_item = {} # item_key -> [qty, revenue] (PAID)
+        self.by_customer = {} # customer -> [orders, paid, pending]
+        self.by_method = {} # method -> [orders, revenue] (PAID)
+
+    def add(self, tx):
+        self.transactions += 1
+        amount = to_centavos(tx['total_amount'])
+        totals = self.by_customer.setdefault(tx['customer'], [0, 0, 0])
+        totals[0] += 1
+        if tx['status'] in UNPAID_STATUSES:
+            totals[2] += amount
+        if tx['status'] != 'PAID':
+            return
+        totals[1] += amount
+        totals = self.by_method.setdefault(tx['method'], [0, 0])
+        totals[0] += 1
+        totals[1] += amount
+        for item_key, (qty, revenue) in line_totals(tx).items():
+            totals = self.by_item.setdefault(item_key, [0, 0])
+            totals[0] += qty
+            totals[1] += to_centavos(revenue)
+
+    def merge(self, other):
+        self.transactions += other.transactions
+        for mine, theirs in ((self.by_item, other.by_item), (self.by_customer, other.by_customer),
+                             (self.by_method, other.by_method)):
+            for key, values in theirs.items():
+                totals = mine.get(key)
+                if totals is None:
+                    mine[key] = values
+                else:
+                    for i, value in enumerate(values):
+                        totals[i] += value
+
+    def report(self):
+        """The totals as tables for export_report()."""
+        orders = sum(orders for orders, _ in self.by_method.values())
+        return {
+            'summary': {
+                'transactions': self.transactions, 'orders': orders,
+                'revenue': sum(revenue for _, revenue in self.by_method.values()) / 100,
+                'pending_amount': sum(totals[2] for totals in self.by_customer.values()) / 100,
+                'customers': len(self.by_customer)
+            },
+            'by_item': sorted(({'item': item_key, 'qty': qty, 'revenue': revenue / 100}
+                               for item_key, (qty, revenue) in self.by_item.items()),
+                              key=lambda line: line['revenue'], reverse=True),
+            'by_customer': sorted(({'customer': customer, 'orders': orders, 'paid': paid / 100, 'pending': pending / 100}
+                                   for customer, (orders, paid, pending) in self.by_customer.items()),
+                                  key=lambda line: line['paid'], reverse=True),
+            'by_method': [{'method': method, 'orders': orders, 'revenue': revenue / 100}
+                          for method, (orders, revenue) in sorted(self.by_method.items())]
+        }
+
+_export_index = None # tx_id -> offset of the live record in SALES_FILE, set in each export worker
+
+def _init_export_worker(index):
+    global _export_index
+    _export_index = index
+
+def _iter_live_range(path, start, end):
+    """Yield (decoded transaction, CSV line) for the live records of SALES_FILE that start in [start, end)."""
+    with open(path, mode='rb') as file:
+        file.seek(start)
+        offset = start
+        while offset < end:
+            lines = file.readlines(EXPORT_READ_SIZE)
+            texts = []
+            read = 0
+            for line in lines:
+                if offset >= end or not line.endswith(b'\n'):
+                    break
+                # Only the lines the index points at are parsed: a malformed line never is (see TransactionStore._read_row)
+                tx_id = line.partition(b',')[0]
+                if tx_id.isdigit() and _export_index.get(int(tx_id)) == offset:
+                    texts.append(line.decode('utf-8', errors='replace'))
+                offset += len(line)
+                read += 1
+            # One csv.reader per batch of lines instead of one per line
+            for text, values in zip(texts, csv.reader(texts)):
+                row = dict(zip(TX_FIELDS, values))
+                if row.get('status') == VOID_STATUS:
+                    continue
+                try:
+                    tx = TransactionStore._decode(row)
+                except (ValueError, KeyError):
+                    continue
+                yield tx, text
+            if read < len(lines) or not lines:
+                break
+
+def _iter_export_task(kind, source, start, end):
+    if kind == 'csv':
+        yield from _iter_live_range(source, start, end)
+    elif kind == 'archive':
+        partition = ArchivePartition(source)
+        try:
+            for tx in partition.iter_between():
+                if tx['tx_id'] not in _export_index: # Changed or voided since it was sealed
+                    yield tx, None
+        finally:
+            partition.close()
+    else:
+        conn = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        try:
+            query = SqliteBackend.SELECT_TX + " WHERE tx_id >= ? AND tx_id < ? AND status != ? ORDER BY tx_id"
+            for row in conn.execute(query, (start, end, VOID_STATUS)):
+                yield SqliteBackend._tx_from_row(row), None
+        finally:
+            conn.close()
+
+def export_part(task):
+    """Export one part of the history (runs in a worker process).
+
+    task is (kind, source, start, end, part_path, fmt): a row-aligned byte
+    range of SALES_FILE ('csv'), an archive partition ('archive') or a tx_id
+    range of the SQLite table ('sqlite'). The part's transactions are written
+    to part_path; returns its ExportTotals.
+    """
+    kind, source, start, end, part_path, fmt = task
+    totals = ExportTotals()
+    with open(part_path, mode='w', newline='', encoding='utf-8') as out:
+        writer = csv.DictWriter(out, fieldnames=TX_FIELDS, extrasaction='ignore')
+        for tx, line in _iter_export_task(kind, source, start, end):
+            totals.add(tx)
+            if fmt == 'jsonl':
+                out.write(json.dumps(transaction_json(tx)) + '\n')
+            elif line is not None:
+                out.write(line) # Already in the export's CSV format
+            else:
+                writer.writerow(TransactionStore._encode(tx))
+    return totals
+
+def _row_aligned_ranges(path, start, end, parts):
+    """Split [start, end) of path into up to `parts` byte ranges that each begin at the start of a row."""
+    bounds = [start]
+    with open(path, mode='rb') as file:
+        for i in range(1, parts):
+            file.seek(start + (end - start) * i // parts - 1)
+            file.readline() # Skip to the end of the row the cut falls in
+            if bounds[-1] < file.tell() < end:
+                bounds.append(file.tell())
+    bounds.append(end)
+    return list(zip(bounds, bounds[1:]))
+
+def plan_export(storage, parts):
+    """Return (tasks, live index) covering the whole live history, for export_part()."""
+    if isinstance(storage, SqliteBackend):
+        first, last = storage.conn.execute("SELECT MIN(tx_id), MAX(tx_id) FROM transactions").fetchone()
+        if first is None:
+            return [], {}
+        step = max(EXPORT_MIN_PART_ROWS, -(-(last + 1 - first) // parts))
+        source = os.path.abspath(storage.path)
+        return [('sqlite', source, low, min(low + step, last + 1)) for low in range(first, last + 1, step)], {}
+    store = storage.get_sales_store()
+    tasks = [('archive', partition.path, 0, 0) for _, partition in sorted(store.archive.partitions.items())]
+    if os.path.exists(store.path):
+        with open(store.path, mode='rb') as file:
+            header_end = len(file.readline())
+        parts = max(1, min(parts, (store.end - header_end) // EXPORT_MIN_PART_BYTES))
+        tasks += [('csv', os.path.abspath(store.path), start, end)
+                  for start, end in _row_aligned_ranges(store.path, header_end, store.end, parts)]
+    return tasks, dict(store.index)
+
+def export_history(path, fmt='csv', workers=EXPORT_WORKERS):
+    """Write every live transaction to path (CSV or JSONL) and return the merged ExportTotals.
+
+    The history is cut into parts that worker processes parse in parallel,
+    each into a temporary file; the parts are appended to path in order as
+    they finish, so the output is in storage order.
+    """
+    storage = get_storage()
+    with storage_lock(): # The cut must not race an append or a seal
+        tasks, index = plan_export(storage, workers * EXPORT_PARTS_PER_WORKER)
+    parts_dir = tempfile.mkdtemp(prefix='.export-', dir=os.path.dirname(os.path.abspath(path)))
+    tasks = [task + (os.path.join(parts_dir, f"{i}.part"), fmt) for i, task in enumerate(tasks)]
+    totals = ExportTotals()
+    pool = None
+    try:
+        if workers > 1 and len(tasks) > 1:
+            pool = futures.ProcessPoolExecutor(workers, initializer=_init_export_worker, initargs=(index,))
+            parts = pool.map(export_part, tasks)
+        else:
+            _init_export_worker(index)
+            parts = map(export_part, tasks)
+        with atomic_write(path, mode='wb') as out:
+            if fmt == 'csv':
+                out.write((','.join(TX_FIELDS) + '\r\n').encode('utf-8'))
+            for task, part in zip(tasks, parts):
+                totals.merge(part)
+                with open(task[4], mode='rb') as file:
+                    shutil.copyfileobj(file, out)
+                os.remove(task[4])
+        count('rows_exported', totals.transactions)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+    return totals
+
+#reorder alerts
+class ReorderMonitor:
+    """Items ordered by estimated days to stock-out, kept current one sale at a time.
+
+    Each item's sales velocity is an exponentially decayed rate (units/day,
+    time constant REORDER_VELOCITY_DAYS) updated in O(1) when it sells. Every
+    rate decays by the same factor, so the heap key
+    log(stock) - log(rate) - last_sale / tau orders the items correctly at
+    any later moment without being touched: a sale pushes one entry (O(log n)),
+    and entries left behind by later sales are skipped when the heap is read.
+    """
+
+    def __init__(self, rates=None):
+        self.rates = rates or {} # item_key -> [units/day as of last_sale, last_sale (epoch seconds)]
+        self.heap = [] # (key, version, item_key, stock when pushed)
+        self.versions = {} # item_key -> version of its live heap entry
+        self.alerted = set() # Items already alerted, until a sale shows them above the thresholds again
+        self.alerts = [] # New alerts, drained by take_alerts()
+
+    @staticmethod
+    def _key(qty, rate, last_sale):
+        if qty <= 0:
+            return -math.inf
+        return math.log(qty) - math.log(rate) - last_sale / (REORDER_VELOCITY_DAYS * 86400)
+
+    def _push(self, item_key, qty):
+        rate, last_sale = self.rates[item_key]
+        version = self.versions[item_key] = self.versions.get(item_key, 0) + 1
+        heapq.heappush(self.heap, (self._key(qty, rate, last_sale), version, item_key, qty))
+
+    def rate(self, item_key, now=None):
+        """Current sales velocity of an item in units/day (0 if it has not sold)."""
+        rate, last_sale = self.rates.get(item_key, (0, 0))
+        if not rate:
+            return 0
+        return rate * math.exp(-max(0, (now or time.time()) - last_sale) / (REORDER_VELOCITY_DAYS * 86400))
+
+    def status(self, item_key, qty, now=None):
+        """{'item', 'stock', 'per_day', 'days_left', 'reorder_qty'} for one item at its current pace."""
+        per_day = self.rate(item_key, now)
+        target = per_day * (REORDER_LEAD_DAYS + REORDER_COVER_DAYS)
+        return {
+            'item': item_key,
+            'stock': qty,
+            'per_day': per_day,
+            'days_left': qty / per_day if per_day else None,
+            'reorder_qty': max(0, math.ceil(target - qty)) if per_day else max(0, REORDER_MIN_STOCK + 1 - qty)
+        }
+
+    def record_sale(self, item_key, qty, stock_left, now=None):
+        """Fold one sale into the item's velocity, re-rank it and raise an alert if it is running low."""
+        now = now or time.time()
+        self.rates[item_key] = [self.rate(item_key, now) + qty / REORDER_VELOCITY_DAYS, now]
+        self._push(item_key, stock_left)
+        if len(self.heap) > 2 * len(self.versions) + REORDER_HEAP_SLACK:
+            self.heap = [entry for entry in self.heap if self.versions.get(entry[2]) == entry[1]]
+            heapq.heapify(self.heap)
+        status = self.status(item_key, stock_left, now)
+        if stock_left <= REORDER_MIN_STOCK or status['days_left'] <= REORDER_ALERT_DAYS:
+            if item_key not in self.alerted:
+                self.alerted.add(item_key)
+                self.alerts.append(status)
+        else:
+            self.alerted.discard(item_key)
+
+    def take_alerts(self):
+        """Return the alerts raised since the last call."""
+        alerts, self.alerts = self.alerts, []
+        return alerts
+
+    def suggestions(self, stock, limit=REORDER_LIST_SIZE, now=None):
+        """The most urgent items that need reordering, soonest stock-out first (O(limit log n)).
+
+        Entries whose stock changed since they were pushed (restocks, refunds,
+        other tills) are re-ranked on the way.
+        """
+        taken = []
+        found = []
+        while self.heap and len(found) < limit:
+            entry = heapq.heappop(self.heap)
+            _, version, item_key, qty = entry
+            if self.versions.get(item_key) != version:
+                continue
+            if item_key not in stock:
+                del self.versions[item_key]
+                continue
+            if stock[item_key] != qty:
+                self._push(item_key, stock[item_key]) # Re-ranked; it comes back out in its new place
+                continue
+            taken.append(entry)
+            status = self.status(item_key, qty, now)
+            if status['reorder_qty'] <= 0:
+                break # Everything further down lasts longer than the lead time plus the cover
+            found.append(status)
+        for entry in taken:
+            heapq.heappush(self.heap, entry)
+        return found
+
+    def to_json(self):
+        return {'rates': self.rates}
+
+    @classmethod
+    def from_json(cls, data, stock):
+        monitor = cls({item_key: rate for item_key, rate in data.get('rates', {}).items() if item_key in stock})
+        monitor.heap = [(cls._key(stock[item_key], rate, last_sale), 1, item_key, stock[item_key])
+                        for item_key, (rate, last_sale) in monitor.rates.items()]
+        monitor.versions = dict.fromkeys(monitor.rates, 1)
+        heapq.heapify(monitor.heap)
+        return monitor
+
+_reorder = None
+
+def get_reorder_monitor(stock):
+    """Return the ReorderMonitor, restored from REORDER_FILE on first use."""
+    global _reorder
+    if _reorder is None:
+        try:
+            with open(REORDER_FILE, mode='r') as file:
+                _reorder = ReorderMonitor.from_json(json.load(file), stock)
+        except FileNotFoundError:
+            _reorder = ReorderMonitor()
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Error loading sales velocities: {e}. Starting fresh.")
+            _reorder = ReorderMonitor()
+    return _reorder
+
+def save_reorder_state():
+    """Save the sales velocities so the forecasts survive a restart.
+
+    With several tills each one only sees its own sales; per item the one
+    with the most recent sale is kept.
+    """
+    if _reorder is None:
+        return
+    try:
+        with storage_lock():
+            rates = {}
+            if MULTI_TILL and os.path.exists(REORDER_FILE):
+                with open(REORDER_FILE, mode='r') as file:
+                    rates = json.load(file).get('rates', {})
+            for item_key, rate in _reorder.rates.items():
+                if item_key not in rates or rates[item_key][1] <= rate[1]:
+                    rates[item_key] = rate
+            with atomic_write(REORDER_FILE) as file:
+                json.dump({'rates': rates}, file)
+    except Exception as e:
+        print(f"Error saving sales velocities: {e}")
+
+#product search
+class ProductIndex:
+    """Search index over the product keys and their SKU/barcode aliases.
+
+    Prefix lookups bisect a sorted list of terms (every name, every word of
+    a name and every alias); names with a typo are found by trigram overlap.
+    Both are updated in place when a product or alias is added or removed.
+    """
+
+    def __init__(self, item_keys=(), aliases=None):
+        self.generation = None # catalog_generation() of the menu it was built for or last updated with
+        self.terms = [] # Sorted (term, item_key)
+        self.trigrams = {} # trigram -> set of item_keys
+        self.sizes = {} # item_key -> number of trigrams in its name
+        self.aliases = {} # alias -> item_key
+        for item_key in item_keys:
+            self.terms.extend(self._name_terms(item_key))
+            self._add_trigrams(item_key)
+        for alias, item_key in (aliases or {}).items():
+            if item_key in self.sizes:
+                self.aliases[alias] = item_key
+                self.terms.append((alias, item_key))
+        self.terms.sort()
+
+    @staticmethod
+    def _name_terms(item_key):
+        return [(term, item_key) for term in {item_key, *item_key.split()}]
+
+    @staticmethod
+    def _trigrams(text):
+        padded = f"  {text} "
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    def _add_trigrams(self, item_key):
+        trigrams = self._trigrams(item_key)
+        self.sizes[item_key] = len(trigrams)
+        for trigram in trigrams:
+            self.trigrams.setdefault(trigram, set()).add(item_key)
+
+    def _remove_term(self, term):
+        i = bisect.bisect_left(self.terms, term)
+        if i < len(self.terms) and self.terms[i] == term:
+            del self.terms[i]
+
+    def add(self, item_key):
+        for term in self._name_terms(item_key):
+            bisect.insort(self.terms, term)
+        self._add_trigrams(item_key)
+
+    def remove(self, item_key):
+        """Drop a product and its aliases. Returns the aliases that were dropped."""
+        for term in self._name_terms(item_key):
+            self._remove_term(term)
+        for trigram in self._trigrams(item_key):
+            keys = self.trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(item_key)
+                if not keys:
+                    del self.trigrams[trigram]
+        self.sizes.pop(item_key, None)
+        dropped = [alias for alias, key in self.aliases.items() if key == item_key]
+        for alias in dropped:
+            del self.aliases[alias]
+            self._remove_term((alias, item_key))
+        return dropped
+
+    def add_alias(self, alias, item_key):
+        previous = self.aliases.get(alias)
+        if previous is not None:
+            self._remove_term((alias, previous))
+        self.aliases[alias] = item_key
+        bisect.insort(self.terms, (alias, item_key))
+
+    def lookup(self, text):
+        """The product key for an exact name or SKU/barcode, else None."""
+        text = text.strip().lower()
+        if text in self.sizes:
+            return text
+        return self.aliases.get(text)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """Return up to limit product keys for text, best first.
+
+        An exact name or alias comes first, then names that start with text,
+        then names with a word or SKU/barcode that does, then close spellings.
+        """
+        text = text.strip().lower()
+        if not text:
+            return []
+        scores = {}
+        exact = self.lookup(text)
+        if exact is not None:
+            scores[exact] = 4
+        i = bisect.bisect_left(self.terms, (text,))
+        while i < len(self.terms) and len(scores) < limit * 4:
+            term, item_key = self.terms[i]
+            if not term.startswith(text):
+                break
+            scores[item_key] = max(scores.get(item_key, 0), 3 if term == item_key else 2)
+            i += 1
+
+        if len(scores) < limit:
+            # Rare trigrams say the most about a name, so candidates come from them first
+            # (one shared by most of the catalog, like 'str' of 'strain ...', rarely gets a look in)
+            trigrams = self._trigrams(text)
+            postings = sorted((self.trigrams.get(trigram, set()) for trigram in trigrams), key=len)
+            candidates = set()
+            for keys in postings:
+                if len(candidates) >= SEARCH_MAX_CANDIDATES:
+                    break
+                candidates.update(itertools.islice(keys, SEARCH_MAX_CANDIDATES - len(candidates)))
+            for item_key in candidates:
+                if item_key in scores:
+                    continue
+                hits = sum(1 for keys in postings if item_key in keys)
+                similarity = hits / (len(trigrams) + self.sizes[item_key] - hits)
+                if similarity >= SEARCH_MIN_SIMILARITY:
+                    scores[item_key] = similarity # Always below the prefix matches
+        return heapq.nlargest(limit, scores, key=lambda item_key: (scores[item_key], -len(item_key)))
+
+_product_index = None
+_product_index_lock = threading.Lock()
+
+def catalog_generation(menu):
+    """A value that changes whenever an item is added to or removed from menu (for a plain dict, the hash of its keys)."""
+    generation = getattr(menu, 'generation', None)
+    return hash(frozenset(menu)) if generation is None else generation
+
+def get_product_index(menu):
+    """Return the product search index, built on first use (and again when the catalog's items changed, e.g. by another till).
+
+    Whoever adds or removes an item in the index in place sets its generation
+    to the menu's, so it is not rebuilt for that change.
+    """
+    global _product_index
+    with _product_index_lock: # Built once even when the history loader thread asks for it too
+        generation = catalog_generation(menu)
+        if _product_index is None or _product_index.generation != generation:
+            _product_index = ProductIndex(menu, load_aliases())
+            _product_index.generation = generation
+        return _product_index
+
+#checkout engine
+class CheckoutError(ValueError):
+    """An order that cannot be checked out (unknown item, bad quantity, not enough stock, ...)."""
+
+def check_text(text, field):
+    """Raise CheckoutError if free text holds control characters: a line break would split its CSV record."""
+    if not isinstance(text, str):
+        raise CheckoutError(f"{field} must be text.")
+    if any(ord(ch) < 32 or ord(ch) == 127 for ch in text):
+        raise CheckoutError(f"{field} must not contain control characters: {text!r}.")
+
+def calculate_total(order, menu):
+    """Total price of an order at the current menu prices."""
+    return Money(sum(menu[item_key] * qty for item_key, qty in order.items()))
+
+@timed('validate_order')
+def validate_order(order, menu, stock):
+    """Raise CheckoutError unless every line is a known item with a positive quantity that is in stock."""
+    if not order:
+        raise CheckoutError("Order has no items.")
+    for item_key, qty in order.items():
+        if item_key not in menu:
+            raise CheckoutError(f"Unknown product/strain '{item_key}'.")
+        if not isinstance(qty, int) or isinstance(qty, bool) or qty <= 0:
+            raise CheckoutError(f"Invalid quantity for {item_key}: {qty!r}.")
+        if qty > stock.get(item_key, 0):
+            raise CheckoutError(f"Insufficient stock for {item_key}: {stock.get(item_key, 0)} available, {qty} ordered.")
+
+def check_order(order, menu, stock, customer_name="Guest Customer"):
+    """Raise CheckoutError unless the order can be checked out right now.
+
+    Runs under the storage lock, so in MULTI_TILL mode the other tills'
+    latest sales are counted. Call it before taking the customer's money;
+    checkout() checks again when it saves.
+    """
+    with storage_lock(menu, stock):
+        check_text(customer_name or '', "Customer name")
+        validate_order(order, menu, stock)
+
+def prepare_checkout(order, method, menu, stock, customer_name="Guest Customer", pending=False):
+    """Validate an order and build its transaction without saving it.
+
+    The stock is deducted from the in-memory stock dict right away so the
+    next order in a batch is validated against what is left: PAID sales take
+    it for good, pending GCash orders hold it as a reservation (RESERVED_STATUS)
+    until they are paid or the reservation expires (see expire_reservations).
+    """
+    check_text(customer_name or '', "Customer name")
+    check_text(method, "Payment method")
+    for item_key in order:
+        check_text(item_key, "Item name")
+    if method not in PAYMENT_METHODS:
+        raise CheckoutError(f"Unknown payment method '{method}'.")
+    if pending and method != 'GCash':
+        raise CheckoutError("Only GCash payments can be left pending.")
+    validate_order(order, menu, stock)
+
+    tx = {
+        'customer': customer_name or "Guest Customer",
+        'total_amount': calculate_total(order, menu),
+        'method': method,
+        'status': RESERVED_STATUS if pending else 'PAID',
+        'order_items': dict(order),
+        'item_prices': {item_key: menu[item_key] for item_key in order}
+    }
+    deduct_stock(stock, order)
+    return tx
+
+@timed('checkout')
+def checkout(order, method, menu, stock, customer_name="Guest Customer", pending=False):
+    """Non-interactive checkout: validate, deduct stock, save. Returns the saved transaction.
+
+    The stock check, the deduction and the write happen under one storage
+    lock, so in MULTI_TILL mode two tills cannot sell the same last unit.
+    """
+    with storage_lock(menu, stock):
+        tx = prepare_checkout(order, method, menu, stock, customer_name, pending)
+        if not save_checkout(tx, menu, stock):
+            unprepare_checkouts([tx], stock)
+            raise CheckoutError("The sale could not be saved; no stock was taken.")
+    return tx
+
+def unprepare_checkouts(txs, stock):
+    """Give back the stock prepare_checkout() deducted for transactions that were not saved after all."""
+    for tx in txs:
+        for item_key, qty in order_items_of(tx).items():
+            if item_key in stock:
+                stock[item_key] += qty
+
+def prepare_payment(tx_id, menu, stock, tx=None):
+    """Check that a pending GCash order can be confirmed and return (its PAID copy, stock moves) without saving.
+
+    A reserved order already holds its stock. One whose reservation expired
+    (or that predates reservations) deducts it from the in-memory stock dict
+    now, if it is still there (items since removed from the menu are skipped).
+    """
+    tx = tx or get_transaction(tx_id)
+    if tx is None:
+        raise CheckoutError(f"Unknown transaction #{tx_id}.")
+    if tx['status'] == 'PAID':
+        raise CheckoutError(f"Transaction #{tx_id} is already PAID.")
+    if tx['status'] == RESERVED_STATUS:
+        return dict(tx, status='PAID'), []
+    order = {item_key: qty for item_key, qty in order_items_of(tx).items() if item_key in stock}
+    for item_key, qty in order.items():
+        if qty > stock[item_key]:
+            raise CheckoutError(f"Insufficient stock for {item_key}: {stock[item_key]} available, {qty} ordered.")
+    deduct_stock(stock, order)
+    return dict(tx, status='PAID'), [('sale', item_key, -qty) for item_key, qty in order.items()]
 
-def load_data():
-    """Load menu and stock data from INVENTORY_FILE."""
-    menu = {}
-    stock = {}
-    if os.path.exists(INVENTORY_FILE):
-        print("\n")
-        try:
-            with open(INVENTORY_FILE, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    key = row['item_key']
-                    menu[key] = float(row['price'])
-                    stock[key] = int(row['stock'])
-            print("Inventory loaded successfully.")
-        except Exception as e:
-            print("\n")
-    return menu, stock
+def confirm_payment(tx_id, menu, stock):
+    """Mark a pending GCash order PAID (deducting its stock unless it was reserved). Returns the updated transaction."""
+    with storage_lock(menu, stock):
+        tx, moves = prepare_payment(tx_id, menu, stock)
+        if not save_payments([tx], menu, stock, moves):
+            for _, item_key, delta in moves:
+                stock[item_key] -= delta
+            raise CheckoutError(f"The payment for transaction #{tx_id} could not be saved; it is still pending.")
+    return tx
 
-#inventory csv
-def save_inventory(menu, stock):
-    """Save menu and stock data to INVENTORY_FILE."""
+def void_order(tx_id, menu, stock):
+    """Void a transaction, giving back the stock a reserved order still holds, in one write.
+
+    Returns (the transaction as it was, the ('refund', item_key, qty) moves).
+    Its status is read under the storage lock, so an order another till has
+    just confirmed keeps its stock sold.
+    """
+    with storage_lock(menu, stock):
+        tx = get_transaction(tx_id)
+        if tx is None:
+            raise CheckoutError(f"Transaction #{tx_id} was already removed.")
+        moves = []
+        if tx['status'] == RESERVED_STATUS: # Expired reservations already gave their stock back
+            for item_key, qty in order_items_of(tx).items():
+                if item_key in stock:
+                    stock[item_key] += qty
+                    moves.append(('refund', item_key, qty))
+        if not save_status_changes([dict(tx, status=VOID_STATUS)], menu, stock, moves, "void"):
+            for _, item_key, qty in moves:
+                stock[item_key] -= qty
+            raise CheckoutError(f"Transaction #{tx_id} could not be removed; nothing was changed.")
+    return tx, moves
+
+def reservation_expiry(tx):
+    """When a reserved order's hold on its stock runs out (None if it has no timestamp)."""
     try:
-        with open(INVENTORY_FILE, mode='w', newline='') as file:
-            fieldnames = ['item_key', 'price', 'stock']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for item_key, price in menu.items():
-                writer.writerow({
-                    'item_key': item_key,
-                    'price': price,
-                    'stock': stock.get(item_key, 0)
-                })
-        # print(f"Inventory saved to {INVENTORY_FILE}")
-    except Exception as e:
-        print(f"Error saving inventory: {e}")
+        return datetime.strptime(tx.get('created_at') or '', TIMESTAMP_FORMAT) + timedelta(hours=RESERVATION_HOURS)
+    except ValueError:
+        return None
 
-#transaction csv
-def load_transactions():
-    """Load transaction history from SALES_FILE."""
-    transactions = []
-    if os.path.exists(SALES_FILE):
-        print("\n")
+@timed('expire_reservations')
+def expire_reservations(menu, stock, now=None):
+    """Return the stock of reserved GCash orders older than RESERVATION_HOURS. Returns the expired orders.
+
+    They stay pending (PENDING_STATUS) and can still be confirmed or matched
+    by reconcile_statement() if the stock is there by then. The reserved
+    orders are found among the aggregate cache's pending list, so no history
+    is read when nothing has expired.
+    """
+    now = now or datetime.now()
+    with storage_lock(menu, stock):
+        expired = [dict(tx, status=PENDING_STATUS) for tx in get_aggregates().pending.values()
+                   if tx['status'] == RESERVED_STATUS and (reservation_expiry(tx) or now) <= now]
+        if not expired:
+            return []
+        moves = []
+        for tx in expired:
+            for item_key, qty in order_items_of(tx).items():
+                if item_key in stock:
+                    stock[item_key] += qty
+                    moves.append(('release', item_key, qty))
+        if not save_status_changes(expired, menu, stock, moves, "expired reservations"):
+            for _, item_key, qty in moves:
+                stock[item_key] -= qty
+            return []
+    return expired
+
+#batch checkout
+def parse_order_items(items):
+    """Accept an order as a dict, a JSON object string or 'item:qty;item:qty' text."""
+    if isinstance(items, dict):
+        return {str(key).strip().lower(): qty for key, qty in items.items()}
+    items = (items or '').strip()
+    if items.startswith('{'):
+        return parse_order_items(json.loads(items))
+    order = {}
+    for line in filter(None, items.split(';')):
+        item_key, _, qty = line.rpartition(':')
+        item_key = item_key.strip().lower()
+        order[item_key] = order.get(item_key, 0) + int(qty)
+    return order
+
+def read_batch_orders(path):
+    """Stream (line_no, row) from a .jsonl or .csv orders file.
+
+    Each row has 'items' and optionally 'customer', 'method' (Cash/GCash,
+    default Cash) and 'status' ('pending' leaves a GCash order unpaid).
+    JSONL rows are yielded as undecoded text so a bad line only rejects itself.
+    """
+    with open(path, mode='r', newline='') as file:
+        if path.lower().endswith('.csv'):
+            for line_no, row in enumerate(csv.DictReader(file), 2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(file, 1):
+                if line.strip():
+                    yield line_no, line
+
+def run_batch(path, menu, stock, batch_size=BATCH_SIZE):
+    """Check out every order in path, committing each batch_size orders with grouped writes.
+
+    Returns (accepted, rejected, total amount).
+    """
+    totals = {'accepted': 0, 'rejected': 0, 'amount': Money(0)}
+    rows = []
+    for line_no, row in read_batch_orders(path):
+        rows.append((line_no, row))
+        if len(rows) >= batch_size:
+            _checkout_batch(rows, menu, stock, totals)
+            rows = []
+    if rows:
+        _checkout_batch(rows, menu, stock, totals)
+    return totals['accepted'], totals['rejected'], totals['amount']
+
+def prepare_order_row(row, menu, stock):
+    """prepare_checkout() for an order given as a dict or JSON text with 'items', 'customer', 'method' and 'status'."""
+    if isinstance(row, (str, bytes)):
+        row = json.loads(row)
+    customer, method, status = (row.get(key) or '' for key in ('customer', 'method', 'status'))
+    for text, field in ((customer, "Customer name"), (method, "Payment method"), (status, "Status")):
+        check_text(text, field) # Before strip(), which would hide a trailing line break
+    method = method.strip() or 'Cash'
+    method = {'cash': 'Cash', 'gcash': 'GCash'}.get(method.lower(), method)
+    pending = status.strip().lower() in ('pending', 'unpaid', PENDING_STATUS.lower())
+    return prepare_checkout(parse_order_items(row.get('items')), method, menu, stock, customer.strip(), pending)
+
+def _checkout_batch(rows, menu, stock, totals):
+    # Validate and save the whole group under one storage lock: one stock check, one grouped write
+    batch = []
+    with storage_lock(menu, stock):
+        for line_no, row in rows:
+            try:
+                tx = prepare_order_row(row, menu, stock)
+            except (CheckoutError, ValueError, TypeError, AttributeError) as e:
+                totals['rejected'] += 1
+                print(f"  Line {line_no}: rejected ({e})")
+                continue
+            batch.append(tx)
+        if batch and not save_checkouts(batch, menu, stock):
+            unprepare_checkouts(batch, stock)
+            totals['rejected'] += len(batch)
+            print(f"  {len(batch)} orders rejected: they could not be saved.")
+            return
+    totals['accepted'] += len(batch)
+    totals['amount'] += sum((tx['total_amount'] for tx in batch if tx['status'] == 'PAID'), Money(0))
+
+#gcash reconciliation
+STATEMENT_COLUMNS = {
+    'amount': ('credit', 'amount', 'credit amount', 'amount received'),
+    'name': ('sender', 'name', 'from', 'account name', 'description', 'details'),
+    'paid_at': ('date and time', 'datetime', 'date', 'transaction date', 'time'),
+    'reference': ('reference no.', 'reference no', 'reference', 'ref no.', 'ref no', 'ref')
+}
+STATEMENT_FILLER_WORDS = {'received', 'from', 'gcash', 'payment', 'transfer', 'sent', 'via', 'to', 'guest', 'customer'}
+
+def _name_words(text):
+    """Lowercase words of a name; '*' is kept since statements mask names (e.g. 'JU*N D*LA C**Z')."""
+    words = ''.join(ch if ch.isalnum() or ch == '*' else ' ' for ch in (text or '').lower()).split()
+    return [word for word in words if word not in STATEMENT_FILLER_WORDS]
+
+def _word_matches(word, statement_word):
+    if word == statement_word:
+        return True
+    if len(statement_word) == 1 or statement_word.endswith('*') and len(statement_word.rstrip('*')) <= 1:
+        return word[0] == statement_word[0] # An initial
+    return len(word) == len(statement_word) and all(a == b or b == '*' for a, b in zip(word, statement_word))
+
+def name_score(customer, statement_name):
+    """Share of the customer's name words found in the statement's sender, or None for a nameless customer."""
+    words = _name_words(customer)
+    if not words:
+        return None
+    sender = _name_words(statement_name)
+    return sum(any(_word_matches(word, other) for other in sender) for word in words) / len(words)
+
+def read_statement(path):
+    """Yield the incoming payments of a GCash statement CSV as dicts with 'line', 'amount' (centavos), 'name', 'paid_at', 'reference'.
+
+    Columns are found by their usual header names (Credit/Amount, Sender/Description,
+    Date and Time, Reference No.); debit rows are skipped.
+    """
+    with open(path, mode='r', newline='', encoding='utf-8-sig') as file:
+        reader = csv.reader(file)
+        header = [name.strip().lower() for name in next(reader, [])]
+        columns = {field: next((header.index(name) for name in names if name in header), None)
+                   for field, names in STATEMENT_COLUMNS.items()}
+        if columns['amount'] is None:
+            raise ValueError(f"no amount/credit column in {path}: {header}")
+        for line_no, values in enumerate(reader, 2):
+            def column(field):
+                index = columns[field]
+                return values[index].strip() if index is not None and index < len(values) else ''
+            amount = column('amount').replace('₱', '').replace('PHP', '').replace(',', '').strip()
+            try:
+                cents = to_centavos(amount) # Exact: no float rounding between the statement and the till
+            except ValueError:
+                continue # Blank credit: a debit row
+            if cents <= 0:
+                continue
+            paid_at = None
+            for time_format in STATEMENT_TIME_FORMATS:
+                try:
+                    paid_at = datetime.strptime(column('paid_at'), time_format)
+                    break
+                except ValueError:
+                    pass
+            yield {'line': line_no, 'amount': cents, 'name': column('name'), 'paid_at': paid_at, 'reference': column('reference')}
+
+def match_statement(payments, pending):
+    """Match statement payments to pending transactions. Returns (matches as (payment, tx), unmatched payments).
+
+    Pending transactions are indexed by amount in centavos, so each payment
+    only looks at the orders for exactly its amount. Among those it takes the
+    one placed within the reconciliation window whose customer name best fits
+    the sender, the closest in time on a tie. A nameless order (e.g. 'Guest
+    Customer') or a nameless payment is only matched when it is the sole candidate.
+    """
+    by_amount = {}
+    for tx in pending:
+        if tx['status'] in UNPAID_STATUSES:
+            by_amount.setdefault(to_centavos(tx['total_amount']), []).append(tx)
+    early, late = timedelta(minutes=RECONCILE_EARLY_MINUTES), timedelta(hours=RECONCILE_WINDOW_HOURS)
+
+    matches, unmatched = [], []
+    for payment in sorted(payments, key=lambda p: p['paid_at'] or datetime.max):
+        candidates = []
+        for tx in by_amount.get(payment['amount'], []):
+            try:
+                placed = datetime.strptime(tx.get('created_at') or '', TIMESTAMP_FORMAT)
+            except ValueError:
+                placed = None # Saved before timestamps: any time will do
+            if placed and payment['paid_at'] and not placed - early <= payment['paid_at'] <= placed + late:
+                continue
+            gap = abs((payment['paid_at'] - placed).total_seconds()) if placed and payment['paid_at'] else 0
+            candidates.append((name_score(tx['customer'], payment['name']) if payment['name'] else None, gap, tx))
+        named = [c for c in candidates if c[0] is not None and c[0] >= RECONCILE_MIN_NAME_SCORE]
+        if named:
+            best = max(named, key=lambda c: (c[0], -c[1]))
+        elif len(candidates) == 1 and candidates[0][0] is None:
+            best = candidates[0]
+        else:
+            unmatched.append(payment)
+            continue
+        by_amount[payment['amount']].remove(best[2])
+        matches.append((payment, best[2]))
+    return matches, unmatched
+
+@timed('reconcile_statement')
+def reconcile_statement(path, menu, stock, dry_run=False):
+    """Flip the pending GCash orders paid in a statement file to PAID in one batched write.
+
+    Returns (matched as (payment, PAID tx), unmatched payments, problems as
+    (payment, tx, reason)); a dry run only reports the matches.
+    """
+    payments = list(read_statement(path))
+    with storage_lock(menu, stock):
+        matches, unmatched = match_statement(payments, get_aggregates().pending.values())
+        if dry_run:
+            return [(payment, dict(tx, status='PAID')) for payment, tx in matches], unmatched, []
+        paid, moves, problems = [], [], []
+        for payment, tx in matches:
+            try:
+                tx, tx_moves = prepare_payment(tx['tx_id'], menu, stock, tx)
+            except CheckoutError as e:
+                problems.append((payment, tx, str(e))) # Paid, but its stock is gone: the owner has to sort it out
+                continue
+            paid.append((payment, tx))
+            moves.extend(tx_moves)
+        if paid and not save_payments([tx for _, tx in paid], menu, stock, moves):
+            for _, item_key, delta in moves:
+                stock[item_key] -= delta
+            problems.extend((payment, tx, "could not be saved") for payment, tx in paid)
+            paid = []
+    return paid, unmatched, problems
+
+#service
+HTTP_REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+def transaction_json(tx):
+    """A transaction with its order_items/item_prices decoded and amounts in pesos, ready for json.dumps()."""
+    return dict(tx, total_amount=Money.of(tx['total_amount']).pesos(), order_items=order_items_of(tx),
+                item_prices={item_key: Money.of(price).pesos() for item_key, price in item_prices_of(tx).items()})
+
+class PosService:
+    """Local HTTP/JSON front end over the checkout engine, shared by tablets and the web storefront.
+
+    The event loop only parses requests and answers menu/stock/summary/reorder reads
+    from a snapshot. Orders and payment confirmations go through one queue to
+    a single writer thread, which checks and saves everything that arrived
+    within SERVICE_COMMIT_WINDOW as one group under one storage lock, with
+    one grouped write and one fsync per group. The same thread releases
+    expired GCash reservations every RESERVATION_CHECK_SECONDS. History reads
+    run on a small reader pool.
+    """
+
+    def __init__(self, menu, stock):
+        self.menu = menu
+        self.stock = stock
+        self.writer = futures.ThreadPoolExecutor(max_workers=1)
+        self.readers = futures.ThreadPoolExecutor(max_workers=SERVICE_READ_WORKERS)
+        self.queue = None
+        self.snapshot = None
+        self.index = None
+        self.menu_rows = {} # item_key -> its row in the snapshot's menu list
+        self.alerts = deque(maxlen=REORDER_LIST_SIZE) # Latest low-stock alerts
+        self._publish()
+
+    def _menu_row(self, item_key):
+        return {'item': item_key, 'price': self.menu[item_key].pesos(), 'stock': self.stock.get(item_key, 0)}
+
+    def _publish(self, touched=None):
+        """Writer thread only: build the next snapshot, which the event loop swaps in as a whole.
+
+        touched is the set of item keys a group commit changed: only their
+        rows are rebuilt, on copies of the current snapshot's menu and stock.
+        Without it (or with other tills writing too) everything is rebuilt.
+        """
+        aggregates = get_aggregates()
+        reorder = get_reorder_monitor(self.stock)
+        self.alerts.extend(reorder.take_alerts())
+        self.index = get_product_index(self.menu)
+        previous = self.snapshot
+        if previous is None or touched is None or MULTI_TILL:
+            self.menu_rows = {item_key: row for row, item_key in enumerate(self.menu)}
+            menu = [self._menu_row(item_key) for item_key in self.menu]
+            stock = dict(self.stock)
+            suggestions = reorder.suggestions(self.stock)
+        else:
+            menu = list(previous['menu'])
+            stock = dict(previous['stock'])
+            for item_key in touched:
+                if item_key in self.menu_rows:
+                    menu[self.menu_rows[item_key]] = self._menu_row(item_key)
+                    stock[item_key] = self.stock.get(item_key, 0)
+            suggestions = reorder.suggestions(self.stock) if touched else previous['reorder']['suggestions']
+        self.snapshot = {
+            'menu': menu,
+            'stock': stock,
+            'summary': {
+                'paid_total': aggregates.paid_total().pesos(),
+                'by_method': {method: amount / 100 for method, amount in aggregates.by_method.items()},
+                'pending': sorted(aggregates.pending)
+            },
+            'reorder': {
+                'alerts': list(self.alerts),
+                'suggestions': suggestions
+            }
+        }
+
+    def _refresh(self):
+        refresh_inventory(self.menu, self.stock)
+        self._publish()
+
+    def _commit(self, writes):
+        """Writer thread: check and save one group of ('order', row) / ('confirm', tx_id) writes.
+
+        Returns one (HTTP status, body) per write, in order.
+        """
+        results = [None] * len(writes)
+        orders = []
+        payments = []
+        payment_moves = []
+        with storage_lock(self.menu, self.stock):
+            for i, (kind, payload) in enumerate(writes):
+                try:
+                    if kind == 'order':
+                        orders.append((i, prepare_order_row(payload, self.menu, self.stock)))
+                    elif any(tx['tx_id'] == payload for _, tx in payments):
+                        raise CheckoutError(f"Transaction #{payload} is already being confirmed.")
+                    else:
+                        tx, moves = prepare_payment(payload, self.menu, self.stock)
+                        payments.append((i, tx))
+                        payment_moves.extend(moves)
+                except (CheckoutError, ValueError, TypeError, AttributeError) as e:
+                    results[i] = (400, {'error': str(e)})
+            order_moves = [('sale', item_key, -qty) for _, tx in orders
+                           for item_key, qty in order_items_of(tx).items() if item_key in self.stock]
+            for group, moves, status in ((orders, order_moves, 201), (payments, payment_moves, 200)):
+                if not group:
+                    continue
+                txs = [tx for _, tx in group]
+                if group is orders:
+                    saved = save_checkouts(txs, self.menu, self.stock)
+                else:
+                    saved = save_payments(txs, self.menu, self.stock, moves)
+                if not saved:
+                    # Nothing was written: give the stock these writes took back to the next group
+                    for _, item_key, delta in moves:
+                        self.stock[item_key] -= delta
+                for i, tx in group:
+                    results[i] = (status, transaction_json(tx)) if saved else (500, {'error': "Could not save, please retry."})
+        flush_writes() # One fsync for the whole group, before anyone is told their order is saved
+        self._publish({item_key for _, item_key, _ in order_moves + payment_moves})
+        return results
+
+    def _expire(self):
+        # Writer thread, so it never runs in the middle of a group commit
+        if expire_reservations(self.menu, self.stock):
+            self._publish()
+
+    async def _expirer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self.writer, self._expire)
+            except Exception as e:
+                print(f"Error releasing expired reservations: {e}")
+            await asyncio.sleep(RESERVATION_CHECK_SECONDS)
+
+    async def _committer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            group = [await self.queue.get()]
+            await asyncio.sleep(SERVICE_COMMIT_WINDOW) # Let concurrent requests join this group
+            while len(group) < BATCH_SIZE and not self.queue.empty():
+                group.append(self.queue.get_nowait())
+            try:
+                results = await loop.run_in_executor(self.writer, self._commit, [(kind, payload) for kind, payload, _ in group])
+            except Exception as e:
+                print(f"Error committing orders: {e}")
+                results = [(500, {'error': "Could not save, please retry."})] * len(group)
+            for (_, _, future), result in zip(group, results):
+                if not future.done():
+                    future.set_result(result)
+                self.queue.task_done()
+
+    async def submit(self, kind, payload):
+        """Queue a write for the next group commit and wait for its result."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((kind, payload, future))
+        return await future
+
+    def _list_transactions(self, params):
+        # Reader thread: the page of matching transactions with the smallest tx_ids after the cursor
+        status = params.get('status', [''])[0].lower()
+        customer = params.get('customer', [''])[0].lower()
+        after = int(params.get('after', ['0'])[0])
+        limit = max(1, min(int(params.get('limit', [SERVICE_PAGE_SIZE])[0]), SERVICE_PAGE_SIZE))
+
+        since = params.get('since', [None])[0]
+        until = params.get('until', [None])[0]
+
+        def matches(transactions):
+            for tx in transactions:
+                if tx['tx_id'] <= after:
+                    continue
+                if status == 'paid' and tx['status'] != 'PAID' or status == 'pending' and tx['status'] == 'PAID':
+                    continue
+                if customer and customer not in tx['customer'].lower():
+                    continue
+                yield tx
+
+        if since or until:
+            # Only that period is read, in write order rather than tx_id order (a confirmed payment is rewritten at the end)
+            page = heapq.nsmallest(limit + 1, matches(iter_transactions_between(since, until)), key=lambda tx: tx['tx_id'])
+        else:
+            # Walks the history in tx_id order from the cursor and stops once the page is full
+            page = list(itertools.islice(matches(iter_transactions_after(after)), limit + 1))
+        next_after = page[limit - 1]['tx_id'] if len(page) > limit else None
+        return {'transactions': [transaction_json(tx) for tx in page[:limit]], 'next_after': next_after}
+
+    def _get_transaction(self, tx_id):
+        tx = get_transaction(tx_id)
+        return (200, transaction_json(tx)) if tx else (404, {'error': f"Unknown transaction #{tx_id}."})
+
+    async def route(self, method, target, body):
+        """Return (HTTP status, JSON body) for one request (a str body is sent as plain text)."""
+        loop = asyncio.get_running_loop()
+        url = urlsplit(target)
+        parts = [part for part in url.path.split('/') if part]
         try:
-            with open(SALES_FILE, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Convert total_amount to float and order_items (JSON string) back to dict
-                    row['total_amount'] = float(row['total_amount'])
-                    row['order_items'] = json.loads(row['order_items'])
-                    transactions.append(row)
-            print("Transactions loaded successfully.")
-        except Exception as e:
-            print(f"Error loading transactions: {e}. Starting with empty history.")
-    return transactions
+            if parts in (['menu'], ['stock'], ['summary'], ['reorder']):
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                if MULTI_TILL:
+                    await loop.run_in_executor(self.writer, self._refresh) # Pick up the other tills' changes first
+                if parts == ['menu']:
+                    return 200, {'items': self.snapshot['menu']}
+                return 200, self.snapshot[parts[0]]
+            if parts == ['metrics']:
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                if not METRICS_ENABLED:
+                    return 404, {'error': "Metrics are off; start the service with POS_METRICS=1."}
+                return 200, metrics_text()
+            if parts == ['search']:
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                params = parse_qs(url.query)
+                limit = max(1, min(int(params.get('limit', [SEARCH_LIMIT])[0]), SERVICE_PAGE_SIZE))
+                snapshot = self.snapshot
+                matches = [item_key for item_key in self.index.search(params.get('q', [''])[0], limit) if item_key in snapshot['stock']]
+                prices = {item_key: self.menu.get(item_key) for item_key in matches}
+                return 200, {'items': [{'item': item_key, 'price': prices[item_key] and prices[item_key].pesos(), 'stock': snapshot['stock'][item_key]}
+                                       for item_key in matches]}
+            if parts == ['orders']:
+                if method != 'POST':
+                    return 405, {'error': "Use POST."}
+                row = json.loads(body or b'{}')
+                if not isinstance(row, dict):
+                    return 400, {'error': "Expected a JSON object."}
+                return await self.submit('order', row)
+            if parts == ['transactions']:
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                return 200, await loop.run_in_executor(self.readers, self._list_transactions, parse_qs(url.query))
+            if len(parts) == 2 and parts[0] == 'transactions':
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                return await loop.run_in_executor(self.readers, self._get_transaction, int(parts[1]))
+            if len(parts) == 2 and parts[0] == 'customers':
+                if method != 'GET':
+                    return 405, {'error': "Use GET."}
+                if MULTI_TILL:
+                    await loop.run_in_executor(self.writer, self._refresh)
+                customer = find_customer(unquote(parts[1]))
+                if customer:
+                    customer.update(spent=customer['spent'].pesos(), pending=customer['pending'].pesos())
+                return (200, customer) if customer else (404, {'error': f"Unknown customer {unquote(parts[1])!r}."})
+            if len(parts) == 3 and parts[0] == 'transactions' and parts[2] == 'confirm':
+                if method != 'POST':
+                    return 405, {'error': "Use POST."}
+                return await self.submit('confirm', int(parts[1]))
+        except ValueError as e:
+            return 400, {'error': f"Bad request: {e}"}
+        return 404, {'error': f"No such endpoint: {url.path}"}
 
-def save_transaction(tx):
-    """Append a single transaction to SALES_FILE."""
-    # Convert 'order_items' dict to JSON string for CSV storage
-    tx_to_save = tx.copy()
-    tx_to_save['order_items'] = json.dumps(tx_to_save['order_items'])
+    @staticmethod
+    async def _read_request(reader):
+        """Read one HTTP/1.x request. Returns (method, target, version, headers, body) or None at end of stream."""
+        line = await reader.readline()
+        if not line.strip():
+            return None
+        method, target, version = line.decode('latin-1').split()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0))
+        if length > SERVICE_MAX_BODY:
+            raise OverflowError(length)
+        body = await reader.readexactly(length) if length else b''
+        return method.upper(), target, version, headers, body
+
+    @staticmethod
+    def _write_response(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body = payload.encode('utf-8')
+            content_type = "text/plain; version=0.0.4" # Prometheus text format
+        else:
+            body = json.dumps(payload).encode('utf-8')
+            content_type = "application/json"
+        head = (f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+
+    async def handle(self, reader, writer):
+        """Serve one connection (keep-alive: several requests in turn)."""
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except OverflowError:
+                    self._write_response(writer, 413, {'error': "Request body too large."}, False)
+                    break
+                except ValueError:
+                    self._write_response(writer, 400, {'error': "Malformed request."}, False)
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                started = time.perf_counter()
+                try:
+                    status, payload = await self.route(method, target, body)
+                except Exception as e:
+                    print(f"Error handling {method} {target}: {e}")
+                    status, payload = 500, {'error': "Internal error."}
+                observe('service_request', time.perf_counter() - started)
+                self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass # Client went away
+        finally:
+            writer.close()
+
+    async def run(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        """Serve until SIGINT/SIGTERM, then commit what is already queued and stop."""
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass # Not on this platform: Ctrl+C still raises KeyboardInterrupt
+        self.queue = asyncio.Queue()
+        committer = asyncio.create_task(self._committer())
+        expirer = asyncio.create_task(self._expirer())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"LORENCE'S BETTA FISH POS serving on http://{host}:{port} (Ctrl+C to stop)")
+        try:
+            async with server:
+                await stop.wait()
+                server.close() # No new connections; orders already queued still get committed
+                await self.queue.join()
+        finally:
+            committer.cancel()
+            expirer.cancel()
+            self.writer.shutdown(wait=True) # Let a group commit in progress finish
+            self.readers.shutdown(wait=False)
+
+#receipts
+ESC, GS = '\x1b', '\x1d'
+RECEIPT_TEMPLATES = {
+    # Plain text, as the till prints it
+    'text': {
+        'header': "\n" + "=" * 40 + "\n           ORDER RECEIPT\n",
+        'number': "\tReceipt #{tx_id}  {created_at}\n",
+        'customer': "\tCustomer: {customer}\n",
+        'columns': "=" * 40 + "\n" + f"{'ITEM':<15}{'PRICE':>8}{'QTY':>4}{'TOTAL':>10}\n" + "-" * 40 + "\n",
+        'line': "{item:<15} ₱{price:>7.2f} x{qty:<3} ₱{subtotal:>9.2f}\n",
+        'unpriced_line': "{item:<15}" + " " * 10 + "x{qty}\n",
+        'unpriced': "(Item prices were not recorded for this sale)\n",
+        'total': "-" * 40 + "\n" + f"{'GRAND TOTAL':<30}" + " ₱{total:>9.2f}\n",
+        'payment': "{method}: {status}\n",
+        'footer': "=" * 40 + "\n",
+        'between': "\n", # Between receipts in a bulk export
+    },
+    # ESC/POS for 80 mm thermal printers (42 columns); the printers' code pages have no peso sign
+    'escpos': {
+        'header': ESC + "@" + ESC + "a\x01" + ESC + "E\x01LORENCE'S BETTA FISH\n" + ESC + "E\x00ORDER RECEIPT\n" + ESC + "a\x00",
+        'number': "Receipt #{tx_id}  {created_at}\n",
+        'customer': "Customer: {customer}\n",
+        'columns': "-" * 42 + "\n" + f"{'ITEM':<19}{'QTY':>4} {'PRICE':>8}{'TOTAL':>10}\n" + "-" * 42 + "\n",
+        'line': "{item:<19.19}{qty:>4}x{price:>8.2f}{subtotal:>10.2f}\n",
+        'unpriced_line': "{item:<19.19}{qty:>4}\n",
+        'unpriced': "(Item prices not recorded)\n",
+        'total': "-" * 42 + "\n" + ESC + "E\x01" + f"{'GRAND TOTAL (PHP)':<30}" + "{total:>12.2f}\n" + ESC + "E\x00",
+        'payment': "{method}: {status}\n",
+        'footer': ESC + "a\x01\nHAPPY FISH KEEPING\n" + ESC + "a\x00" + ESC + "d\x04" + GS + "VB\x00", # Feed, then partial cut
+        'between': "",
+        'encoding': 'ascii',
+    },
+    # HTML without a PDF step: open in a browser and print, or attach to an email
+    'html': {
+        'document': ('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Receipts</title><style>'
+                     'section{font-family:monospace;width:22em;margin:1em;padding:1em;border:1px solid #999;page-break-after:always}'
+                     'td{padding:0 .3em}td.n{text-align:right}</style></head><body>\n', '</body></html>\n'),
+        'header': '<section class="receipt"><h3>ORDER RECEIPT</h3>\n',
+        'number': '<p>Receipt #{tx_id} &middot; {created_at}</p>\n',
+        'customer': '<p>Customer: {customer}</p>\n',
+        'columns': '<table><tr><th>Item</th><th>Price</th><th>Qty</th><th>Total</th></tr>\n',
+        'line': '<tr><td>{item}</td><td class="n">₱{price:.2f}</td><td class="n">{qty}</td><td class="n">₱{subtotal:.2f}</td></tr>\n',
+        'unpriced_line': '<tr><td>{item}</td><td></td><td class="n">{qty}</td><td></td></tr>\n',
+        'unpriced': '<tr><td colspan="4">Item prices were not recorded for this sale.</td></tr>\n',
+        'total': '<tr><th colspan="3">GRAND TOTAL</th><th class="n">₱{total:.2f}</th></tr></table>\n',
+        'payment': '<p>{method}: {status}</p>\n',
+        'footer': '</section>\n',
+        'between': "",
+        'escape': True,
+    },
+}
+
+class ReceiptTemplate:
+    """A receipt format compiled once: its fixed parts as strings, its variable parts as bound str.format templates.
+
+    render() writes a whole receipt into one buffer; write_many() streams
+    many receipts to a binary file, one write per receipt.
+    """
+
+    def __init__(self, template):
+        self.header = template['header']
+        self.number = template['number'].format
+        self.customer = template['customer'].format
+        self.columns = template['columns']
+        self.line = template['line'].format
+        self.unpriced_line = template['unpriced_line'].format
+        self.unpriced = template['unpriced']
+        self.total = template['total'].format
+        self.payment = template['payment'].format
+        self.footer = template['footer']
+        self.between = template['between']
+        self.document = template.get('document', ('', ''))
+        self.encoding = template.get('encoding', 'utf-8')
+        self.escape = html.escape if template.get('escape') else str
+
+    def render(self, receipt, buffer=None):
+        """Render one receipt (see order_receipt/transaction_receipt) into buffer, or return it as a str."""
+        out = io.StringIO() if buffer is None else buffer
+        write, escape = out.write, self.escape
+        write(self.header)
+        if receipt.get('tx_id') is not None:
+            write(self.number(tx_id=receipt['tx_id'], created_at=escape(receipt.get('created_at') or '')))
+        if receipt['customer'] and receipt['customer'] != "Guest Customer":
+            write(self.customer(customer=escape(receipt['customer'])))
+        write(self.columns)
+        unpriced = False
+        for item_key, price, qty, subtotal in receipt['lines']:
+            if price is None:
+                write(self.unpriced_line(item=escape(item_key.title()), qty=qty))
+                unpriced = True
+            else:
+                write(self.line(item=escape(item_key.title()), price=price, qty=qty, subtotal=subtotal))
+        if unpriced:
+            write(self.unpriced)
+        write(self.total(total=receipt['total']))
+        if receipt.get('status'):
+            write(self.payment(method=escape(receipt['method']), status=escape(receipt['status'])))
+        write(self.footer)
+        if buffer is None:
+            return out.getvalue()
+
+    def encode(self, text):
+        return text.encode(self.encoding, errors='replace')
+
+    def write_many(self, receipts, file):
+        """Stream receipts to a binary file. Returns how many were written."""
+        buffer = io.StringIO()
+        written = 0
+        file.write(self.encode(self.document[0]))
+        for receipt in receipts:
+            buffer.seek(0)
+            buffer.truncate()
+            if written:
+                buffer.write(self.between)
+            self.render(receipt, buffer)
+            file.write(self.encode(buffer.getvalue()))
+            written += 1
+        file.write(self.encode(self.document[1]))
+        return written
+
+RECEIPTS = {name: ReceiptTemplate(template) for name, template in RECEIPT_TEMPLATES.items()}
+
+# Payment confirmations shown by process_payment, one write each
+PAYMENT_CONFIRMATIONS = {
+    'cash': ("\n" + "=" * 40 + "\n\n✅ Transaction Successful (Cash)\n💰 CHANGE: ₱{change:.2f}\n\n" + "=" * 40 +
+             "\nThank you for ordering with us! HAPPY FISH KEEPING\n" + "=" * 40 + "\n").format,
+    'gcash': "\n✅ Transaction Successful (GCash)\nThankyou for ordering us! HAPPY FISH KEEPING\nNo change needed.\n".format,
+}
+
+def order_receipt(order, menu, customer_name=""):
+    """Receipt data for an order being checked out, priced from the menu."""
+    lines = [(item_key, menu[item_key], qty, menu[item_key] * qty) for item_key, qty in order.items()]
+    return {'customer': customer_name, 'lines': lines, 'total': Money(sum(line[3] for line in lines))}
+
+def transaction_receipt(tx):
+    """Receipt data for a saved transaction, at the prices it was charged.
 
-    is_new_file = not os.path.exists(SALES_FILE)
+    Rows saved before prices were recorded get lines with price and
+    subtotal None: only the quantities and the total are known.
+    """
+    prices = item_prices_of(tx)
+    lines = [(item_key, prices[item_key], qty, qty * prices[item_key]) if item_key in prices else (item_key, None, qty, None)
+             for item_key, qty in order_items_of(tx).items()]
+    return {'tx_id': tx['tx_id'], 'created_at': tx.get('created_at'), 'customer': tx['customer'], 'lines': lines,
+            'total': tx['total_amount'], 'method': tx['method'], 'status': tx['status']}
+
+@contextmanager
+def receipt_output(path):
+    """Open where receipts go: '-' for stdout, a printer device or named pipe as is, else a file replaced atomically."""
+    if path == '-':
+        yield sys.stdout.buffer
+        sys.stdout.flush()
+    elif os.path.exists(path) and not os.path.isfile(path):
+        with open(path, mode='wb') as file:
+            yield file
+    else:
+        with atomic_write(path, mode='wb') as file:
+            yield file
+
+def send_to_printer(tx, path=RECEIPT_PRINTER):
+    """Write a transaction's ESC/POS receipt to the receipt printer (a device, named pipe or spool file).
+
+    Opened without blocking, so a printer pipe nobody is reading reports an
+    error instead of stalling the till.
+    """
+    data = RECEIPTS['escpos'].encode(RECEIPTS['escpos'].render(transaction_receipt(tx)))
     try:
-        with open(SALES_FILE, mode='a', newline='') as file:
-            fieldnames = ['customer', 'total_amount', 'method', 'status', 'order_items']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            if is_new_file:
-                writer.writeheader()
-            writer.writerow(tx_to_save)
-        # print(f"Transaction appended to {SALES_FILE}")
-    except Exception as e:
-        print(f"Error saving transaction: {e}")
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, 'O_NONBLOCK', 0), 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        finally:
+            os.close(fd)
+        count('bytes_written', len(data))
+    except OSError as e:
+        print(f"❌ Receipt printer {path} is not ready: {e}")
 
-def rewrite_transactions(transactions):
-    """Overwrite the entire SALES_FILE after a transaction removal."""
+def export_receipts(path, transactions, fmt='text'):
+    """Render receipts for a stream of transactions into one file (or pipe) in a single pass. Returns how many."""
+    with receipt_output(path) as file:
+        return RECEIPTS[fmt].write_many(map(transaction_receipt, transactions), file)
+
+#benchmarks
+def generate_bench_data(items, transactions, seed=BENCH_SEED):
+    """Write a synthetic catalog and history to the current directory. Returns (menu, stock)."""
+    rng = random.Random(seed)
+    menu = {f"strain {i:06d}": Money.from_pesos(rng.uniform(20, 2000)) for i in range(items)}
+    stock = {item_key: rng.randint(50, 500) for item_key in menu}
+    storage = get_storage()
+    storage.save_inventory(menu, stock)
+
+    keys = list(menu)
+    chunk = []
+    for _ in range(transactions):
+        order = {item_key: rng.randint(1, 3) for item_key in rng.sample(keys, min(len(keys), rng.randint(1, 3)))}
+        chunk.append({
+            'customer': f"customer {rng.randint(1, 5000)}",
+            'total_amount': calculate_total(order, menu),
+            'method': rng.choice(PAYMENT_METHODS),
+            'status': PENDING_STATUS if rng.random() < 0.1 else 'PAID',
+            'order_items': order,
+            'item_prices': {item_key: menu[item_key] for item_key in order}
+        })
+        if len(chunk) >= 10000:
+            storage.record_checkouts(chunk, menu, stock)
+            chunk = []
+    if chunk:
+        storage.record_checkouts(chunk, menu, stock)
+    return menu, stock
+
+def _bench_ops(case, menu, stock, transactions):
+    """Return (operation, max_ops) for a benchmark case; everything outside operation is setup."""
+    global _aggregates
+    storage = get_storage()
+    rng = random.Random(BENCH_SEED)
+    keys = list(menu)
+
+    if case == 'save_inventory':
+        return lambda: storage.save_inventory(menu, stock), BENCH_MAX_OPS
+    if case == 'record_stock':
+        def sale():
+            item_key = rng.choice(keys)
+            stock[item_key] -= 1
+            storage.record_stock('sale', item_key, menu, stock, -1)
+        return sale, BENCH_MAX_OPS
+    if case == 'save_transaction':
+        def append():
+            item_key = rng.choice(keys)
+            storage.append_transaction({'customer': 'bench', 'total_amount': menu[item_key], 'method': 'Cash',
+                                        'status': 'PAID', 'order_items': {item_key: 1}, 'item_prices': {item_key: menu[item_key]}})
+        return append, BENCH_MAX_OPS
+    if case == 'checkout':
+        get_aggregates()
+        def sale():
+            item_key = rng.choice(keys)
+            if stock[item_key] < 1:
+                stock[item_key] += 1000
+            checkout({item_key: 1}, 'Cash', menu, stock, 'bench')
+        return sale, BENCH_MAX_OPS
+    if case == 'void_transaction':
+        tx_ids = iter(range(1, transactions + 1))
+        return lambda: storage.void_transaction(next(tx_ids)), transactions
+    if case == 'rewrite_transactions':
+        live = list(storage.load_transactions().values())
+        return lambda: storage.rewrite_transactions(live), BENCH_MAX_OPS
+    if case == 'load_transactions':
+        return storage.load_transactions, BENCH_MAX_OPS
+    if case == 'stream_summary':
+        return storage.transaction_summary, BENCH_MAX_OPS
+    if case == 'report_columns':
+        return lambda: SalesColumns.load(storage.iter_transactions()), BENCH_MAX_OPS
+    if case == 'sales_report':
+        columns = SalesColumns.load(storage.iter_transactions())
+        return lambda: sales_report(columns, stock), BENCH_MAX_OPS
+    if case == 'product_search':
+        index = get_product_index(menu)
+        queries = [key[:rng.randint(3, len(key))] for key in rng.sample(keys, min(len(keys), 50))]
+        queries += [key[:3] + key[4:] for key in rng.sample(keys, min(len(keys), 50))] # A letter left out
+        return lambda: index.search(rng.choice(queries)), BENCH_MAX_OPS
+    if case == 'session_total':
+        get_aggregates() # Writes the checkpoint a restart would find
+        def restart():
+            global _aggregates
+            _aggregates = None
+            get_aggregates().paid_total()
+        return restart, BENCH_MAX_OPS
+    raise ValueError(f"unknown benchmark case '{case}'")
+
+BENCH_CASES = ['save_inventory', 'record_stock', 'save_transaction', 'checkout', 'void_transaction',
+               'rewrite_transactions', 'load_transactions', 'stream_summary', 'session_total', 'product_search',
+               'report_columns', 'sales_report']
+
+def run_bench_case(case, items, transactions, budget=BENCH_TIME_BUDGET):
+    """Run one case in a fresh temp directory and return its result dict."""
+    global _storage, _aggregates, _product_index, _reorder
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='pos-bench-')
+    os.chdir(workdir)
+    _storage = _aggregates = _product_index = _reorder = None
     try:
-        with open(SALES_FILE, mode='w', newline='') as file:
-            fieldnames = ['customer', 'total_amount', 'method', 'status', 'order_items']
-            writer = csv.DictWriter(file, fieldnames=fieldnames)
-            writer.writeheader()
-            for tx in transactions:
-                 # Convert 'order_items' dict to JSON string for CSV storage
-                tx_to_save = tx.copy()
-                tx_to_save['order_items'] = json.dumps(tx_to_save['order_items'])
-                writer.writerow(tx_to_save)
-        print(f"Transaction history saved to {SALES_FILE}")
-    except Exception as e:
-        print(f"Error rewriting transactions: {e}")
+        menu, stock = generate_bench_data(items, transactions)
+        menu, stock = make_catalog(menu, stock)
+        _storage = None # Reopen so the case starts from what is on disk
+        operation, max_ops = _bench_ops(case, menu, stock, transactions)
+        latencies = []
+        started = time.perf_counter()
+        while len(latencies) < min(BENCH_MIN_OPS, max_ops) or (
+                time.perf_counter() - started < budget and len(latencies) < max_ops):
+            op_started = time.perf_counter()
+            operation()
+            latencies.append(time.perf_counter() - op_started)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies.sort()
+    return {
+        'case': case,
+        'storage': STORAGE_BACKEND,
+        'items': items,
+        'transactions': transactions,
+        'ops': len(latencies),
+        'ops_per_sec': len(latencies) / sum(latencies) if sum(latencies) else None,
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else None
+    }
+
+def measure_history_memory(items, transactions):
+    """Bytes held by the whole history loaded as plain dicts versus compact TxRecords (traced with tracemalloc)."""
+    global _storage, _aggregates, _product_index, _reorder
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='pos-bench-')
+    os.chdir(workdir)
+    _storage = _aggregates = _product_index = _reorder = None
+    try:
+        generate_bench_data(items, transactions)
+        _storage = None
+        storage = get_storage()
+        sizes = {}
+        for layout, load in (('dict', lambda: {tx['tx_id']: dict(tx, order_items=order_items_of(tx), item_prices=item_prices_of(tx))
+                                               for tx in storage.iter_transactions()}),
+                             ('compact', storage.load_transactions)):
+            tracemalloc.start()
+            history = load()
+            sizes[layout] = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del history
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'storage': STORAGE_BACKEND,
+        'items': items,
+        'transactions': transactions,
+        'dict_bytes': sizes['dict'],
+        'compact_bytes': sizes['compact'],
+        'bytes_per_tx': {layout: size / transactions for layout, size in sizes.items()} if transactions else None,
+        'saving': 1 - sizes['compact'] / sizes['dict'] if sizes['dict'] else None
+    }
+
+def compare_bench(results, baseline, tolerance=BENCH_TOLERANCE):
+    """Print p50 changes against a baseline run. Returns the list of regressed results."""
+    previous = {(r['case'], r['storage'], r['items'], r['transactions']): r for r in baseline['results']}
+    regressions = []
+    print(f"\n{'CASE':<22}{'ITEMS':>8}{'TXS':>10}{'BASE p50':>12}{'NOW p50':>12}{'CHANGE':>9}")
+    for r in results:
+        old = previous.get((r['case'], r['storage'], r['items'], r['transactions']))
+        if old is None:
+            continue
+        change = r['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0
+        flag = ''
+        if change > tolerance:
+            regressions.append(r)
+            flag = '  ⚠️ REGRESSION'
+        print(f"{r['case']:<22}{r['items']:>8}{r['transactions']:>10}{old['p50_ms']:>10.3f}ms{r['p50_ms']:>10.3f}ms{change:>+8.0%}{flag}")
+    return regressions
 
 # --- ORIGINAL FUNCTIONS MODIFIED/RETAINED ---
 
@@ -116,7 +4753,7 @@ def input_menu():
             continue
 
         try:
-            price = float(input(f"\tEnter PRICE for {name}: ₱"))
+            price = Money.parse(input(f"\tEnter PRICE for {name}: ₱"))
             if price <= 0:
                 print("Price must be positive. Try again.")
                 continue
@@ -143,16 +4780,83 @@ def display_stock_count(stock):
         print(f"    {item.title():<15}: {qty} in stock")
     print("---------------------------")
 
+def display_reorder_alerts():
+    """Print the low-stock alerts raised by the sales since the last call."""
+    if _reorder is None:
+        return
+    for alert in _reorder.take_alerts():
+        print(f"⚠️ LOW STOCK: {alert['item'].title()} has {alert['stock']} left "
+              f"(about {alert['days_left']:.1f} days at {alert['per_day']:.1f}/day). Suggested reorder: {alert['reorder_qty']}.")
+
+def display_reorder_suggestions(stock):
+    """Print the items to reorder soonest, with suggested quantities."""
+    suggestions = get_reorder_monitor(stock).suggestions(stock)
+    if not suggestions:
+        return
+    print("\n--- Reorder Soon ---")
+    for line in suggestions:
+        days_left = f"{line['days_left']:.1f} days left" if line['days_left'] is not None else "no recent sales"
+        print(f"    {line['item'].title():<15}: {line['stock']} in stock, {days_left}, reorder {line['reorder_qty']}")
+
+def list_products(menu, stock, page=0, indent="  "):
+    """Print one page of the catalog. Returns the page to show next (back to 0 after the last one)."""
+    start = page * LIST_PAGE_SIZE
+    for item_key, price in itertools.islice(menu.items(), start, start + LIST_PAGE_SIZE):
+        qty = stock.get(item_key, 0)
+        stock_status = f"({qty} in stock)" if qty > 0 else "(OUT OF STOCK)"
+        print(f"{indent}{item_key.title():<15} ₱{price:<8.2f} {stock_status}")
+    remaining = len(menu) - start - LIST_PAGE_SIZE
+    if remaining > 0:
+        print(f"{indent}... {remaining} more. Type 'list' for the next page, or part of a name or a SKU/barcode to search.")
+        return page + 1
+    return 0
+
+@timed('find_product')
+def find_product(text, menu, stock, not_found="Product/strain not found."):
+    """Turn what was typed into a product key.
+
+    An exact name or SKU/barcode is taken as is; otherwise the closest
+    matches are offered to pick from. Returns None if nothing was chosen.
+    """
+    index = get_product_index(menu)
+    item_key = index.lookup(text)
+    if item_key in menu:
+        return item_key
+    matches = [item_key for item_key in index.search(text) if item_key in menu]
+    if not matches:
+        print(not_found)
+        return None
+    print("\tDid you mean:")
+    for number, item_key in enumerate(matches, 1):
+        print(f"\t  {number}. {item_key.title():<15} ₱{menu[item_key]:.2f} ({stock.get(item_key, 0)} in stock)")
+    choice = input(f"\tChoose 1-{len(matches)} (or press Enter to type again): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(matches):
+        return matches[int(choice) - 1]
+    return None
+
+
+def display_customer(customer_name):
+    """Shows a returning customer's visits, spend, unpaid GCash balance and latest orders (from the customer index)."""
+    customer = find_customer(customer_name)
+    if customer is None:
+        return
+    print(f"\t👤 Returning customer {customer['customer']}: {customer['visits']} orders, ₱{customer['spent']:.2f} spent")
+    if customer['pending']:
+        print(f"\t⚠️ Unpaid GCash balance: ₱{customer['pending']:.2f}")
+    for tx_id in reversed(customer['tx_ids'][-CUSTOMER_RECENT_ORDERS:]):
+        tx = get_transaction(tx_id)
+        if tx:
+            items = ", ".join(f"{qty}x {item_key.title()}" for item_key, qty in order_items_of(tx).items())
+            print(f"\t  #{tx_id} {(tx['created_at'] or '')[:10]:<10} ₱{tx['total_amount']:.2f} {tx['status']}: {items}")
 
 def update_menu(menu, stock):
     print("\n--- UPDATE PRODUCTS & STOCK ---")
+    refresh_inventory(menu, stock) # Pick up other tills' changes
+    print("\nCurrent Products:")
+    page = list_products(menu, stock)
     while True:
-        print("\nCurrent Products:")
-        for item, price in menu.items():
-            qty = stock.get(item, 0)
-            print(f"  {item.title():<15} ₱{price:<8.2f} ({qty} in stock)")
-
-        display_stock_count(stock)
+        refresh_inventory(menu, stock)
+        index = get_product_index(menu)
 
         print("\nOptions:")
         print("1. Update Price")
@@ -160,28 +4864,28 @@ def update_menu(menu, stock):
         print("3. Add New Product/Strain")
         print("4. Remove Product/Strain")
         print("5. Return to Main Menu")
+        print("6. Add SKU/Barcode to a Product/Strain")
+        print("7. List Products/Strains (next page)")
 
-        choice = input("Select an option (1-5): ").strip()
+        choice = input("Select an option (1-7): ").strip()
         
-        def get_key_name(prompt):
-            item = input(prompt).strip().lower()
-            return item if item in menu else None
+        def get_key_name(prompt, not_found="Product/strain not found."):
+            return find_product(input(prompt), menu, stock, not_found)
 
         if choice == '1':
             key = get_key_name("Enter product/strain name to update price: ")
             if key:
                 try:
-                    new_price = float(input(f"Enter new price for {key.title()}: ₱"))
+                    new_price = Money.parse(input(f"Enter new price for {key.title()}: ₱"))
                     if new_price <= 0:
                         print("Price must be positive.")
                         continue
-                    menu[key] = new_price
+                    with storage_lock(menu, stock):
+                        menu[key] = new_price
+                        record_stock_movement('price', key, menu, stock) # Save after update
                     print(f"✅ Price for {key.title()} updated to ₱{new_price:.2f}")
-                    save_inventory(menu, stock) # Save after update
                 except ValueError:
                     print("Invalid price input.")
-            else:
-                print("Product/strain not found.")
 
         elif choice == '2':
             key = get_key_name("Enter product/strain name to add stock: ")
@@ -191,70 +4895,89 @@ def update_menu(menu, stock):
                     if add_qty < 0:
                         print("Quantity cannot be negative.")
                         continue
-                    stock[key] += add_qty
+                    with storage_lock(menu, stock):
+                        stock[key] = stock.get(key, 0) + add_qty
+                        record_stock_movement('restock', key, menu, stock, add_qty) # Save after update
                     print(f"✅ Added {add_qty} units to {key.title()}. New stock: {stock[key]}")
-                    save_inventory(menu, stock) # Save after update
-                    display_stock_count(stock)
+                    display_stock_count({key: stock[key]})
                 except ValueError:
                     print("Invalid quantity input.")
-            else:
-                print("Product/strain not found.")
 
         elif choice == '3':
             new_item_name = input("Enter NEW PRODUCT OR STRAIN NAME: ").strip()
             new_item_key = new_item_name.lower()
             
-            if new_item_key in menu:
+            if index.lookup(new_item_key):
                 print("Product/strain already exists. Use Update instead.")
                 continue
             try:
-                new_price = float(input(f"Enter price for {new_item_name}: ₱"))
+                new_price = Money.parse(input(f"Enter price for {new_item_name}: ₱"))
                 new_stock = int(input(f"Enter stock for {new_item_name}: "))
                 if new_price <= 0 or new_stock < 0:
                     print("Invalid price or stock input.")
                     continue
-                menu[new_item_key] = new_price
-                stock[new_item_key] = new_stock
+                with storage_lock(menu, stock):
+                    menu[new_item_key] = new_price
+                    stock[new_item_key] = new_stock
+                    record_stock_movement('add', new_item_key, menu, stock, new_stock) # Save after update
+                    index.add(new_item_key)
+                    index.generation = catalog_generation(menu)
                 print(f"✅ Added new product: {new_item_name.title()} (₱{new_price:.2f}, {new_stock} in stock)")
-                save_inventory(menu, stock) # Save after update
                 
             except ValueError:
                 print("Invalid input. Try again.")
 
         elif choice == '4':
-            key = get_key_name("Enter product/strain name to remove: ")
+            key = get_key_name("Enter product/strain name to remove: ", "Product / Strain not found.")
             if key:
                 confirm = input(f"Are you sure you want to remove {key.title()}? (yes/no): ").lower()
                 if confirm == 'yes':
-                    del menu[key]
-                    del stock[key]
+                    with storage_lock(menu, stock):
+                        menu.pop(key, None)
+                        removed_qty = stock.pop(key, 0)
+                        record_stock_movement('remove', key, menu, stock, -removed_qty) # Save after update
+                        if index.remove(key):
+                            save_aliases(index.aliases) # Its SKUs/barcodes go with it
+                        index.generation = catalog_generation(menu)
                     print(f"✅ {key.title()} removed from the menu.")
-                    save_inventory(menu, stock) # Save after update
                     
                 else:
                     print("Removal canceled.")
-            else:
-                print("Product / Strain not found.")
 
         elif choice == '5':
             print("Returning to main menu...")
             break
 
+        elif choice == '6':
+            key = get_key_name("Enter product/strain name to add a SKU/barcode to: ")
+            if key:
+                alias = input(f"Scan or enter the SKU/barcode for {key.title()}: ").strip().lower()
+                owner = index.lookup(alias) if alias else None
+                if not alias:
+                    print("SKU/barcode cannot be empty.")
+                elif owner is not None and owner != key:
+                    print(f"That SKU/barcode already belongs to {owner.title()}.")
+                else:
+                    index.add_alias(alias, key)
+                    save_aliases(index.aliases)
+                    print(f"✅ {alias.upper()} now finds {key.title()}.")
+
+        elif choice == '7':
+            page = list_products(menu, stock, page)
+
         else:
-            print("Invalid choice. Please choose 1-5.")
+            print("Invalid choice. Please choose 1-7.")
 
 def take_order(menu, stock):
     order = {}
+    refresh_inventory(menu, stock) # Show stock as the other tills left it
     
     print("\nTAKE CUSTOMER ORDER. TYPE 'DONE' WHEN FINISHED or 'CANCEL' to canceled.") 
 
     print("\t\tLORENCE'S BETTA FISH")
     print("\n\t--- Available Strains and Products ---")
-    for item_key, price in menu.items():
-        qty = stock.get(item_key, 0)
-        # We keep the stock status here for ordering
-        stock_status = f"({qty} in stock)" if qty > 0 else "(OUT OF STOCK)"
-        print(f"\t{item_key.title():<15} ₱{price:.2f} {stock_status}")
+    # We keep the stock status here for ordering
+    page = list_products(menu, stock, indent="\t")
     print("\t ----------------------------------")
 
     while True:
@@ -267,9 +4990,14 @@ def take_order(menu, stock):
         
         if item_key == 'done':
             break
-        
-        if item_key not in menu:
-            print(f"\tSorry, we don't have {item_input.title()}. Please order from the menu.")
+
+        if item_key == 'list':
+            page = list_products(menu, stock, page, indent="\t")
+            continue
+
+        # Exact name or SKU/barcode, else pick from the closest matches
+        item_key = find_product(item_key, menu, stock, f"\tSorry, we don't have {item_input.title()}. Please order from the menu.")
+        if item_key is None:
             continue
 
         available_stock = stock.get(item_key, 0)
@@ -296,38 +5024,23 @@ def take_order(menu, stock):
             print("Invalid quantity. Try again.")
             
     if order:
-        customer_name = input("\n👤 Order finished. Enter Customer Name: ").strip() or "Guest Customer"
+        customer_name = input("\n👤 Order finished. Enter Customer Name (or phone number): ").strip() or "Guest Customer"
         print(f"Processing final order for: **{customer_name}**")
+        display_customer(customer_name)
     else:
         customer_name = "Guest Customer"
 
     return order, customer_name 
 
 
+@timed('print_receipt')
 def print_receipt(order, menu, customer_name=""):
-    print("\n" + "="*40)
-    print("           ORDER RECEIPT")
-    if customer_name and customer_name != "Guest Customer":
-        print(f"\tCustomer: {customer_name}")
-    print("="*40)
-    # New header format
-    print(f"{'ITEM':<15}{'PRICE':>8}{'QTY':>4}{'TOTAL':>10}")
-    print("-" * 40)
-    
-    total = 0
-    for item_key, qty in order.items():
-        price = menu[item_key]
-        subtotal = price * qty
-        total += subtotal
-        
-        # Displaying price before multiplication
-        print(f"{item_key.title():<15} ₱{price:>7.2f} x{qty:<3} ₱{subtotal:>9.2f}")
-        
-    print("-" * 40)
-    print(f"{'GRAND TOTAL':<30} ₱{total:>9.2f}")
-    print("="*40)
-    return total
+    # Rendered into one buffer from the precompiled text template, then written at once
+    receipt = order_receipt(order, menu, customer_name)
+    sys.stdout.write(RECEIPTS['text'].render(receipt))
+    return receipt['total']
 
+@timed('process_payment')
 def process_payment(total):
     print("\n--- PAYMENT METHOD ---")
     while True:
@@ -335,17 +5048,12 @@ def process_payment(total):
         if method == '1':
             while True:
                 try:
-                    paid_amount = float(input(f"Enter CASH TENDERED for ₱{total:.2f}: ₱"))
+                    paid_amount = Money.parse(input(f"Enter CASH TENDERED for ₱{total:.2f}: ₱"))
                     if paid_amount < total:
                         print("Insufficient amount. Please enter more or pay the exact amount.")
                         continue
                     change = paid_amount - total
-                    print("\n" + "="*40)
-                    print(f"\n✅ Transaction Successful (Cash)")
-                    print(f"💰 CHANGE: ₱{change:.2f}")
-                    print("\n" + "="*40)
-                    print("Thank you for ordering with us! HAPPY FISH KEEPING")
-                    print("="*40)
+                    sys.stdout.write(PAYMENT_CONFIRMATIONS['cash'](change=change))
                     return total, "Cash", "PAID"
                 except ValueError:
                     print("Invalid cash amount. Please enter a number.")
@@ -356,105 +5064,132 @@ def process_payment(total):
             confirm = input("Press Enter when payment is CONFIRMED, or type 'pending' to mark for later confirmation: ").lower().strip()
             
             if confirm == 'pending':
-                print("⚠️ Transaction marked as **GCash Pending/UNPAID**.")
+                print(f"⚠️ Transaction marked as **GCash Pending/UNPAID**. Its stock is held for {RESERVATION_HOURS} hours.")
                 return 0, "GCash", "UNPAID (GCash Pending)" 
             else:
-                print(f"\n✅ Transaction Successful (GCash)")
-                print("Thankyou for ordering us! HAPPY FISH KEEPING")
-                print("No change needed.")
+                sys.stdout.write(PAYMENT_CONFIRMATIONS['gcash']())
                 return total, "GCash", "PAID"
             
         else:
             print("Invalid selection. Please choose '1' or '2'.")
 
 
+@timed('deduct_stock')
 def deduct_stock(stock, order):
+    reorder = get_reorder_monitor(stock)
     for item, qty in order.items():
         if item in stock:
             stock[item] -= qty
-    print("\nStock Updated After Sale.")
-    save_inventory(menu, stock) # Save inventory after stock change
-    display_stock_count(stock)
+            reorder.record_sale(item, qty, stock[item]) # Updates the item's velocity and stock-out rank
 
 
 def view_transactions(transactions):
-    """Prints a numbered list of transactions."""
+    """Prints transactions with their transaction IDs. Accepts any iterable, e.g. iter_transactions()."""
     print("\n📊 --- SESSION TRANSACTION HISTORY ---")
-    if not transactions:
+    count = 0
+    for t in transactions:
+        if count == 0:
+            # Header
+            print("-" * 60)
+            print(f"{'ID':<4}{'CUSTOMER':<15}{'TOTAL (₱)':<12}{'METHOD':<8}{'STATUS':<21}")
+            print("-" * 60)
+        count += 1
+        status_color = {"PAID": "✅ PAID", RESERVED_STATUS: "🟡 UNPAID (GCash Reserved)"}.get(t['status'], "🔴 UNPAID (GCash Pending)")
+        print(f"{t['tx_id']:<4}{t['customer'][:14]:<15}{t['total_amount']:.2f}{'':<2}{t['method'][:7]:<8}{status_color:<21}")
+
+    if count == 0:
         print("No transactions recorded yet.")
         return False
     
-    # Header
-    print("-" * 60)
-    print(f"{'No.':<4}{'CUSTOMER':<15}{'TOTAL (₱)':<12}{'METHOD':<8}{'STATUS':<21}")
-    print("-" * 60)
-
-    for i, t in enumerate(transactions, 1):
-        status_color = "✅ PAID" if t['status'] == "PAID" else "🔴 UNPAID (GCash Pending)"
-        print(f"{i:<4}{t['customer'][:14]:<15}{t['total_amount']:.2f}{'':<2}{t['method'][:7]:<8}{status_color:<21}")
-    
     print("-" * 60)
     return True 
 
-def manage_transactions(transactions, stock, session_total_sales):
-    """Allows user to remove a single transaction and update stock/sales if necessary."""
+def page_transactions():
+    """Shows the history newest first, HISTORY_PAGE_SIZE rows at a time. Older rows are only read when asked for."""
+    transactions = iter_recent_transactions()
+    page = list(itertools.islice(transactions, HISTORY_PAGE_SIZE))
+    if not view_transactions(page):
+        return False
+    while len(page) == HISTORY_PAGE_SIZE:
+        if input("Press Enter for older transactions (or 'done'): ").strip().lower() == 'done':
+            break
+        page = list(itertools.islice(transactions, HISTORY_PAGE_SIZE))
+        if not page:
+            print("No older transactions.")
+            break
+        view_transactions(page)
+    return True
+
+def manage_transactions(stock):
+    """Allows user to void a single transaction by ID and update stock if necessary (sales totals follow via the aggregate cache)."""
     
-    if not view_transactions(transactions):
-        return session_total_sales
+    # Only the latest page is shown; any older ID can still be entered
+    if not view_transactions(itertools.islice(iter_recent_transactions(), HISTORY_PAGE_SIZE)):
+        return
         
     while True:
-        choice = input("\nEnter transaction number to REMOVE (or 'done' to exit management): ").strip()
+        choice = input("\nEnter transaction ID to REMOVE, 'confirm ID' when a GCash payment arrives, 'receipt ID' to reprint (or 'done' to exit management): ").strip()
         
         if choice.lower() == 'done':
             print("Exiting transaction management.")
             break
 
+        if choice.lower().startswith('receipt'):
+            try:
+                tx = get_transaction(int(choice[len('receipt'):]))
+            except ValueError:
+                print("Invalid input. Type 'receipt' followed by the transaction ID.")
+                continue
+            if tx is None:
+                print("Invalid ID. Please enter the ID of a transaction in the history or 'done'.")
+                continue
+            sys.stdout.write(RECEIPTS['text'].render(transaction_receipt(tx)))
+            if RECEIPT_PRINTER:
+                send_to_printer(tx)
+            continue
+
+        if choice.lower().startswith('confirm'):
+            try:
+                tx = confirm_payment(int(choice[len('confirm'):]), menu, stock)
+                print(f"✅ Transaction #{tx['tx_id']} for **{tx['customer']}** (₱{tx['total_amount']:.2f}) is now PAID.")
+                display_reorder_alerts()
+            except CheckoutError as e:
+                print(f"❌ {e}")
+            except ValueError:
+                print("Invalid input. Type 'confirm' followed by the transaction ID.")
+            continue
+
         try:
-            index = int(choice) - 1
+            tx_id = int(choice)
+            tx = get_transaction(tx_id)
             
-            if 0 <= index < len(transactions):
-                tx = transactions[index]
-                
-                action = input(f"Transaction #{index+1} ({tx['customer']}, ₱{tx['total_amount']:.2f}, Status: {tx['status']}). Are you sure you want to **REMOVE** this transaction? (yes/no): ").lower().strip()
+            if tx:
+                action = input(f"Transaction #{tx_id} ({tx['customer']}, ₱{tx['total_amount']:.2f}, Status: {tx['status']}). Are you sure you want to **REMOVE** this transaction? (yes/no): ").lower().strip()
                 
                 if action == 'yes':
-                    removed_status = tx['status']
-                    removed_customer = tx['customer']
-                    removed_total = tx['total_amount']
-                    
-                    # Refund stock if the order was unpaid (since it was never deducted)
-                    if removed_status == "UNPAID (GCash Pending)":
-                        for item_key, qty in tx['order_items'].items():
-                            if item_key in stock:
-                                stock[item_key] += qty
-                                print(f"  ⬆️ Stock returned: {qty}x {item_key.title()}")
-                    
-                    # Deduct from sales if it was a PAID order being removed
-                    elif removed_status == "PAID":
-                        session_total_sales -= removed_total
-                        print(f"  ⬇️ Sales adjusted: -₱{removed_total:.2f} removed from session total.")
-
-
-                    del transactions[index]
-                    
-                    # Save updated inventory and transactions back to CSV
-                    save_inventory(menu, stock) 
-                    rewrite_transactions(transactions) 
+                    # Another till may have removed or confirmed it while we were asking: void_order goes by its status now
+                    try:
+                        tx, moves = void_order(tx_id, menu, stock)
+                    except CheckoutError as e:
+                        print(f"❌ {e}")
+                        continue
+                    for _, item_key, qty in moves:
+                        print(f"  ⬆️ Stock returned: {qty}x {item_key.title()}")
+                    if tx['status'] == "PAID":
+                        print(f"  ⬇️ Sales adjusted: -₱{tx['total_amount']:.2f} removed from session total.")
 
-                    print(f"✅ Transaction for **{removed_customer}** (Status: {removed_status}) has been **REMOVED** from history.")
+                    print(f"✅ Transaction for **{tx['customer']}** (Status: {tx['status']}) has been **REMOVED** from history.")
                     
-                    view_transactions(transactions) 
+                    view_transactions(itertools.islice(iter_recent_transactions(), HISTORY_PAGE_SIZE)) 
                     
                 else:
                     print("Removal canceled.")
                     
             else:
-                print("Invalid number. Please choose a number from the list or 'done'.")
+                print("Invalid ID. Please enter the ID of a transaction in the history or 'done'.")
                 
         except ValueError:
             print("Invalid input. Please enter a number or 'done'.")
-            
-    return session_total_sales 
 
 def main():
     global menu, stock # Make menu and stock global so sub-functions (like deduct_stock) can access them for saving
@@ -466,7 +5201,7 @@ def main():
     # If no data loaded, prompt for initial input
     if not menu:
         print("--- Initial Setup Required ---")
-        menu, stock = input_menu()
+        menu, stock = make_catalog(*input_menu())
         if not menu:
             print("No menu items entered. Exiting.")
             return
@@ -474,18 +5209,26 @@ def main():
 
     print("\n\t  -- Strains and Products successfully loaded/created! --")
     print("\t\t\tProduct | Price | Stock")
-    for item, price in menu.items():
+    for item, price in itertools.islice(menu.items(), LIST_PAGE_SIZE):
         qty = stock.get(item, 0)
         print(f"\t\t\t{item.title():<10}: ₱{price:.2f} ({qty})")
+    if len(menu) > LIST_PAGE_SIZE:
+        print(f"\t\t\t... and {len(menu) - LIST_PAGE_SIZE} more (see Take a Order / Update Products)")
 
-    transactions = load_transactions()
-    
-    # Recalculate sales total from loaded PAID transactions
-    session_total_sales = sum(t['total_amount'] for t in transactions if t['status'] == 'PAID')
-    print(f"\nLoaded Session Sales Total: ₱{session_total_sales:.2f}")
+    # PAID sales total and pending orders come from the aggregate cache, loaded in the background with the search index
+    print("\n")
+    load_history_in_background(menu)
+    if history_loaded(HISTORY_WAIT_SECONDS):
+        session_total_sales, pending_tx = load_transaction_summary()
+        print(f"\nLoaded Session Sales Total: ₱{session_total_sales:.2f}")
+    else:
+        print("\nSales history is loading in the background; the session total is shown at End Session.")
 
 
     while True:
+        for tx in (expire_reservations(menu, stock) if history_loaded() else ()):
+            print(f"⌛ GCash reservation expired: #{tx['tx_id']} {tx['customer']} (₱{tx['total_amount']:.2f}). Its stock is back on sale.")
+
         print("\nOptions:")
         print("1. Take a Order")
         print("2. Update Products/Stock")
@@ -505,54 +5248,70 @@ def main():
                 print("No items ordered.")
             else:
                 order_total = print_receipt(order, menu, customer_name)
-                
+                # Another till may have sold the same stock while the order was taken: check before any money changes hands
+                try:
+                    check_order(order, menu, stock, customer_name)
+                except CheckoutError as e:
+                    print(f"❌ Checkout failed: {e}")
+                    continue
+
                 paid_amount, method, status = process_payment(order_total) 
                 
-                new_transaction = {
-                    'customer': customer_name,
-                    'total_amount': order_total,
-                    'method': method,
-                    'status': status,
-                    'order_items': order
-                }
-
-                transactions.append(new_transaction)
-                save_transaction(new_transaction) # Save new transaction to CSV
-                
+                # Save the new transaction and its stock deduction together (assigns its tx_id, updates the sales totals)
+                try:
+                    tx = checkout(order, method, menu, stock, customer_name, pending=(status != "PAID"))
+                except CheckoutError as e:
+                    print(f"❌ Checkout failed: {e}")
+                    if status == "PAID":
+                        print(f"Return the ₱{order_total:.2f} collected to the customer.")
+                    continue
+                if RECEIPT_PRINTER:
+                    send_to_printer(tx)
+
                 if status == "PAID":
-                    session_total_sales += order_total
-                    deduct_stock(stock, order)
+                    print("\nStock Updated After Sale.")
+                    display_stock_count({item_key: stock[item_key] for item_key in order if item_key in stock})
+                    display_reorder_alerts()
                 else:
-                    print("⚠️ Stock not deducted for pending GCash payment.")
+                    print(f"🔒 Stock reserved for the pending GCash payment (released after {RESERVATION_HOURS} hours if unpaid).")
+                    display_reorder_alerts()
 
         elif choice == '2':
             update_menu(menu, stock) # Inventory saving is handled inside update_menu
 
         elif choice == '3':
-            view_transactions(transactions)
+            page_transactions()
 
         elif choice == '4':
-            # Transaction management will update stock and rewrite transactions.csv
-            session_total_sales = manage_transactions(transactions, stock, session_total_sales)
+            # Transaction management will update stock and void transactions
+            manage_transactions(stock)
 
         elif choice == '5':
+            session_total_sales, pending_tx = load_transaction_summary()
             print("\n" + "="*40)
             print("         END OF SESSION REPORT")
             print("="*40)
             print(f"Total Revenue (Paid Orders Only): ₱{session_total_sales:.2f}")
+            for method, amount in get_aggregates().by_method.items():
+                print(f"    {method:<15}: ₱{Money(amount):.2f}")
             print("\n--- Final Inventory ---")
             display_stock_count(stock)
+            display_reorder_suggestions(stock)
             
-            pending_tx = [t for t in transactions if t['status'] != "PAID"]
             if pending_tx:
                 print("\n⚠️ NOTE: The following orders were UNPAID (GCash Pending):")
-                for t in pending_tx:
+                for t in pending_tx.values():
                     print(f"  - {t['customer']} (₱{t['total_amount']:.2f})")
             
             print("="*40)
             # Final saves (optional, as updates are saved in real-time, but good for safety)
-            save_inventory(menu, stock) 
-            rewrite_transactions(transactions)
+            # transactions are appended as they happen, so no full rewrite is needed here
+            get_storage().end_session(menu, stock) # Fold the stock journal into inventory.csv
+            sealed = archive_transactions() # Move settled sales of closed months out of transactions.csv
+            if sealed:
+                print(f"Archived {sealed} transactions from earlier periods.")
+            checkpoint_aggregates()
+            save_reorder_state()
             print("Data saved. Exiting POS. Goodbye!")
             break
 
@@ -560,8 +5319,318 @@ def main():
             print("Invalid choice. Please select 1-5.")
 
 
+def batch_main(path, batch_size=BATCH_SIZE):
+    """Headless entry point: check out a file of orders against the saved inventory."""
+    global menu, stock
+    menu, stock = load_data()
+    if not menu:
+        print("No inventory found. Run the POS once to set up products.")
+        return 1
+    get_aggregates()
+    expire_reservations(menu, stock)
+    print(f"Processing orders from {path} ...")
+    accepted, rejected, amount = run_batch(path, menu, stock, batch_size)
+    get_storage().end_session(menu, stock)
+    archive_transactions()
+    checkpoint_aggregates()
+    save_reorder_state()
+    display_reorder_alerts()
+    print(f"✅ {accepted} orders recorded (₱{amount:.2f} paid), {rejected} rejected.")
+    return 0 if rejected == 0 else 2
+
+
+def serve_main(host=SERVICE_HOST, port=SERVICE_PORT):
+    """Service entry point: run the POS as a local HTTP server (see PosService)."""
+    global menu, stock
+    menu, stock = load_data()
+    if not menu:
+        print("No inventory found. Run the POS once to set up products.")
+        return 1
+    service = PosService(menu, stock)
+    try:
+        asyncio.run(service.run(host, port))
+    except KeyboardInterrupt:
+        pass # Platforms without loop signal handlers
+    except OSError as e:
+        print(f"Error starting the service: {e}")
+        return 1
+    finally:
+        get_storage().end_session(menu, stock)
+        checkpoint_aggregates()
+        save_reorder_state()
+    print("Service stopped.")
+    return 0
+
+
+def reconcile_main(path, dry_run=False):
+    """Reconciliation entry point: mark the pending GCash orders paid in a statement file as PAID."""
+    global menu, stock
+    menu, stock = load_data()
+    get_aggregates()
+    expire_reservations(menu, stock)
+    try:
+        paid, unmatched, problems = reconcile_statement(path, menu, stock, dry_run)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error reading statement: {e}")
+        return 1
+    get_storage().end_session(menu, stock)
+    checkpoint_aggregates()
+    save_reorder_state()
+
+    print(f"\n{'Would mark' if dry_run else 'Marked'} {len(paid)} GCash orders PAID:")
+    for payment, tx in paid:
+        print(f"  #{tx['tx_id']:<6} {tx['customer'][:20]:<21} ₱{tx['total_amount']:>10.2f}  ref {payment['reference'] or '-'} (line {payment['line']})")
+    if problems:
+        print(f"\n⚠️ {len(problems)} payments matched an order that could not be completed:")
+        for payment, tx, reason in problems:
+            print(f"  #{tx['tx_id']:<6} {tx['customer'][:20]:<21} ref {payment['reference'] or '-'}: {reason}")
+    if unmatched:
+        print(f"\n{len(unmatched)} payments did not match a pending order:")
+        for payment in unmatched:
+            print(f"  line {payment['line']}: ₱{payment['amount'] / 100:.2f} from {payment['name'] or '?'} ref {payment['reference'] or '-'}")
+    display_reorder_alerts()
+    return 0 if not problems else 2
+
+
+def report_main(since=None, until=None, top=REPORT_TOP_N, fmt='json', output=None):
+    """Reporting entry point: the sales report for a period, printed or exported for the owner."""
+    menu, stock = load_data()
+    started = time.perf_counter()
+    if since or until:
+        # Only the archive partitions of the period are read; pending exposure still covers every open order
+        end = _day_after(until) if until else None
+        pending = [tx for tx in get_aggregates().pending.values()
+                   if not (since or '') <= (tx['created_at'] or '') < (end or '~')]
+        transactions = itertools.chain(iter_transactions_between(since, end), pending)
+    else:
+        transactions = iter_transactions()
+    report = sales_report(SalesColumns.load(transactions), stock, since, until, top)
+    if output:
+        export_report(report, output, fmt)
+        print(f"✅ Report written to {output} ({fmt.upper()}).")
+        return 0
+
+    summary = report['summary']
+    period = f"{since or 'start'} to {until or 'today'}"
+    print("\n" + "="*40)
+    print("         SALES REPORT")
+    print("="*40)
+    print(f"Period: {period} ({summary['transactions']} transactions read in {time.perf_counter() - started:.2f}s)")
+    print(f"Total Revenue (Paid Orders Only): ₱{summary['revenue']:.2f} from {summary['orders']} orders")
+    print(f"Average Order: ₱{summary['average_order']:.2f}   Items Sold: {summary['items_sold']}")
+    if summary['sell_through'] is not None:
+        print(f"Sell-through: {summary['sell_through']:.1%}")
+    for line in report['by_method']:
+        print(f"    {line['method']:<15}: ₱{line['revenue']:.2f} ({line['orders']} orders)")
+    print("\n--- Top Sellers ---")
+    for line in report['top_sellers']:
+        print(f"  {line['item'].title():<25} {line['qty']:>6} sold  ₱{line['revenue']:>10.2f}  {line['stock']:>5} left")
+    print("\n--- Sales by Hour ---")
+    for line in report['by_hour']:
+        print(f"  {line['hour']:<8} {line['orders']:>6} orders  ₱{line['revenue']:>10.2f}")
+    if summary['pending_orders']:
+        print(f"\n⚠️ Pending GCash: {summary['pending_orders']} orders, ₱{summary['pending_amount']:.2f} "
+              f"(oldest from {summary['oldest_pending_day']})")
+        for line in report['pending_by_customer'][:top]:
+            print(f"  - {line['customer']} (₱{line['amount']:.2f}, {line['orders']} orders)")
+    print("="*40)
+    return 0
+
+
+def export_main(path, fmt='csv', workers=EXPORT_WORKERS, totals_path=None, totals_fmt='json'):
+    """Export entry point: every live transaction to a CSV/JSONL file, with per-item, per-customer and per-method totals."""
+    started = time.perf_counter()
+    try:
+        totals = export_history(path, fmt, workers)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error exporting transactions: {e}")
+        return 1
+    report = totals.report()
+    summary = report['summary']
+    print(f"✅ {summary['transactions']} transactions written to {path} ({fmt.upper()}) "
+          f"in {time.perf_counter() - started:.2f}s with {workers} worker{'s' if workers != 1 else ''}.")
+    print(f"Total Revenue (Paid Orders Only): ₱{summary['revenue']:.2f} from {summary['orders']} orders, "
+          f"₱{summary['pending_amount']:.2f} pending, {summary['customers']} customers")
+    for line in report['by_method']:
+        print(f"    {line['method']:<15}: ₱{line['revenue']:.2f} ({line['orders']} orders)")
+    if totals_path:
+        export_report(report, totals_path, totals_fmt)
+        print(f"✅ Totals written to {totals_path} ({totals_fmt.upper()}).")
+    return 0
+
+
+def receipts_main(path, fmt='text', since=None, until=None, tx_ids=None):
+    """Receipt export entry point: render saved transactions' receipts into one file, printer or pipe."""
+    started = time.perf_counter()
+    if tx_ids:
+        transactions = (tx for tx in map(get_transaction, tx_ids) if tx is not None)
+    elif since or until:
+        transactions = iter_transactions_between(since, _day_after(until) if until else None)
+    else:
+        transactions = iter_transactions()
+    try:
+        written = export_receipts(path, transactions, fmt)
+    except OSError as e:
+        print(f"❌ Error writing receipts: {e}", file=sys.stderr)
+        return 1
+    # Progress goes to stderr so '-' can stream the receipts themselves to stdout
+    print(f"✅ {written} receipts written to {path} ({fmt}) in {time.perf_counter() - started:.2f}s.", file=sys.stderr)
+    return 0
+
+
+def archive_main():
+    """Archive entry point: seal the settled transactions of closed periods (End Session does this too)."""
+    sealed = archive_transactions()
+    if sealed is None:
+        print("Other tills are running. Archive again when this is the only till open.")
+    elif sealed:
+        print(f"✅ Archived {sealed} transactions into {ARCHIVE_DIR}/ (one partition per {ARCHIVE_PERIOD}).")
+    else:
+        print("Nothing to archive: the history only holds the current period and pending orders.")
+    return 0
+
+
+def metrics_main(path=METRICS_FILE):
+    """Print the metrics the last instrumented run wrote. Returns an exit status."""
+    if not os.path.exists(path):
+        print(f"No metrics in {path}. Run the POS with POS_METRICS=1 to record them.")
+        return 1
+    with open(path, mode='r') as file:
+        print(file.read(), end='')
+    return 0
+
+def bench_main(args):
+    """Run every case x catalog size x history size, each in its own process so peak RSS is per case."""
+    if args.run_case:
+        print(json.dumps(run_bench_case(args.run_case, args.items[0], args.transactions[0], args.budget)))
+        return 0
+    if args.memory:
+        print(json.dumps([measure_history_memory(items, transactions)
+                          for items in args.items for transactions in args.transactions], indent=2))
+        return 0
+
+    results = []
+    for case in args.cases:
+        for items in args.items:
+            for transactions in args.transactions:
+                command = [sys.executable, os.path.abspath(__file__), 'bench', '--run-case', case,
+                           '--items', str(items), '--transactions', str(transactions), '--budget', str(args.budget)]
+                output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{case:<22}{items:>8}{transactions:>10}  {result['ops_per_sec']:>10.1f} ops/s"
+                      f"  p50 {result['p50_ms']:.3f}ms  p99 {result['p99_ms']:.3f}ms  rss {result['peak_rss_kb']} KB", file=sys.stderr)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'storage': STORAGE_BACKEND,
+                 'created_at': datetime.now().strftime(TIMESTAMP_FORMAT)},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, mode='w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, mode='r') as file:
+            baseline = json.load(file)
+        if compare_bench(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+def _int_list(text):
+    return [int(part) for part in text.split(',') if part]
+
+
+def _day_after(day):
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+def _day(text):
+    """A day as YYYY-MM-DD, 'today', 'yesterday' or a weekday name (its most recent past occurrence, e.g. 'tuesday')."""
+    today = datetime.now().date()
+    word = text.strip().lower()
+    if word in ('today', 'yesterday'):
+        return (today - timedelta(days=word == 'yesterday')).isoformat()
+    weekdays = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+    matches = [day for day, name in enumerate(weekdays) if len(word) >= 3 and name.startswith(word)]
+    if matches:
+        return (today - timedelta(days=(today.weekday() - matches[0] - 1) % 7 + 1)).isoformat()
+    datetime.strptime(text, '%Y-%m-%d')
+    return text
+
+
 if __name__ == '__main__':
     # Initialize global variables before main runs (used in deduct_stock)
     menu = {}
     stock = {}
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="LORENCE'S BETTA FISH POS. Runs the interactive till when no command is given.")
+    parser.add_argument('--profile', metavar='FILE', help="save a cProfile profile of this run to FILE")
+    parser.add_argument('--trace-memory', metavar='FILE', help="write this run's top memory allocations (tracemalloc) to FILE")
+    commands = parser.add_subparsers(dest='command')
+    batch_parser = commands.add_parser('batch', help="check out orders from a .jsonl or .csv file without prompts")
+    batch_parser.add_argument('path')
+    batch_parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    serve_parser = commands.add_parser('serve', help="run a local HTTP/JSON service for tablets and the web storefront")
+    serve_parser.add_argument('--host', default=SERVICE_HOST)
+    serve_parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    reconcile_parser = commands.add_parser('reconcile', help="mark pending GCash orders PAID from a GCash statement CSV")
+    reconcile_parser.add_argument('path')
+    reconcile_parser.add_argument('--dry-run', action='store_true', help="only show what would be matched")
+    report_parser = commands.add_parser('report', help="sales by item, hour, day and payment method, with CSV/JSON export")
+    report_parser.add_argument('--since', type=_day, help="first day included (YYYY-MM-DD, today, yesterday or a weekday)")
+    report_parser.add_argument('--until', type=_day, help="last day included (YYYY-MM-DD, today, yesterday or a weekday)")
+    report_parser.add_argument('--top', type=int, default=REPORT_TOP_N, help="top sellers listed")
+    report_parser.add_argument('--format', choices=('json', 'csv'), default='json', help="export format for --output")
+    report_parser.add_argument('--output', help="write the report here (a .json file, or a directory of .csv files)")
+    export_parser = commands.add_parser('export', help="write the whole history to CSV/JSONL with per-item, per-customer and per-method totals, in parallel")
+    export_parser.add_argument('path')
+    export_parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    export_parser.add_argument('--workers', type=int, default=EXPORT_WORKERS, help="worker processes (1: a single pass in this process)")
+    export_parser.add_argument('--totals', help="also write the totals here (a .json file, or a directory of .csv files)")
+    export_parser.add_argument('--totals-format', choices=('json', 'csv'), default='json')
+    receipts_parser = commands.add_parser('receipts', help="render receipts of saved transactions (text, ESC/POS or HTML) into one file, printer or pipe")
+    receipts_parser.add_argument('path', help="output file, printer device or named pipe ('-' for stdout)")
+    receipts_parser.add_argument('--format', choices=sorted(RECEIPTS), default='text')
+    receipts_parser.add_argument('--since', type=_day, help="first day included (YYYY-MM-DD, today, yesterday or a weekday)")
+    receipts_parser.add_argument('--until', type=_day, help="last day included (YYYY-MM-DD, today, yesterday or a weekday)")
+    receipts_parser.add_argument('--ids', type=_int_list, help="only these transaction IDs, comma separated")
+    commands.add_parser('archive', help="seal settled transactions of closed months (POS_ARCHIVE_PERIOD=day: days) into the archive")
+    metrics_parser = commands.add_parser('metrics', help="print the timings and I/O counters recorded with POS_METRICS=1")
+    metrics_parser.add_argument('--file', default=METRICS_FILE)
+    bench_parser = commands.add_parser('bench', help="benchmark the checkout, load and reporting paths on synthetic data")
+    bench_parser.add_argument('--cases', type=lambda text: text.split(','), default=BENCH_CASES)
+    bench_parser.add_argument('--items', type=_int_list, default=BENCH_ITEMS, help="catalog sizes, comma separated")
+    bench_parser.add_argument('--transactions', type=_int_list, default=BENCH_TRANSACTIONS, help="history sizes, comma separated")
+    bench_parser.add_argument('--budget', type=float, default=BENCH_TIME_BUDGET, help="seconds per case")
+    bench_parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    bench_parser.add_argument('--baseline', help="JSON report to compare against; exits 1 on a regression")
+    bench_parser.add_argument('--tolerance', type=float, default=BENCH_TOLERANCE)
+    bench_parser.add_argument('--memory', action='store_true', help="measure the memory held by the loaded history instead")
+    bench_parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if MULTI_TILL and fcntl is None:
+        print("❌ POS_MULTI_TILL needs file locking, which this platform does not support.")
+        sys.exit(1)
+    if args.command == 'metrics':
+        sys.exit(metrics_main(args.file))
+    with profiled_session(args.profile, args.trace_memory):
+        if args.command == 'batch':
+            sys.exit(batch_main(args.path, args.batch_size))
+        if args.command == 'serve':
+            sys.exit(serve_main(args.host, args.port))
+        if args.command == 'reconcile':
+            sys.exit(reconcile_main(args.path, args.dry_run))
+        if args.command == 'report':
+            sys.exit(report_main(args.since, args.until, args.top, args.format, args.output))
+        if args.command == 'bench':
+            sys.exit(bench_main(args))
+        if args.command == 'archive':
+            sys.exit(archive_main())
+        if args.command == 'receipts':
+            sys.exit(receipts_main(args.path, args.format, args.since, args.until, args.ids))
+        if args.command == 'export':
+            sys.exit(export_main(args.path, args.format, max(1, args.workers), args.totals, args.totals_format))
+        main()
\ No newline at end of file
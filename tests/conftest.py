@@ -0,0 +1,43 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+CODE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'code.py')
+
+
+def load_pos(name='pos_code'):
+    """Import a fresh copy of code.py, so its module-level state and env-var settings start clean."""
+    spec = importlib.util.spec_from_file_location(name, CODE_PATH)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def pos_env(tmp_path, monkeypatch):
+    """Run in an empty shop directory with the default settings. Returns a loader for code.py."""
+    monkeypatch.chdir(tmp_path)
+    for name in list(os.environ):
+        if name.startswith('POS_'):
+            monkeypatch.delenv(name)
+    monkeypatch.setenv('POS_FSYNC_WINDOW', '0')
+    return load_pos
+
+
+@pytest.fixture
+def pos(pos_env):
+    """code.py loaded in an empty shop directory (CSV storage, single till)."""
+    return pos_env()
+
+
+@pytest.fixture
+def shop(pos):
+    """A loaded catalog: (pos, menu, stock)."""
+    with open(pos.INVENTORY_FILE, 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,10\nguppy,35.50,40\nfood,0.10,500\n')
+    menu, stock = pos.load_data()
+    return pos, menu, stock
+
@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def shop(request, pos_env, monkeypatch):
+    monkeypatch.setenv('POS_STORAGE', request.param)
+    with open('inventory.csv', 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,50\nguppy,35.50,400\n')
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    return pos, menu, stock
+
+
+def test_rebuild_lets_checkouts_through(shop, monkeypatch):
+    pos, menu, stock = shop
+    for _ in range(3):
+        pos.checkout({'betta': 1}, 'Cash', menu, stock)
+    pending = pos.checkout({'guppy': 2}, 'GCash', menu, stock, 'Ana', pending=True)
+    pos._aggregates = None
+    if pos.os.path.exists(pos.AGGREGATE_FILE):
+        pos.os.remove(pos.AGGREGATE_FILE)
+
+    rebuild = pos.AggregateCache.rebuild
+    def slow_rebuild(cache, transactions):
+        # Another thread checks out while the history is being read: it must not wait for the rebuild
+        def sell():
+            pos.checkout({'guppy': 1}, 'Cash', menu, stock)
+            pos.confirm_payment(pending['tx_id'], menu, stock)
+        seller = threading.Thread(target=sell)
+        seller.start()
+        seller.join(5)
+        assert not seller.is_alive()
+        rebuild(cache, transactions)
+    monkeypatch.setattr(pos.AggregateCache, 'rebuild', slow_rebuild)
+
+    aggregates = pos.get_aggregates()
+    assert aggregates.paid_total() == pos.Money.parse('706.50')
+    assert aggregates.by_status['PAID'][0] == 5
+    assert aggregates.pending == {}
+    assert aggregates.by_item['guppy'] == [3, 10650]
+
+
+def test_customer_keys(pos_env):
+    pos = pos_env()
+    assert pos.customer_key('0917 123 4567') == pos.customer_key('+63 917 123 4567') == \
+        pos.customer_key('Ana 09171234567') == 'tel:9171234567'
+    assert pos.customer_key('  Ana   REYES ') == pos.customer_key('ana reyes') == 'ana reyes'
+    assert pos.customer_key('Guest Customer') is None and pos.customer_key('') is None
+
+
+def test_customer_index_follows_every_change(shop, pos_env):
+    pos, menu, stock = shop
+    pos.get_aggregates()
+    first = pos.checkout({'betta': 1}, 'Cash', menu, stock, 'Ana Reyes')
+    pending = pos.checkout({'guppy': 2}, 'GCash', menu, stock, 'ana reyes 0917 123 4567', pending=True)
+    phone = pos.checkout({'guppy': 1}, 'GCash', menu, stock, '+63 917 123 4567', pending=True)
+    pos.checkout({'betta': 1}, 'Cash', menu, stock) # A guest
+    pos.confirm_payment(phone['tx_id'], menu, stock)
+
+    ana = pos.find_customer('ANA REYES')
+    assert (ana['visits'], ana['spent'], ana['pending'], ana['tx_ids']) == (1, pos.Money(20000), pos.Money(0), [first['tx_id']])
+    by_phone = pos.find_customer('09171234567')
+    assert by_phone['customer'] == '+63 917 123 4567' # As last entered
+    assert (by_phone['visits'], by_phone['spent'], by_phone['pending']) == (2, pos.Money(3550), pos.Money(7100))
+    assert by_phone['tx_ids'] == [pending['tx_id'], phone['tx_id']]
+    assert pos.find_customer('Guest Customer') is None
+
+    pos.void_order(pending['tx_id'], menu, stock)
+    pos.void_order(first['tx_id'], menu, stock)
+    assert pos.find_customer('Ana Reyes') is None
+    assert pos.find_customer('0917 123 4567')['pending'] == pos.Money(0)
+    expected = {key: pos.find_customer(entry[0]) for key, entry in pos.get_aggregates().customers.items()}
+
+    pos.checkpoint_aggregates()
+    restarted = pos_env()
+    restarted.load_data()
+    restarted.get_aggregates()
+    assert os.path.exists(restarted.AGGREGATE_FILE)
+    assert {key: restarted.find_customer(entry[0]) for key, entry in restarted.get_aggregates().customers.items()} == expected
+
+    rebuilt = restarted.AggregateCache()
+    rebuilt.rebuild(restarted.iter_transactions())
+    assert rebuilt.customers == restarted.get_aggregates().customers
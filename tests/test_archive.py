@@ -0,0 +1,78 @@
+import itertools
+import subprocess
+import sys
+import time
+
+import pytest
+
+
+def paid(customer, created_at):
+    return {'customer': customer, 'total_amount': '200.00', 'method': 'Cash', 'status': 'PAID',
+            'order_items': {'betta': 1}, 'item_prices': {'betta': '200.00'}, 'created_at': created_at}
+
+
+def test_other_store_resyncs_after_seal_and_new_appends(pos):
+    till_a = pos.TransactionStore()
+    till_a.append_many([paid(f'old {i}', '2020-01-05 10:00:00') for i in range(4)])
+    till_b = pos.TransactionStore()
+    assert till_b.get(2)['customer'] == 'old 1'
+
+    assert till_a.seal('2020-02') == 4
+    # Appends after the seal make the new file longer than till B's old end
+    till_a.append_many([paid(f'new {i}', '2020-02-01 09:00:00') for i in range(6)])
+
+    assert till_b.sync() is None # Rewritten: index reloaded
+    assert till_b.get(5)['customer'] == 'new 0'
+    assert till_b.get(2)['customer'] == 'old 1' # From the archive
+    till_a.append(paid('later', '2020-02-02 09:00:00'))
+    assert [tx['customer'] for tx in till_b.sync()] == ['later']
+    assert sorted(tx['tx_id'] for tx in till_b.iter_live()) == list(range(1, 12))
+
+
+@pytest.fixture
+def other_till(tmp_path):
+    """Another till process, holding its shared lock on TILLS_FILE until stopped."""
+    script = ("import fcntl, sys, time; f = open('pos.tills', 'a'); fcntl.flock(f, fcntl.LOCK_SH); "
+              "print('ready', flush=True); sys.stdin.read()")
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=tmp_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    assert process.stdout.readline().strip() == 'ready'
+    yield process
+    process.stdin.close()
+    process.wait(5)
+
+
+def test_no_seal_while_other_tills_run(pos_env, monkeypatch, other_till):
+    monkeypatch.setenv('POS_MULTI_TILL', '1')
+    pos = pos_env()
+    pos.get_storage().get_sales_store().append(paid('old', '2020-01-05 10:00:00'))
+
+    assert pos.archive_transactions() is None
+    assert pos.get_transaction(1)['customer'] == 'old'
+
+    other_till.stdin.close()
+    other_till.wait(5)
+    assert pos.archive_transactions() == 1
+    assert pos.get_transaction(1)['customer'] == 'old'
+
+
+def test_recent_first_without_sorting_the_index(pos, monkeypatch):
+    store = pos.TransactionStore()
+    store.append_many([paid(f'old {i}', '2020-01-05 10:00:00') for i in range(3)])
+    store.append_many([dict(paid(f'new {i}', '2020-02-01 09:00:00'), status=pos.PENDING_STATUS) for i in range(5)])
+    store.seal('2020-02')
+    store.append_many([paid(f'later {i}', '2020-02-02 09:00:00') for i in range(3)])
+    store.replace_many([dict(store.get(5), status='PAID')]) # Rewritten at the end of the file
+    store.void(2) # A sealed transaction: its tombstone goes to the file after higher ids
+    store.void(10)
+
+    def newest_first(store):
+        return [tx['tx_id'] for tx in store.iter_recent()]
+    assert newest_first(store) == [11, 9, 8, 7, 6, 5, 4, 3, 1]
+    assert newest_first(pos.TransactionStore()) == newest_first(store)
+
+    monkeypatch.setattr(pos, 'sorted', None, raising=False) # A page must not sort the whole index
+    parsed = []
+    parse_line = store._parse_line
+    monkeypatch.setattr(store, '_parse_line', lambda line: parsed.append(line) or parse_line(line))
+    assert [tx['customer'] for tx in itertools.islice(store.iter_recent(), 2)] == ['later 2', 'later 0']
+    assert len(parsed) == 3 # Down to the second live record only
@@ -0,0 +1,51 @@
+import pytest
+
+
+def stock_file(path='inventory.csv'):
+    with open(path, 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,10\nguppy,35.50,40\nfood,0.10,500\n')
+
+
+def sell(pos, menu, stock):
+    pos.checkout({'betta': 2, 'food': 5}, 'Cash', menu, stock)
+    pending = pos.checkout({'guppy': 3}, 'GCash', menu, stock, 'Ana', pending=True)
+    voided = pos.checkout({'guppy': 1}, 'Cash', menu, stock)
+    pos.get_storage().void_transaction(voided['tx_id'])
+    pos.checkout({'betta': 1}, 'Cash', menu, stock)
+    return pending
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_reports_agree_with_the_history(pos_env, monkeypatch, backend):
+    monkeypatch.setenv('POS_STORAGE', backend)
+    stock_file()
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    pending = sell(pos, menu, stock)
+
+    storage = pos_env().get_storage()
+    assert storage.paid_total() == pos.Money.parse('600.50')
+    assert [tx['tx_id'] for tx in storage.pending_transactions()] == [pending['tx_id']]
+    assert storage.sales_by_item() == {'betta': 3, 'food': 5}
+    # The SQL answers match the generic streaming ones
+    assert storage.sales_by_item() == pos.StorageBackend.sales_by_item(storage)
+    total, open_orders = pos.StorageBackend.transaction_summary(storage)
+    assert (total, list(open_orders)) == (storage.paid_total(), [pending['tx_id']])
+
+
+def test_empty_database_is_seeded_from_the_csv_files(pos_env, monkeypatch):
+    stock_file()
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    pending = sell(pos, menu, stock)
+
+    monkeypatch.setenv('POS_STORAGE', 'sqlite')
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    assert dict(stock) == {'betta': 7, 'guppy': 36, 'food': 495} # A bare void returns no stock
+    assert menu['guppy'] == pos.Money.parse('35.50')
+    storage = pos.get_storage()
+    assert storage.get_transaction(pending['tx_id'])['order_items'] == {'guppy': 3}
+    assert storage.get_transaction(3) is None # Voided before the import
+    assert storage.append_transaction({'customer': 'Ben', 'total_amount': pos.Money(1000), 'method': 'Cash',
+                                       'status': 'PAID', 'order_items': {'food': 100}}) == 5
@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+
+def write_orders(path, rows):
+    with open(path, 'w') as file:
+        for row in rows:
+            file.write(row if isinstance(row, str) else json.dumps(row))
+            file.write('\n')
+
+
+def test_batch_accepts_and_rejects(shop, tmp_path):
+    pos, menu, stock = shop
+    path = str(tmp_path / 'orders.jsonl')
+    write_orders(path, [
+        {'items': {'betta': 2}, 'customer': 'Ana'},
+        {'items': {'betta': 1}, 'customer': 'Dee\nEvil'},
+        {'items': {'guppy': 1}, 'customer': 'Ben', 'method': 'Cash\r'},
+        {'items': 'nope:1'},
+        {'items': {'betta': 99}},
+        {'items': {'food': 1}, 'method': 'cheque'},
+        '{not json',
+        {'items': 'guppy:2;food:10', 'method': 'gcash', 'status': 'pending'},
+    ])
+    accepted, rejected, amount = pos.run_batch(path, menu, stock)
+    assert (accepted, rejected) == (2, 6)
+    assert amount == pos.Money.parse('400')
+    assert stock['betta'] == 8 and stock['guppy'] == 38 and stock['food'] == 490
+    assert [tx['customer'] for tx in pos.iter_transactions()] == ['Ana', 'Guest Customer']
+
+
+@pytest.mark.parametrize('row, error', [
+    ({'items': {'betta': 1}, 'customer': 'Dee\nEvil'}, 'control characters'),
+    ({'items': {'betta': 1}, 'customer': 'Nul\x00'}, 'control characters'),
+    ({'items': {'bet\nta': 1}}, 'control characters'),
+    ({'items': {'betta': 1}, 'customer': ['Ana']}, 'must be text'),
+    ({'items': {'betta': 11}}, 'Insufficient stock'),
+    ({'items': {'betta': 0}}, 'Invalid quantity'),
+    ({'items': {'betta': 1}, 'method': 'Cash', 'status': 'pending'}, 'Only GCash'),
+])
+def test_service_rejects_bad_orders(shop, row, error):
+    pos, menu, stock = shop
+    service = pos.PosService(menu, stock)
+    [(status, body)] = service._commit([('order', row)])
+    assert status == 400 and error in body['error']
+    assert stock['betta'] == 10
+    assert list(pos.iter_transactions()) == []
+
+
+def test_service_order_request(shop):
+    pos, menu, stock = shop
+    service = pos.PosService(menu, stock)
+    [(status, body)] = service._commit([('order', {'items': {'betta': 1}, 'customer': 'Ana'}), ])
+    assert status == 201 and body['customer'] == 'Ana'
+    assert stock['betta'] == 9
+
+
+def broken_disk(pos, monkeypatch):
+    def fail(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(pos.CsvBackend, 'record_checkout', fail)
+    monkeypatch.setattr(pos.CsvBackend, 'record_checkouts', fail)
+
+
+def test_failed_write_rolls_back_checkout(shop, monkeypatch):
+    pos, menu, stock = shop
+    broken_disk(pos, monkeypatch)
+    with pytest.raises(pos.CheckoutError):
+        pos.checkout({'betta': 2}, 'Cash', menu, stock, 'Ana')
+    assert stock['betta'] == 10
+
+
+def test_failed_write_rejects_batch(shop, tmp_path, monkeypatch):
+    pos, menu, stock = shop
+    path = str(tmp_path / 'orders.jsonl')
+    write_orders(path, [{'items': {'betta': 2}}, {'items': {'guppy': 1}}, {'items': 'nope:1'}])
+    broken_disk(pos, monkeypatch)
+    assert pos.run_batch(path, menu, stock) == (0, 3, pos.Money(0))
+    assert stock['betta'] == 10 and stock['guppy'] == 40
+    assert list(pos.iter_transactions()) == []
+
+
+def test_http_orders_route(shop):
+    pos, menu, stock = shop
+    service = pos.PosService(menu, stock)
+
+    async def post(*bodies):
+        service.queue = pos.asyncio.Queue()
+        committer = pos.asyncio.create_task(service._committer())
+        try:
+            return [await service.route('POST', '/orders', body) for body in bodies]
+        finally:
+            committer.cancel()
+
+    results = pos.asyncio.run(post(b'{"items": {"betta": 1}, "customer": "Ana"}',
+                                   b'{"items": {"betta": 1}, "customer": "Dee\\nEvil"}',
+                                   b'[1, 2]'))
+    assert [status for status, _ in results] == [201, 400, 400]
+    assert 'control characters' in results[1][1]['error']
+    assert stock['betta'] == 9
+    assert [tx['customer'] for tx in pos.iter_transactions()] == ['Ana']
@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_every_case_runs(pos_env, monkeypatch, backend):
+    monkeypatch.setenv('POS_STORAGE', backend)
+    pos = pos_env()
+    cwd = os.getcwd()
+    for case in pos.BENCH_CASES:
+        result = pos.run_bench_case(case, items=5, transactions=20, budget=0)
+        assert (result['case'], result['storage'], result['ops']) == (case, backend, pos.BENCH_MIN_OPS)
+        assert result['p50_ms'] <= result['p99_ms']
+    assert os.getcwd() == cwd and os.listdir(cwd) == []
+
+
+def test_bench_data_is_seeded(pos):
+    first = pos.generate_bench_data(5, 30)
+    def history():
+        return [dict(tx, created_at=None) for tx in pos.get_storage().iter_transactions()]
+    generated = history()
+    assert len(generated) == 30
+    os.remove(pos.SALES_FILE)
+    os.remove(pos.SALES_INDEX_FILE)
+    pos._storage = None
+    assert pos.generate_bench_data(5, 30) == first
+    assert history() == generated
+
+
+def test_regressions_against_a_baseline(pos, capsys):
+    result = {'case': 'checkout', 'storage': 'csv', 'items': 10, 'transactions': 1000, 'p50_ms': 1.0}
+    baseline = {'results': [dict(result, p50_ms=0.7), dict(result, case='void_transaction')]}
+    regressions = pos.compare_bench([result, dict(result, case='void_transaction', p50_ms=1.2)], baseline)
+    assert [r['case'] for r in regressions] == ['checkout'] # +43% against +20% within the tolerance
+    assert 'REGRESSION' in capsys.readouterr().out
+    assert pos.compare_bench([result], baseline, tolerance=0.5) == []
@@ -0,0 +1,55 @@
+import pytest
+
+
+def test_views_behave_like_the_dicts(pos):
+    menu, stock = pos.make_catalog({'betta': pos.Money.parse('200'), 'guppy': pos.Money.parse('35.50')},
+                                   {'betta': 10, 'guppy': 40})
+    assert dict(menu) == {'betta': pos.Money(20000), 'guppy': pos.Money(3550)}
+    stock['betta'] -= 3
+    menu['koi'] = pos.Money.parse('500')
+    stock['koi'] = 2
+    assert dict(stock) == {'betta': 7, 'guppy': 40, 'koi': 2}
+    assert len(menu) == 3 and 'koi' in menu and 'carp' not in menu
+    with pytest.raises(KeyError):
+        menu['carp']
+
+    del menu['betta'], stock['betta']
+    assert list(menu) == ['guppy', 'koi'] and menu.get('betta') is None
+    menu['betta'] = pos.Money.parse('210')
+    stock['betta'] = 1
+    assert list(stock) == ['betta', 'guppy', 'koi'] # Back in its old place
+    assert menu['betta'] == pos.Money(21000)
+
+
+def test_generation_changes_with_the_keys_only(pos):
+    menu, stock = pos.make_catalog({'betta': pos.Money(20000)}, {'betta': 10})
+    generation = pos.catalog_generation(menu)
+    menu['betta'] = pos.Money(21000)
+    assert pos.catalog_generation(menu) == generation
+    menu['guppy'] = pos.Money(3550)
+    assert pos.catalog_generation(menu) != generation
+    assert pos.catalog_generation(stock) != pos.catalog_generation(menu)
+
+
+def test_load_data_reads_a_catalog(shop):
+    pos, menu, stock = shop
+    assert isinstance(menu, pos.CatalogMenu) and isinstance(stock, pos.CatalogStock)
+    assert menu['food'] == pos.Money(10) and stock['food'] == 500
+    assert pos.make_catalog(menu, stock) == (menu, stock)
+
+
+def test_tx_record_reads_like_a_dict(pos):
+    tx = pos.TxRecord({'tx_id': 7, 'customer': 'Ana', 'total_amount': '435.50', 'method': 'GCash',
+                       'status': pos.PENDING_STATUS, 'order_items': '{"betta": 2, "guppy": 1}',
+                       'item_prices': {'betta': '200.00'}, 'created_at': '2024-05-01 10:00:00'})
+    assert tx['order_items'] == {'betta': 2, 'guppy': 1}
+    assert tx['item_prices'] == {'betta': pos.Money(20000)} # No price recorded for guppy
+    assert tx['total_amount'] == pos.Money(43550) and tx.get('missing') is None
+
+    paid = dict(tx, status='PAID')
+    assert paid['status'] == 'PAID' and tx['status'] == pos.PENDING_STATUS
+    tx['order_items'] = {'betta': 1}
+    assert tx['item_prices'] == {'betta': pos.Money(20000)}
+    with pytest.raises(KeyError):
+        tx['note'] = 'gift'
+    assert not hasattr(tx, '__dict__')
@@ -0,0 +1,78 @@
+import os
+import threading
+
+import pytest
+
+
+def test_failed_atomic_write_keeps_the_old_file(pos):
+    with open('data.csv', 'w') as file:
+        file.write('old\n')
+    with pytest.raises(RuntimeError):
+        with pos.atomic_write('data.csv') as file:
+            file.write('half of the new')
+            raise RuntimeError('crash')
+    with open('data.csv') as file:
+        assert file.read() == 'old\n'
+    assert os.listdir('.') == ['data.csv']
+
+    with pos.atomic_write('data.csv') as file:
+        file.write('new\n')
+    with open('data.csv') as file:
+        assert file.read() == 'new\n'
+    assert os.listdir('.') == ['data.csv']
+
+
+def test_appends_share_one_fsync_per_window(pos, monkeypatch):
+    synced = []
+    monkeypatch.setattr(pos.os, 'fsync', lambda fd: synced.append(fd))
+    batcher = pos.FsyncBatcher(window=60)
+    with open('a.csv', 'a') as a, open('b.csv', 'a') as b:
+        for file in (a, b, a):
+            file.write('row\n')
+            batcher.written(file)
+    assert synced == []
+    batcher.flush()
+    assert len(synced) == 2 # Once per file
+    assert batcher.timer is None
+
+    synced.clear()
+    batcher = pos.FsyncBatcher(window=0)
+    with open('a.csv', 'a') as a:
+        for _ in range(2):
+            a.write('row\n')
+            batcher.written(a)
+    assert len(synced) == 2
+
+
+def test_torn_tail_repair(pos):
+    with open('log.csv', 'wb') as file:
+        file.write(b'a,1\nb,2\nc,')
+    assert pos.repair_torn_tail('log.csv')
+    assert not pos.repair_torn_tail('log.csv')
+    with open('log.csv', 'rb') as file:
+        assert file.read() == b'a,1\nb,2\n'
+    with open('log.csv.torn', 'rb') as file:
+        assert file.read() == b'c,\n'
+
+
+def test_threads_replacing_the_same_file(pos):
+    inside = threading.Barrier(2)
+    errors = []
+
+    def write(text):
+        try:
+            with pos.atomic_write('data.csv') as file:
+                file.write(text * 1000)
+                inside.wait(5) # Both temp files are open at once
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(text,)) for text in 'ab']
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert errors == []
+    with open('data.csv') as file:
+        assert file.read() in ('a' * 1000, 'b' * 1000)
+    assert os.listdir('.') == ['data.csv']
@@ -0,0 +1,81 @@
+import csv
+import os
+
+import pytest
+
+
+def paid(customer, items, total):
+    return {'customer': customer, 'total_amount': total, 'method': 'Cash', 'status': 'PAID',
+            'order_items': items, 'item_prices': {}, 'created_at': '2024-05-01 10:00:00'}
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_export_skips_a_corrupt_line(pos, tmp_path, workers, monkeypatch):
+    monkeypatch.setattr(pos, 'EXPORT_READ_SIZE', 64) # Several batches per part
+    monkeypatch.setattr(pos, 'EXPORT_MIN_PART_BYTES', 512) # And several parts
+    store = pos.TransactionStore()
+    store.append_many([paid(f'C{i}', {'betta': 1}, '200.00') for i in range(20)])
+    store.append(paid('Dee\nEvil', {'betta': 1}, '200.00')) # Saved before names were checked
+    store.append_many([paid(f'D{i}', {'guppy': 2}, '71.00') for i in range(20)])
+    store.void(3)
+
+    out = str(tmp_path / 'out.csv')
+    totals = pos.export_history(out, workers=workers)
+    with open(out, newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert len(rows) == totals.transactions == 39
+    assert [row['customer'] for row in rows] == [f'C{i}' for i in range(20) if i != 2] + [f'D{i}' for i in range(20)]
+
+
+def history(pos):
+    store = pos.TransactionStore()
+    methods = ['Cash', 'GCash', 'Card']
+    statuses = ['PAID', 'PAID', pos.PENDING_STATUS, pos.RESERVED_STATUS]
+    store.append_many([{'customer': f'C{i % 7}', 'total_amount': pos.Money(3550 * (i % 3 + 1) + 10 * (i % 4)),
+                        'method': methods[i % 3], 'status': statuses[i % 4],
+                        'order_items': {'guppy': i % 3 + 1, 'food': i % 4} if i % 4 else {'guppy': i % 3 + 1},
+                        'item_prices': {} if i % 5 == 0 else {'guppy': '35.50', 'food': '0.10'},
+                        'created_at': '2024-05-01 10:00:00'} for i in range(120)])
+    for tx_id in (5, 17, 64):
+        store.void(tx_id)
+    store.replace_many([dict(store.get(tx_id), status='PAID') for tx_id in (3, 4, 40)])
+    return store
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl'])
+def test_parallel_totals_match_one_pass(pos, tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(pos, 'EXPORT_READ_SIZE', 256)
+    monkeypatch.setattr(pos, 'EXPORT_MIN_PART_BYTES', 1024)
+    store = history(pos)
+    assert len(pos.plan_export(pos.get_storage(), 12)[0]) == 12
+    expected = pos.ExportTotals()
+    for tx in store.iter_live():
+        expected.add(tx)
+    assert expected.transactions == 117
+
+    outputs = []
+    for workers in (1, 3):
+        out = tmp_path / f'out-{workers}.{fmt}'
+        totals = pos.export_history(str(out), fmt=fmt, workers=workers)
+        assert totals.report() == expected.report()
+        outputs.append(out.read_bytes())
+    assert outputs[0] == outputs[1]
+    assert not [name for name in os.listdir(tmp_path) if name.startswith('.export-')] # Parts cleaned up
+
+
+def test_merge_adds_up_the_parts(pos):
+    left, right = pos.ExportTotals(), pos.ExportTotals()
+    sale = {'customer': 'Ana', 'total_amount': pos.Money(7100), 'method': 'Cash', 'status': 'PAID',
+            'order_items': {'guppy': 2}, 'item_prices': {'guppy': pos.Money(3550)}}
+    left.add(sale)
+    right.add(sale)
+    right.add(dict(sale, customer='Ben', method='GCash', status=pos.PENDING_STATUS))
+    right.add(dict(sale, customer='Cy', method='GCash', order_items={'food': 10}, item_prices={'food': pos.Money(10)},
+                   total_amount=pos.Money(100)))
+    left.merge(right)
+    assert left.transactions == 4
+    assert left.by_item == {'guppy': [4, 14200], 'food': [10, 100]}
+    assert left.by_customer == {'Ana': [2, 14200, 0], 'Ben': [1, 0, 7100], 'Cy': [1, 100, 0]}
+    assert left.by_method == {'Cash': [2, 14200], 'GCash': [1, 100]}
+    assert left.report()['summary'] == {'transactions': 4, 'orders': 3, 'revenue': 143.0, 'pending_amount': 71.0,
+                                        'customers': 3}
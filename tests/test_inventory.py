@@ -0,0 +1,81 @@
+import os
+
+
+def stock_in_snapshot(pos, item_key):
+    with open(pos.INVENTORY_FILE) as file:
+        for line in file.read().splitlines()[1:]:
+            key, price, qty = line.split(',')
+            if key == item_key:
+                return int(qty)
+
+
+def test_crash_between_compactions_keeps_movements(shop, monkeypatch, pos_env):
+    pos, menu, stock = shop
+    storage = pos.get_storage()
+    pos.checkout({'betta': 2}, 'Cash', menu, stock)
+
+    # The snapshot write fails (as if the till crashed) twice, with sales in between
+    save_inventory = pos.CsvBackend.save_inventory
+    monkeypatch.setattr(pos.CsvBackend, 'save_inventory', lambda self, menu, stock: False)
+    storage.compact_inventory(menu, stock)
+    pending = pos.STOCK_JOURNAL_FILE + '.compacting'
+    assert os.path.exists(pending)
+    pos.checkout({'betta': 3}, 'Cash', menu, stock)
+    storage.compact_inventory(menu, stock)
+    pos.checkout({'betta': 1}, 'Cash', menu, stock)
+    monkeypatch.setattr(pos.CsvBackend, 'save_inventory', save_inventory)
+
+    restarted = pos_env()
+    menu, stock = restarted.load_data()
+    assert stock['betta'] == 4
+    assert not os.path.exists(pending) # Finished on load
+    assert stock_in_snapshot(restarted, 'betta') == 5 # The rest is still in the journal
+    assert restarted.load_data()[1]['betta'] == 4
+
+
+def test_journal_replay_and_compaction(shop, pos_env):
+    pos, menu, stock = shop
+    pos.checkout({'guppy': 5}, 'Cash', menu, stock)
+    menu['koi'] = pos.Money(50000)
+    stock['koi'] = 2
+    pos.record_stock_movement('add', 'koi', menu, stock, 2)
+    assert stock_in_snapshot(pos, 'guppy') == 40 # Only journaled so far
+
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    assert stock['guppy'] == 35 and stock['koi'] == 2 and menu['koi'] == pos.Money(50000)
+
+    pos.get_storage().compact_inventory(menu, stock)
+    assert not os.path.exists(pos.STOCK_JOURNAL_FILE)
+    assert stock_in_snapshot(pos, 'guppy') == 35 and stock_in_snapshot(pos, 'koi') == 2
+    assert dict(pos_env().load_data()[1]) == dict(stock)
+
+
+def test_torn_journal_record_and_removal(shop, pos_env):
+    pos, menu, stock = shop
+    pos.checkout({'betta': 1}, 'Cash', menu, stock)
+    del menu['food'], stock['food']
+    pos.record_stock_movement('remove', 'food', menu, stock)
+    with open(pos.STOCK_JOURNAL_FILE, 'a') as file:
+        file.write('sale,guppy,-3,35.5') # The till died mid-append
+
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    assert dict(stock) == {'betta': 9, 'guppy': 40}
+    assert 'food' not in menu
+    assert os.path.exists(pos.STOCK_JOURNAL_FILE + '.torn')
+    pos.checkout({'guppy': 1}, 'Cash', menu, stock) # Appends after the cut, on a line of its own
+    assert dict(pos_env().load_data()[1]) == {'betta': 9, 'guppy': 39}
+
+
+def test_compaction_starts_at_the_threshold(shop, monkeypatch):
+    pos, menu, stock = shop
+    monkeypatch.setattr(pos, 'JOURNAL_COMPACT_THRESHOLD', 3)
+    storage = pos.get_storage()
+    for _ in range(3):
+        pos.checkout({'guppy': 1}, 'Cash', menu, stock)
+    storage.compaction_thread.join(5)
+    assert not os.path.exists(pos.STOCK_JOURNAL_FILE)
+    assert not os.path.exists(pos.STOCK_JOURNAL_FILE + '.compacting')
+    assert stock_in_snapshot(pos, 'guppy') == 37
+    assert storage.journal_records == 0
@@ -0,0 +1,40 @@
+import re
+
+
+def test_off_by_default(pos):
+    assert not hasattr(pos.checkout, '__wrapped__') # @timed handed back the function itself
+    pos.observe('checkout', 0.01)
+    pos.count('fsyncs')
+    assert pos.metrics_text() == '\n'
+
+
+def test_prometheus_text(pos_env, monkeypatch, tmp_path):
+    monkeypatch.setenv('POS_METRICS', '1')
+    monkeypatch.setenv('POS_METRICS_FILE', str(tmp_path / 'metrics.prom')) # Also written at exit
+    pos = pos_env()
+    with open(pos.INVENTORY_FILE, 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,10\n')
+    menu, stock = pos.load_data()
+    for _ in range(3):
+        pos.checkout({'betta': 1}, 'Cash', menu, stock)
+    pos.observe('lookup', 0.00005) # On a bucket bound: counted in that bucket
+    pos.observe('lookup', 120)
+
+    text = pos.metrics_text()
+    assert '# TYPE pos_checkout_seconds histogram' in text
+    assert 'pos_checkout_seconds_count 3' in text
+    assert 'pos_checkout_seconds_bucket{le="+Inf"} 3' in text
+    buckets = [int(n) for n in re.findall(r'^pos_checkout_seconds_bucket\{le="[^"]+"\} (\d+)$', text, re.M)]
+    assert len(buckets) == len(pos.METRIC_BUCKETS) + 1 and buckets == sorted(buckets)
+    assert 'pos_lookup_seconds_bucket{le="1e-05"} 0' in text
+    assert 'pos_lookup_seconds_bucket{le="5e-05"} 1' in text
+    assert 'pos_lookup_seconds_bucket{le="60"} 1' in text
+    assert 'pos_lookup_seconds_bucket{le="+Inf"} 2' in text
+    assert re.search(r'^pos_rows_appended_total [1-9]\d*$', text, re.M)
+    assert re.search(r'^pos_fsyncs_total [1-9]\d*$', text, re.M)
+    for line in text.splitlines():
+        assert line.startswith('#') or re.fullmatch(r'pos_\w+(\{le="[^"]+"\})? [\d.]+', line)
+
+    pos.write_metrics()
+    with open(tmp_path / 'metrics.prom') as file:
+        assert file.read() == text
@@ -0,0 +1,58 @@
+import pytest
+
+
+def test_parse_and_str(pos):
+    Money = pos.Money
+    assert Money.parse('351.50') == 35150
+    assert Money.parse('₱1,250') == 125000
+    assert Money.parse('0.30000000000000004') == 30
+    assert Money.parse('0.125') == 13 and Money.parse('-0.125') == -13
+    assert Money.parse('1e2') == 10000
+    assert str(Money(-5)) == '-0.05' and str(Money(35150)) == '351.50'
+    for text in ('', 'abc', '1.2.3', '--1'):
+        with pytest.raises(ValueError):
+            Money.parse(text)
+
+
+def test_arithmetic_is_in_centavos(pos):
+    Money = pos.Money
+    price = Money.parse('35.50')
+    assert type(price + price) is Money and price + price == 7100
+    assert Money(0) + 5 == 5 and 5 + Money(0) == 5 # Bare ints are centavos
+    assert 100 - Money(1) == 99 and type(100 - Money(1)) is Money
+    assert price * 3 == 10650 and type(3 * price) is Money
+    assert sum([price] * 3, Money(0)) == 10650
+    assert Money.from_pesos(0.1 + 0.2) == 30
+
+
+def test_of_takes_only_unambiguous_amounts(pos):
+    Money = pos.Money
+    from decimal import Decimal
+    assert Money.of('5') == 500
+    assert Money.of(Decimal('5.25')) == 525
+    assert Money.of(Money(7)) == 7
+    for value in (5, 5.0, True):
+        with pytest.raises(TypeError):
+            Money.of(value)
+
+
+@pytest.mark.parametrize('spec, text', [
+    ('', '5.00'), ('>10', '      5.00'), ('10', '      5.00'), ('<8', '5.00    '),
+    ('>7.2f', '   5.00'), ('.2f', '5.00'), ('.1f', '5.0'), (',.2f', '5.00'),
+])
+def test_format_keeps_two_decimals(pos, spec, text):
+    assert format(pos.Money(500), spec) == text
+    assert f"{pos.Money(123456789):,.2f}" == '1,234,567.89'
+
+
+def test_no_float_arithmetic(pos):
+    from decimal import Decimal
+    price = pos.Money.parse('35.50')
+    # Money on the left only: float.__add__ takes any int (Money included) before Money is asked
+    for operation in (lambda: price + 1.5, lambda: price - 0.5, lambda: price * 1.5, lambda: price + Decimal('1.00'),
+                      lambda: price - Decimal('1.00'), lambda: sum([price, 1.5])):
+        with pytest.raises(TypeError):
+            operation()
+    with pytest.raises(TypeError):
+        price * price # Money times Money has no meaning
+    assert price + True == 3551 # bool is an int
@@ -0,0 +1,45 @@
+import pytest
+
+
+@pytest.fixture
+def tills(pos_env, monkeypatch):
+    """Two tills sharing one shop directory: (till A, its menu, its stock, till B, its menu, its stock)."""
+    monkeypatch.setenv('POS_MULTI_TILL', '1')
+    with open('inventory.csv', 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,3\nguppy,35.50,40\n')
+    till_a = pos_env('pos_till_a')
+    till_b = pos_env('pos_till_b')
+    return (till_a, *till_a.load_data(), till_b, *till_b.load_data())
+
+
+def test_order_is_checked_against_other_tills_sales(tills):
+    till_a, menu_a, stock_a, till_b, menu_b, stock_b = tills
+    till_a.check_order({'betta': 2}, menu_a, stock_a, 'Ana')
+    till_b.checkout({'betta': 2}, 'Cash', menu_b, stock_b, 'Ben')
+
+    # Till A has not synced yet, but the check before payment does
+    with pytest.raises(till_a.CheckoutError, match='Insufficient stock'):
+        till_a.check_order({'betta': 2}, menu_a, stock_a, 'Ana')
+    assert stock_a['betta'] == 1
+    till_a.check_order({'betta': 1}, menu_a, stock_a, 'Ana')
+
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_other_tills_see_a_rewritten_history(pos_env, monkeypatch, backend):
+    monkeypatch.setenv('POS_STORAGE', backend)
+    monkeypatch.setenv('POS_MULTI_TILL', '1')
+    with open('inventory.csv', 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,10\n')
+    till_a, till_b = pos_env('pos_till_a'), pos_env('pos_till_b')
+    menu_a, stock_a = till_a.load_data()
+    menu_b, stock_b = till_b.load_data()
+    for customer in ('Ana', 'Ben', 'Cy'):
+        till_a.checkout({'betta': 1}, 'Cash', menu_a, stock_a, customer)
+    assert till_b.get_aggregates().paid_total() == till_b.Money(60000)
+
+    till_a.rewrite_transactions([tx for tx in till_a.iter_transactions() if tx['customer'] != 'Ben'])
+    till_b.refresh_inventory(menu_b, stock_b)
+    assert till_b.get_aggregates().paid_total() == till_b.Money(40000)
+    till_a.checkout({'betta': 1}, 'Cash', menu_a, stock_a, 'Dee')
+    till_b.refresh_inventory(menu_b, stock_b)
+    assert till_b.get_aggregates().paid_total() == till_b.Money(60000)
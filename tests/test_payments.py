@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def later(pos, hours=1):
+    return datetime.now() + timedelta(hours=pos.RESERVATION_HOURS + hours)
+
+
+def test_failed_confirmation_keeps_order_pending(shop, monkeypatch):
+    pos, menu, stock = shop
+    tx = pos.checkout({'betta': 2}, 'GCash', menu, stock, 'Ana', pending=True)
+    assert [expired['tx_id'] for expired in pos.expire_reservations(menu, stock, later(pos))] == [tx['tx_id']]
+    assert stock['betta'] == 10
+
+    def fail(*args):
+        raise OSError(28, 'No space left on device')
+    monkeypatch.setattr(pos.CsvBackend, 'record_status_changes', fail)
+    with pytest.raises(pos.CheckoutError):
+        pos.confirm_payment(tx['tx_id'], menu, stock)
+    assert stock['betta'] == 10
+    assert pos.get_transaction(tx['tx_id'])['status'] == pos.PENDING_STATUS
+
+
+def test_void_returns_reserved_stock(shop):
+    pos, menu, stock = shop
+    tx = pos.checkout({'betta': 2, 'guppy': 1}, 'GCash', menu, stock, 'Ana', pending=True)
+    assert stock['betta'] == 8
+    voided, moves = pos.void_order(tx['tx_id'], menu, stock)
+    assert voided['status'] == pos.RESERVED_STATUS
+    assert sorted(moves) == [('refund', 'betta', 2), ('refund', 'guppy', 1)]
+    assert stock['betta'] == 10 and stock['guppy'] == 40
+    assert pos.get_transaction(tx['tx_id']) is None
+    assert pos.load_data()[1]['betta'] == 10 # Journaled with the void
+    with pytest.raises(pos.CheckoutError, match='already removed'):
+        pos.void_order(tx['tx_id'], menu, stock)
+
+
+def test_void_goes_by_status_under_the_lock(pos_env, monkeypatch):
+    monkeypatch.setenv('POS_MULTI_TILL', '1')
+    with open('inventory.csv', 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,10\n')
+    till_a, till_b = pos_env('pos_till_a'), pos_env('pos_till_b')
+    menu_a, stock_a = till_a.load_data()
+    menu_b, stock_b = till_b.load_data()
+    tx = till_a.checkout({'betta': 3}, 'GCash', menu_a, stock_a, 'Ana', pending=True)
+    assert till_a.get_transaction(tx['tx_id'])['status'] == till_a.RESERVED_STATUS
+
+    till_b.confirm_payment(tx['tx_id'], menu_b, stock_b) # While till A was asking "are you sure?"
+    voided, moves = till_a.void_order(tx['tx_id'], menu_a, stock_a)
+    assert voided['status'] == 'PAID' and moves == []
+    assert stock_a['betta'] == 7 # A PAID sale's stock stays sold
@@ -0,0 +1,22 @@
+import pytest
+
+
+def legacy_tx(pos):
+    return {'tx_id': 7, 'customer': 'Ana', 'total_amount': pos.Money(31000), 'method': 'Cash', 'status': 'PAID',
+            'order_items': {'betta': 1, 'guppy': 2}, 'item_prices': {}, 'created_at': ''}
+
+
+def test_priced_receipt(pos):
+    tx = dict(legacy_tx(pos), item_prices={'betta': pos.Money(20000), 'guppy': pos.Money(5500)})
+    text = pos.RECEIPTS['text'].render(pos.transaction_receipt(tx))
+    assert 'Betta           ₱ 200.00 x1   ₱   200.00\n' in text
+    assert 'Guppy           ₱  55.00 x2   ₱   110.00\n' in text
+    assert '₱   310.00' in text and 'not recorded' not in text
+
+
+@pytest.mark.parametrize('name', ['text', 'escpos', 'html'])
+def test_legacy_receipt_shows_no_unit_prices(pos, name):
+    text = pos.RECEIPTS[name].render(pos.transaction_receipt(legacy_tx(pos)))
+    assert 'not recorded' in text
+    assert '310.00' in text
+    assert '200.00' not in text and '155.00' not in text and '103.33' not in text
@@ -0,0 +1,63 @@
+import random
+
+DAY = 86400
+
+
+def brute_force(pos, monitor, stock, now, limit):
+    statuses = [monitor.status(item_key, stock[item_key], now) for item_key in monitor.rates if item_key in stock]
+    urgent = [status for status in statuses if status['reorder_qty'] > 0]
+    return sorted(urgent, key=lambda status: status['days_left'])[:limit]
+
+
+def test_heap_matches_a_brute_force_ranking(pos, monkeypatch):
+    monkeypatch.setattr(pos, 'REORDER_HEAP_SLACK', 10)
+    rng = random.Random(7)
+    stock = {f'item {i}': rng.randint(20, 150) for i in range(60)}
+    monitor = pos.ReorderMonitor()
+    now = 1.7e9
+    for step in range(2000):
+        now += rng.uniform(0, 600)
+        item_key = rng.choice(list(stock))
+        if rng.random() < 0.1:
+            stock[item_key] += rng.randint(10, 200) # Restocked, not seen by the monitor
+            continue
+        qty = min(rng.randint(1, 5), stock[item_key] - 1)
+        if qty < 1:
+            continue
+        stock[item_key] -= qty
+        monitor.record_sale(item_key, qty, stock[item_key], now)
+        if step % 50 == 0:
+            assert monitor.suggestions(stock, 10, now) == brute_force(pos, monitor, stock, now, 10)
+    ranked = brute_force(pos, monitor, stock, now, 60)
+    assert 10 < len(ranked) < 60
+    assert monitor.suggestions(stock, 60, now) == ranked
+    assert len(monitor.heap) <= 2 * len(monitor.versions) + 10 + 1
+
+
+def test_alert_once_until_back_above_the_thresholds(pos):
+    monitor = pos.ReorderMonitor()
+    now = 1.7e9
+    monitor.record_sale('betta', 1, 50, now)
+    assert monitor.take_alerts() == []
+    monitor.record_sale('betta', 2, 4, now + 60)
+    monitor.record_sale('betta', 1, 3, now + 120)
+    alerts = monitor.take_alerts()
+    assert [(alert['item'], alert['stock']) for alert in alerts] == [('betta', 4)]
+    assert alerts[0]['reorder_qty'] > 0
+    monitor.record_sale('betta', 1, 500, now + 180) # Restocked in between
+    monitor.record_sale('betta', 1, 4, now + 240)
+    assert [alert['stock'] for alert in monitor.take_alerts()] == [4]
+
+
+def test_rates_survive_a_restart(pos):
+    stock = {'betta': 30, 'guppy': 8, 'koi': 40}
+    monitor = pos.ReorderMonitor()
+    now = 1.7e9
+    for item_key, sold in (('betta', 10), ('guppy', 6), ('koi', 2), ('betta', 5)):
+        monitor.record_sale(item_key, sold, stock[item_key], now)
+        now += 3600
+    restored = pos.ReorderMonitor.from_json(monitor.to_json(), {'betta': 30, 'guppy': 8})
+    assert 'koi' not in restored.rates # Taken off the menu since
+    assert restored.suggestions({'betta': 30, 'guppy': 8}, now=now) == [
+        status for status in monitor.suggestions(stock, now=now) if status['item'] != 'koi']
+    assert restored.rate('betta', now + pos.REORDER_VELOCITY_DAYS * DAY) < restored.rate('betta', now) / 2
@@ -0,0 +1,62 @@
+import pytest
+
+
+def sale(customer, items, prices, total, method='Cash', status='PAID', created_at='2024-05-01 10:15:00'):
+    return {'customer': customer, 'total_amount': total, 'method': method, 'status': status,
+            'order_items': items, 'item_prices': prices, 'created_at': created_at}
+
+
+@pytest.fixture
+def history(shop):
+    pos, menu, stock = shop
+    reserved, pending = pos.RESERVED_STATUS, pos.PENDING_STATUS
+    store = pos.TransactionStore()
+    store.append_many([
+        sale('Ana', {'betta': 2}, {'betta': '200.00'}, '400.00'),
+        sale('Ben', {'guppy': 3, 'food': 10}, {'guppy': '35.50', 'food': '0.10'}, '107.50', created_at='2024-05-01 17:40:00'),
+        sale('Ana', {'guppy': 1}, {}, '35.50', method='GCash', created_at='2024-05-02 09:05:00'),
+        sale('Cy', {'betta': 1}, {'betta': '200.00'}, '200.00', method='GCash', status=reserved,
+             created_at='2024-04-30 12:00:00'),
+        sale('Dee', {'food': 3}, {'food': '0.10'}, '0.30', method='GCash', status=pending, created_at=''),
+        sale('Eve', {'betta': 5}, {'betta': '200.00'}, '1000.00', created_at='2024-05-03 11:00:00'),
+    ])
+    store.void(6)
+    return pos, stock, lambda: pos.SalesColumns.load(pos.iter_transactions())
+
+
+def test_report_totals(history, monkeypatch):
+    pos, stock, columns = history
+    monkeypatch.setattr(pos, 'np', None)
+    report = pos.sales_report(columns(), stock)
+    summary = report['summary']
+    assert summary['engine'] == 'python'
+    assert (summary['transactions'], summary['orders'], summary['revenue']) == (5, 3, 543.0)
+    assert (summary['pending_orders'], summary['pending_amount'], summary['oldest_pending_day']) == (2, 200.3, '2024-04-30')
+    assert [(line['item'], line['qty'], line['revenue']) for line in report['by_item']] == [
+        ('betta', 2, 400.0), ('guppy', 4, 142.0), ('food', 10, 1.0)]
+    assert report['top_sellers'][0]['item'] == 'food'
+    assert report['by_day'] == [{'day': '2024-05-01', 'orders': 2, 'revenue': 507.5},
+                                {'day': '2024-05-02', 'orders': 1, 'revenue': 35.5}]
+    assert [line['hour'] for line in report['by_hour']] == ['09:00', '10:00', '17:00']
+    assert [line['customer'] for line in report['pending_by_customer']] == ['Cy', 'Dee']
+
+
+def test_report_period(history, monkeypatch):
+    pos, stock, columns = history
+    monkeypatch.setattr(pos, 'np', None)
+    report = pos.sales_report(columns(), stock, since='2024-05-02', until='2024-05-02')
+    assert (report['summary']['orders'], report['summary']['revenue']) == (1, 35.5)
+    assert report['by_method'] == [{'method': 'GCash', 'orders': 1, 'revenue': 35.5}]
+    assert report['summary']['pending_orders'] == 2 # Open orders are counted whatever the period
+
+
+def test_numpy_matches_python(history, monkeypatch):
+    np = pytest.importorskip('numpy')
+    pos, stock, columns = history
+    monkeypatch.setattr(pos, 'np', np)
+    fast = [pos.sales_report(columns(), stock), pos.sales_report(columns(), stock, since='2024-05-02')]
+    monkeypatch.setattr(pos, 'np', None)
+    slow = [pos.sales_report(columns(), stock), pos.sales_report(columns(), stock, since='2024-05-02')]
+    assert [report['summary'].pop('engine') for report in fast] == ['numpy'] * 2
+    assert [report['summary'].pop('engine') for report in slow] == ['python'] * 2
+    assert fast == slow
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+
+def test_reserved_order_holds_its_stock_until_it_expires(shop, pos_env):
+    pos, menu, stock = shop
+    tx = pos.checkout({'betta': 3}, 'GCash', menu, stock, 'Ana', pending=True)
+    assert tx['status'] == pos.RESERVED_STATUS and stock['betta'] == 7
+    placed = datetime.strptime(tx['created_at'], pos.TIMESTAMP_FORMAT)
+
+    assert pos.expire_reservations(menu, stock, now=placed + timedelta(hours=23)) == []
+    expired = pos.expire_reservations(menu, stock, now=placed + timedelta(hours=pos.RESERVATION_HOURS))
+    assert [t['tx_id'] for t in expired] == [tx['tx_id']]
+    assert stock['betta'] == 10
+    assert pos.get_transaction(tx['tx_id'])['status'] == pos.PENDING_STATUS
+
+    restarted = pos_env()
+    menu, stock = restarted.load_data()
+    assert stock['betta'] == 10
+    assert restarted.confirm_payment(tx['tx_id'], menu, stock)['status'] == 'PAID'
+    assert stock['betta'] == 7 # Taken again when the late payment came in
+
+
+def payment(pos, amount, name, paid_at):
+    return {'line': 2, 'amount': pos.to_centavos(amount), 'name': name, 'reference': '',
+            'paid_at': datetime.strptime(paid_at, pos.TIMESTAMP_FORMAT)}
+
+
+def order(pos, tx_id, customer, amount, created_at, status=None):
+    return {'tx_id': tx_id, 'customer': customer, 'total_amount': pos.Money.parse(amount),
+            'status': status or pos.RESERVED_STATUS, 'created_at': created_at}
+
+
+def test_statement_matching(pos):
+    pending = [
+        order(pos, 1, 'Juan Dela Cruz', '200.00', '2024-05-01 10:00:00'),
+        order(pos, 2, 'Maria Santos', '200.00', '2024-05-01 10:05:00'),
+        order(pos, 3, 'Guest Customer', '35.50', '2024-05-01 11:00:00', pos.PENDING_STATUS),
+        order(pos, 4, 'Ana Reyes', '71.00', '2024-05-01 09:00:00'),
+        order(pos, 5, 'Ana Reyes', '71.00', '2024-05-02 09:00:00'),
+        order(pos, 6, 'Ben Lim', '100.00', '2024-04-20 09:00:00'),
+        order(pos, 7, 'Cy Tan', '50.00', '2024-05-01 09:00:00', 'PAID'),
+    ]
+    payments = [
+        payment(pos, '200.00', 'JU*N D*LA C**Z', '2024-05-01 10:20:00'), # Masked, as GCash shows it
+        payment(pos, '200.00', 'M. SANTOS', '2024-05-01 10:30:00'), # Initial
+        payment(pos, '35.50', '', '2024-05-01 11:10:00'), # Nameless, but the only candidate
+        payment(pos, '71.00', 'Ana Reyes', '2024-05-02 09:30:00'), # Closest of two orders
+        payment(pos, '100.00', 'Ben Lim', '2024-05-01 09:00:00'), # Too long after the order
+        payment(pos, '50.00', 'Cy Tan', '2024-05-01 09:05:00'), # Already paid
+        payment(pos, '200.01', 'Juan Dela Cruz', '2024-05-01 10:25:00'), # A centavo off
+    ]
+    matches, unmatched = pos.match_statement(payments, pending)
+    assert [(p['name'], tx['tx_id']) for p, tx in matches] == [
+        ('JU*N D*LA C**Z', 1), ('M. SANTOS', 2), ('', 3), ('Ana Reyes', 5)]
+    assert [p['name'] for p in unmatched] == ['Ben Lim', 'Cy Tan', 'Juan Dela Cruz']
+
+
+def test_name_score(pos):
+    assert pos.name_score('Juan Dela Cruz', 'Received from JU*N D*LA C**Z') == 1
+    assert pos.name_score('Juan Dela Cruz', 'J. D. C.') == 1
+    assert pos.name_score('Juan Dela Cruz', 'Pedro Cruz') == pytest.approx(1 / 3)
+    assert pos.name_score('Guest Customer', 'Anyone') is None
+
+
+def test_reconcile_statement(shop):
+    pos, menu, stock = shop
+    ana = pos.checkout({'guppy': 2}, 'GCash', menu, stock, 'Ana Reyes', pending=True)
+    ben = pos.checkout({'betta': 1}, 'GCash', menu, stock, 'Ben Lim', pending=True)
+    with open('statement.csv', 'w') as file:
+        file.write('Date and Time,Description,Reference No.,Debit,Credit\n'
+                   f'{ana["created_at"]},Received from A*A R***S,1001,,71.00\n'
+                   f'{ana["created_at"]},Cash out,1002,500.00,\n'
+                   f'{ana["created_at"]},Received from Zed,1003,,"1,000.00"\n')
+
+    paid, unmatched, problems = pos.reconcile_statement('statement.csv', menu, stock, dry_run=True)
+    assert [tx['tx_id'] for _, tx in paid] == [ana['tx_id']]
+    assert pos.get_transaction(ana['tx_id'])['status'] == pos.RESERVED_STATUS
+
+    paid, unmatched, problems = pos.reconcile_statement('statement.csv', menu, stock)
+    assert [tx['tx_id'] for _, tx in paid] == [ana['tx_id']] and problems == []
+    assert [(p['reference'], p['amount']) for p in unmatched] == [('1003', 100000)]
+    assert pos.get_transaction(ana['tx_id'])['status'] == 'PAID'
+    assert pos.get_transaction(ben['tx_id'])['status'] == pos.RESERVED_STATUS
+    assert stock['guppy'] == 38 and stock['betta'] == 9
@@ -0,0 +1,25 @@
+def test_index_follows_catalog_changes_of_the_same_size(shop):
+    pos, menu, stock = shop
+    index = pos.get_product_index(menu)
+    assert pos.get_product_index(menu) is index
+    assert index.lookup('betta') == 'betta'
+
+    # Another till swapped one product for another: same count, different keys
+    del menu['betta']
+    menu['koi'] = pos.Money(50000)
+    index = pos.get_product_index(menu)
+    assert index.lookup('koi') == 'koi' and index.lookup('betta') is None
+
+    menu['molly'] = pos.Money(4000)
+    index.add('molly')
+    index.generation = pos.catalog_generation(menu)
+    assert pos.get_product_index(menu) is index # Updated in place, not rebuilt
+
+
+def test_index_over_a_plain_dict(pos):
+    menu = {'betta': pos.Money(20000), 'guppy': pos.Money(3550)}
+    index = pos.get_product_index(menu)
+    assert pos.get_product_index(dict(menu)) is index
+    menu.pop('guppy')
+    menu['koi'] = pos.Money(50000)
+    assert pos.get_product_index(menu).lookup('koi') == 'koi'
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture(params=['csv', 'sqlite'])
+def service(request, pos_env, monkeypatch):
+    monkeypatch.setenv('POS_STORAGE', request.param)
+    with open('inventory.csv', 'w') as file:
+        file.write('item_key,price,stock\nbetta,200,500\nguppy,35.50,400\nfood,0.10,500\n')
+    pos = pos_env()
+    menu, stock = pos.load_data()
+    service = pos.PosService(menu, stock)
+    yield pos, service
+    service.writer.shutdown()
+    service.readers.shutdown()
+
+
+def test_snapshot_updates_touched_items(service):
+    pos, service = service
+    before = service.snapshot
+    [(status, _)] = service._commit([('order', {'items': {'betta': 2}})])
+    assert status == 201
+    after = service.snapshot
+    assert after['menu'][0] == {'item': 'betta', 'price': 200.0, 'stock': 498}
+    assert after['menu'][1] is before['menu'][1] # Untouched rows are reused
+    assert after['stock'] == dict(service.stock)
+    assert before['stock']['betta'] == 500 # Readers of the old snapshot are not disturbed
+    service._publish()
+    assert service.snapshot['menu'] == after['menu']
+    assert service.snapshot['reorder'] == after['reorder']
+
+
+def test_reads_during_group_commits(service):
+    pos, service = service
+    errors = []
+    done = threading.Event()
+
+    def read():
+        while not done.is_set():
+            try:
+                page = service.readers.submit(service._list_transactions, {}).result()
+                if page['transactions']:
+                    status, _ = service.readers.submit(service._get_transaction, page['transactions'][-1]['tx_id']).result()
+                    assert status == 200
+            except Exception as e:
+                errors.append(e)
+                return
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for _ in range(40):
+        writes = [('order', {'items': {'guppy': 1}, 'customer': f'C{i}'}) for i in range(5)]
+        results = service.writer.submit(service._commit, writes).result()
+        assert [status for status, _ in results] == [201] * 5
+    done.set()
+    for thread in readers:
+        thread.join()
+    assert errors == []
+    assert service.stock['guppy'] == 200
+    assert len(list(pos.iter_transactions())) == 200
+
+
+def test_sqlite_readers_do_not_see_an_open_write(pos_env, monkeypatch):
+    monkeypatch.setenv('POS_STORAGE', 'sqlite')
+    pos = pos_env()
+    storage = pos.get_storage()
+    tx = {'customer': 'Ana', 'total_amount': pos.Money(20000), 'method': 'Cash', 'status': 'PAID',
+          'order_items': {'betta': 1}, 'item_prices': {'betta': pos.Money(20000)}}
+    seen = []
+    with storage._transaction():
+        storage._insert_tx(tx)
+        reader = threading.Thread(target=lambda: seen.append(storage.get_transaction(tx['tx_id'])))
+        reader.start()
+        reader.join()
+    assert seen == [None] # Not committed yet when it looked
+    assert storage.get_transaction(tx['tx_id'])['customer'] == 'Ana'
+
+
+def test_transaction_pages_follow_the_cursor(service, monkeypatch):
+    pos, service = service
+    for i in range(12):
+        pending = i % 3 == 0
+        pos.checkout({'guppy': 1}, 'GCash' if pending else 'Cash', service.menu, service.stock, f'C{i % 4}', pending=pending)
+    pos.confirm_payment(4, service.menu, service.stock) # Rewritten after higher ids
+    pos.void_order(8, service.menu, service.stock)
+    if pos.STORAGE_BACKEND == 'csv':
+        store = pos.get_sales_store()
+        store.replace_many([dict(store.get(tx_id), created_at='2020-01-05 10:00:00') for tx_id in (2, 3, 6)])
+        assert store.seal('2020-02') == 3 # Some of the history comes from the archive
+    pos.checkout({'guppy': 1}, 'Cash', service.menu, service.stock, 'C0')
+
+    def pages(**params):
+        seen, after = [], 0
+        while after is not None:
+            page = service._list_transactions({key: [str(value)] for key, value in dict(params, after=after, limit=5).items()})
+            assert len(page['transactions']) <= 5
+            seen.append([tx['tx_id'] for tx in page['transactions']])
+            after = page['next_after']
+        return seen
+
+    assert pages() == [[1, 2, 3, 4, 5], [6, 7, 9, 10, 11], [12, 13]]
+    assert pages(status='pending') == [[1, 7, 10]]
+    assert pages(customer='c0') == [[1, 5, 9, 13]]
+
+    read = []
+    iter_after = pos.iter_transactions_after
+    monkeypatch.setattr(pos, 'iter_transactions_after', lambda tx_id: (read.append(tx['tx_id']) or tx for tx in iter_after(tx_id)))
+    service._list_transactions({'after': ['5'], 'limit': ['2']})
+    assert read == [6, 7, 9] # Stops once the page (and the look-ahead for next_after) is full
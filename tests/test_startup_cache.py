@@ -0,0 +1,55 @@
+import os
+
+
+def paid(customer):
+    return {'customer': customer, 'total_amount': '200.00', 'method': 'Cash', 'status': 'PAID',
+            'order_items': {'betta': 1}, 'item_prices': {'betta': '200.00'}}
+
+
+def test_inventory_comes_from_the_cache_while_it_matches(shop, pos_env, monkeypatch):
+    pos, menu, stock = shop
+    cache = pos.INVENTORY_FILE + pos.SNAPSHOT_CACHE_SUFFIX
+    assert os.path.exists(cache)
+
+    pos = pos_env()
+    with monkeypatch.context() as patch:
+        patch.setattr(pos.csv, 'DictReader', None) # Any parsing of the snapshot would fail
+        menu, stock = pos.load_data()
+    assert dict(stock) == {'betta': 10, 'guppy': 40, 'food': 500}
+    assert menu['guppy'] == pos.Money(3550)
+
+    with open(pos.INVENTORY_FILE, 'a') as file:
+        file.write('koi,500,2\n') # Edited by hand
+    menu, stock = pos_env().load_data()
+    assert stock['koi'] == 2
+
+    with open(cache, 'wb') as file:
+        file.write(b'\x00torn')
+    assert pos_env().load_data()[1]['koi'] == 2
+
+
+def test_index_cache_covers_what_it_saw(pos_env, monkeypatch):
+    pos = pos_env()
+    monkeypatch.setattr(pos, 'SNAPSHOT_CACHE_MIN_ENTRIES', 1)
+    pos.TransactionStore().append_many([paid('Ana'), paid('Ben'), paid('Cy')])
+    pos.TransactionStore() # Saves the cache
+    cache = pos.SALES_INDEX_FILE + pos.SNAPSHOT_CACHE_SUFFIX
+    assert os.path.exists(cache)
+
+    store = pos.TransactionStore()
+    store.append_many([paid('Dee'), paid('Eve')])
+    store.void(2)
+    reopened = pos.TransactionStore()
+    assert [tx['customer'] for tx in reopened.iter_live()] == ['Ana', 'Cy', 'Dee', 'Eve']
+    assert reopened.get(5)['customer'] == 'Eve' and reopened.next_id == 6
+
+    reopened.compact(list(reopened.iter_live_records())[1:]) # A new index file: the cache no longer applies
+    again = pos.TransactionStore()
+    assert again.get(1) is None and again.get(4)['customer'] == 'Dee'
+
+
+def test_lazy_import(pos):
+    assert pos.lazy_import('no_such_module_here') is None
+    assert pos.lazy_import('json') is pos.json
+    colorsys = pos.lazy_import('colorsys')
+    assert colorsys.rgb_to_hsv(0, 0, 0) == (0, 0, 0)
@@ -0,0 +1,116 @@
+import os
+
+
+def paid(customer, total='200.00', items=None):
+    items = items or {'betta': 1}
+    return {'customer': customer, 'total_amount': total, 'method': 'Cash', 'status': 'PAID',
+            'order_items': items, 'item_prices': {'betta': '200.00'}, 'created_at': '2024-05-01 10:00:00'}
+
+
+def test_round_trip_with_voids(pos):
+    store = pos.TransactionStore()
+    assert store.append(paid('Ana')) == 1
+    store.append_many([paid('Ben', '35.50'), paid('Cy')])
+    assert store.void(2)['customer'] == 'Ben'
+
+    reopened = pos.TransactionStore()
+    assert reopened.get(1)['total_amount'] == pos.Money(20000)
+    assert reopened.get(1)['order_items'] == {'betta': 1}
+    assert reopened.get(2) is None
+    assert [tx['customer'] for tx in reopened.iter_live()] == ['Ana', 'Cy']
+    assert reopened.next_id == 4
+
+
+def test_torn_tail_is_cut_off(pos):
+    pos.TransactionStore().append_many([paid('Ana'), paid('Ben')])
+    with open(pos.SALES_FILE, 'ab') as file:
+        file.write(b'3,Half a rec')
+
+    store = pos.TransactionStore()
+    assert [tx['customer'] for tx in store.iter_live()] == ['Ana', 'Ben']
+    with open(pos.SALES_FILE + '.torn', 'rb') as file:
+        assert file.read().startswith(b'3,Half a rec')
+    assert store.append(paid('Cy')) == 3
+    assert pos.TransactionStore().get(3)['customer'] == 'Cy'
+
+
+def test_malformed_line_is_skipped(pos, capsys):
+    store = pos.TransactionStore()
+    store.append(paid('Ana'))
+    store.append(paid('Dee\nEvil')) # Written before names were checked: the record spans two lines
+    store.append(paid('Cy'))
+
+    reopened = pos.TransactionStore()
+    assert [tx['customer'] for tx in reopened.iter_live()] == ['Ana', 'Cy']
+    assert reopened.get(3)['customer'] == 'Cy'
+    assert 'malformed record' in capsys.readouterr().out
+
+
+def test_legacy_file_is_migrated(pos):
+    with open(pos.SALES_FILE, 'w') as file:
+        file.write('customer,total_amount,method,status,order_items\n'
+                   'Ana,0.30000000000000004,Cash,PAID,"{""food"": 3}"\n'
+                   'Ben,200.0,GCash,UNPAID (GCash Pending),"{""betta"": 1}"\n')
+    store = pos.TransactionStore()
+    with open(pos.SALES_FILE) as file:
+        lines = file.read().splitlines()
+    assert lines[0] == ','.join(pos.TX_FIELDS)
+    assert lines[1] == '1,Ana,0.30,Cash,PAID,"{""food"": 3}",,'
+    assert lines[2].startswith('2,Ben,200.00,GCash,')
+    assert store.get(1)['total_amount'] == pos.Money(30)
+    assert [tx['tx_id'] for tx in store.iter_live()] == [1, 2]
+    assert store.append(paid('Cy')) == 3
+
+
+def test_status_change_keeps_the_id(pos):
+    store = pos.TransactionStore()
+    tx_id = store.append(dict(paid('Ana'), status=pos.PENDING_STATUS))
+    store.append(paid('Ben'))
+    store.replace_many([dict(store.get(tx_id), status='PAID')])
+
+    reopened = pos.TransactionStore()
+    assert reopened.get(tx_id)['status'] == 'PAID'
+    assert [(tx['tx_id'], tx['status']) for tx in reopened.iter_live()] == [(2, 'PAID'), (1, 'PAID')] # File order
+    assert reopened.void(9) is None
+
+
+def test_lost_index_is_rebuilt(pos):
+    store = pos.TransactionStore()
+    store.append_many([paid('Ana'), paid('Ben'), paid('Cy')])
+    store.void(2)
+    with open(pos.SALES_INDEX_FILE, 'rb') as file:
+        index = file.read()
+    os.remove(pos.SALES_INDEX_FILE)
+
+    reopened = pos.TransactionStore()
+    assert reopened.get(3)['customer'] == 'Cy'
+    assert reopened.get(2) is None
+    assert reopened.next_id == 4
+    with open(pos.SALES_INDEX_FILE, 'rb') as file:
+        assert sorted(file.read().splitlines()) == sorted(index.splitlines())
+
+
+def test_stream_reads_only_what_is_consumed(pos, monkeypatch):
+    store = pos.TransactionStore()
+    store.append_many([paid(f'C{i}', items={'guppy': i + 1}) for i in range(200)])
+    store.void(1)
+    read = []
+    read_row = store._read_row
+    monkeypatch.setattr(store, '_read_row', lambda offset, line: read.append(offset) or read_row(offset, line))
+
+    stream = store.iter_live()
+    first = next(stream)
+    assert first['customer'] == 'C1' and len(read) == 2
+    assert isinstance(first['order_items'], str) # Decoded on first use only
+    assert pos.order_items_of(first) == {'guppy': 2}
+    assert first['order_items'] == {'guppy': 2}
+    assert sum(1 for _ in stream) == 198
+
+
+def test_summary_streams_the_history(pos):
+    store = pos.TransactionStore()
+    store.append_many([paid('Ana'), dict(paid('Ben', '35.50'), status=pos.PENDING_STATUS), paid('Cy', '0.10')])
+    store.void(3)
+    total, pending = pos.get_storage().transaction_summary()
+    assert total == pos.Money(20000)
+    assert list(pending) == [2] and pending[2]['customer'] == 'Ben'